@@ -1,9 +1,14 @@
-from flask import Flask, request, jsonify, send_from_directory, Response
+from flask import Flask, Request, request, jsonify, Response, g, has_request_context, stream_with_context, send_file
 from flask_cors import CORS
 import mysql.connector
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.middleware.proxy_fix import ProxyFix
 import hashlib
+import hmac
+import mimetypes
+import tempfile
 import jwt
 from datetime import datetime, timedelta
 import os
@@ -11,9 +16,24 @@ import json
 import pytz
 import requests
 import base64
+import csv
+import io
+import atexit
+import queue
+import threading
+import time
+import uuid
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
+
+# Behind a reverse proxy, take the client address from the entry the proxy
+# appends to X-Forwarded-For. Earlier entries are supplied by the client
+if os.environ.get('TRUST_FORWARDED_FOR', '').lower() in ('1', 'true', 'yes'):
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
 app.config['SECRET_KEY'] = 'your-secret-key-here'  # Change this in production
 
 # Database configuration
@@ -30,15 +50,509 @@ MPESA_CONFIG = {
     'consumer_secret': '',
     'business_shortcode': '174379',  # Test shortcode
     'passkey': 'bfb279f9aa9bdbcf158e97dd71a467cd2e0c893059b10f78e6b72ada1ed2c919',  # Test passkey
-    'base_url': 'https://sandbox.safaricom.co.ke',  # Use production URL in production
-    'callback_url': 'https://webhook.site/3c1f62b5-4214-47d6-9f26-71c1f4b9c8f0'
+    'base_url': os.environ.get('MPESA_BASE_URL', 'https://sandbox.safaricom.co.ke'),  # Use production URL in production
+    'callback_url': 'https://webhook.site/3c1f62b5-4214-47d6-9f26-71c1f4b9c8f0',
+    'token_refresh_margin': 60,  # Refresh the OAuth token this many seconds before it expires
+    'http_pool_size': 20,  # Keep-alive connections held open to Safaricom
+    'timeout': (5, 30)  # (connect, read) timeout in seconds for Daraja calls
+}
+
+# Number sequence configuration
+SEQUENCE_CONFIG = {
+    'application_block_size': 20  # Application numbers each worker reserves per database round trip
+}
+
+# Report export configuration
+REPORT_EXPORT_CONFIG = {
+    'csv_batch_size': 1000,  # Rows fetched from the server-side cursor per chunk
+    'net_write_timeout': 600  # Seconds MySQL waits on a slow download before aborting the stream
+}
+
+# Background PDF report configuration
+REPORT_JOB_CONFIG = {
+    'max_workers': 2,  # Render processes
+    'cache_dir': 'report_cache',  # Finished PDFs, named by the hash of their filters
+    'cache_ttl': 600,  # Seconds a rendered report is reused before it is rebuilt
+    'rows_per_table': 500,  # Rows per LongTable chunk in the PDF
+    'max_jobs': 500,  # Job records kept in memory for status polling
+    'max_cache_bytes': 500 * 1024 * 1024,  # Oldest cached PDFs are deleted beyond this
+    'max_cache_files': 200
+}
+
+# Document storage configuration
+UPLOAD_CONFIG = {
+    'directory': os.path.join(app.root_path, 'uploads'),  # The original uploads folder, now served through send_file
+    'chunk_size': 64 * 1024,  # Bytes read from the request stream per iteration
+    'max_file_bytes': 5 * 1024 * 1024,
+    'max_request_bytes': 20 * 1024 * 1024,  # Werkzeug rejects larger bodies with 413
+    'blob_max_age': 365 * 24 * 3600,  # Content-addressed blobs never change
+    'legacy_max_age': 3600,
+    # '' serves files from Python; 'x-accel-redirect' hands them to nginx through
+    # an internal location, e.g.
+    #     location /protected-uploads/ { internal; alias /path/to/backend/uploads/; }
+    # and 'x-sendfile' hands them to Apache/lighttpd mod_xsendfile
+    'offload': os.environ.get('UPLOAD_OFFLOAD', ''),
+    'accel_prefix': '/protected-uploads/'
+}
+app.config['MAX_CONTENT_LENGTH'] = UPLOAD_CONFIG['max_request_bytes']
+app.config['USE_X_SENDFILE'] = UPLOAD_CONFIG['offload'] == 'x-sendfile'
+
+# Document thumbnail configuration
+THUMBNAIL_CONFIG = {
+    'sizes': {'small': 256, 'medium': 640, 'large': 1280},  # Longest side in pixels
+    'image_extensions': ('.jpg', '.jpeg', '.png', '.webp'),  # PDFs are served as-is
+    'quality': 82,
+    'max_workers': 2,
+    'wait_timeout': 15  # Seconds a request waits for a derivative before falling back to the original
+}
+
+# Accepted document types, identified by their leading bytes rather than the
+# client's Content-Type: (signature, offset, mime type, extension)
+UPLOAD_SIGNATURES = [
+    (b'\xff\xd8\xff', 0, 'image/jpeg', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', 0, 'image/png', '.png'),
+    (b'WEBP', 8, 'image/webp', '.webp'),
+    (b'%PDF-', 0, 'application/pdf', '.pdf')
+]
+
+# Bulk status transition configuration
+BULK_TRANSITION_CONFIG = {
+    'chunk_size': 500,  # Ids per SELECT ... FOR UPDATE / UPDATE ... WHERE id IN (...)
+    'max_items': 5000  # Applications one bulk request may touch
+}
+
+# Batch application submission configuration
+BATCH_SUBMISSION_CONFIG = {
+    'max_items': 100,  # Applications per /api/applications/batch request
+    # 100 applications with a few compressed photos each; the per-file limit still applies
+    'max_request_bytes': 200 * 1024 * 1024
+}
+
+# Endpoints allowed a larger body than MAX_CONTENT_LENGTH
+ENDPOINT_MAX_CONTENT_LENGTH = {
+    'submit_application_batch': BATCH_SUBMISSION_CONFIG['max_request_bytes']
+}
+
+class AppRequest(Request):
+    """Request whose body size limit can be raised for individual endpoints"""
+
+    @property
+    def max_content_length(self):
+        return ENDPOINT_MAX_CONTENT_LENGTH.get(self.endpoint, super().max_content_length)
+
+app.request_class = AppRequest
+
+# Offline station sync configuration. Stations authenticate with a shared
+# token per station: STATION_SYNC_TOKENS="kisumu-01:secret,nakuru-02:secret"
+STATION_SYNC_CONFIG = {
+    'tokens': dict(
+        entry.split(':', 1) for entry in os.environ.get('STATION_SYNC_TOKENS', '').split(',') if ':' in entry
+    ),
+    'max_ops': 200,  # Journal entries per push
+    'max_block': 500,  # Application numbers per reservation
+    'pull_limit': 500  # Applications per pull page
+}
+
+# Report result cache configuration
+REPORT_CACHE_CONFIG = {
+    'max_entries': 128,  # Distinct filter sets kept per worker
+    'ttl': 300  # Seconds before a cached report is recomputed
+}
+
+# Officer status cache configuration; admin actions invalidate entries
+# explicitly, the TTL only bounds staleness across worker processes
+OFFICER_CACHE_CONFIG = {
+    'max_entries': 2048,
+    'ttl': 30  # Seconds
+}
+
+# Public tracker configuration. Status changes drop entries as they commit;
+# the TTL only bounds staleness across worker processes
+TRACKER_CACHE_CONFIG = {
+    'max_entries': 20000,  # Application numbers kept per worker, least recently tracked evicted first
+    'ttl': 30  # Seconds
+}
+
+# Per-client token buckets for tracker lookups that reach the database.
+# Many applicants share one address behind mobile carrier NAT, so the burst
+# is generous and cached answers are not charged
+TRACKER_RATE_LIMIT_CONFIG = {
+    'rate': 1.0,  # Tokens added per second per client
+    'burst': 30,  # Bucket size
+    'max_clients': 50000  # Buckets kept per worker, idle clients dropped first
+}
+
+# Status history audit configuration. 'buffered' queues rows after commit and
+# a background thread writes them in multi-row INSERTs, so a crash can lose up
+# to flush_interval seconds of history; 'strict' writes them inside the
+# transaction that changes the status
+STATUS_AUDIT_CONFIG = {
+    'mode': os.environ.get('STATUS_AUDIT_MODE', 'buffered'),  # 'buffered' or 'strict'
+    'batch_size': 500,  # Rows per INSERT
+    'flush_interval': 2.0,  # Seconds between background flushes
+    'max_pending': 100000  # Rows held while the database is unreachable; oldest dropped beyond this
+}
+
+# Constituency catalogue configuration
+CATALOGUE_CONFIG = {
+    'recheck_interval': 5  # Seconds before a worker re-reads the catalogue version from the database
+}
+
+# Status event configuration. Subscribers wait on one shared condition and read
+# a shared ring buffer, so an idle subscriber costs no memory beyond its
+# connection; for thousands of them run under gevent (gunicorn -k gevent),
+# which turns the waits into greenlets
+STATUS_EVENTS_CONFIG = {
+    'buffer_size': 10000,  # Recent events kept for replay and long-poll catch-up
+    'heartbeat': 15,  # Seconds between SSE keep-alive comments
+    'max_poll_wait': 25,  # Longest a long-poll request is held open
+    'max_subscribers': 5000  # Open streams plus waiting polls per worker
+}
+
+# List endpoint pagination configuration
+PAGINATION_CONFIG = {
+    'default_limit': 50,
+    'max_limit': 500
+}
+
+# Background STK push dispatch configuration
+PAYMENT_DISPATCH_CONFIG = {
+    'max_workers': 8,  # Concurrent STK pushes in flight
+    'max_pending': 200  # Queued pushes before new payments are refused
+}
+
+# Connection pool configuration
+DB_POOL_CONFIG = {
+    'pool_size': 10,  # Connections kept open and reused between requests
+    'max_overflow': 10,  # Extra connections allowed under burst load, closed on return
+    'wait_timeout': 5  # Seconds a request waits for a free connection before failing
 }
 
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time"""
+    pass
+
+class PooledConnection:
+    """Connection handle that returns its underlying connection to the pool on close"""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise mysql.connector.errors.OperationalError('Connection already returned to pool')
+        return getattr(self._raw, name)
+
+    @property
+    def closed(self):
+        return self._raw is None
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw)
+
+    def discard(self):
+        """Close the underlying connection instead of reusing it (e.g. after an abandoned stream)"""
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw, discard=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class ConnectionPool:
+    """Thread-safe MySQL connection pool with overflow, wait timeout and counters"""
+
+    def __init__(self, db_config, pool_size=10, max_overflow=10, wait_timeout=5):
+        self.db_config = db_config
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.wait_timeout = wait_timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size + max_overflow)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self.stats = {
+            'checkouts': 0,
+            'checkins': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'wait_timeouts': 0,
+            'connections_created': 0,
+            'connections_discarded': 0,
+            'leaks_detected': 0
+        }
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _connect(self):
+        raw = mysql.connector.connect(**self.db_config)
+        self._count('connections_created')
+        return raw
+
+    def _discard(self, raw):
+        self._count('connections_discarded')
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Check out a connection, waiting up to wait_timeout seconds for a free slot"""
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            self._count('wait_timeouts')
+            raise PoolTimeoutError(f'No database connection available within {self.wait_timeout}s')
+
+        try:
+            raw = None
+            while raw is None:
+                try:
+                    raw = self._idle.get_nowait()
+                except queue.Empty:
+                    raw = self._connect()
+                    break
+                # Connections may have been dropped by the server while idle
+                if not raw.is_connected():
+                    self._discard(raw)
+                    raw = None
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = time.monotonic() - started
+        with self._lock:
+            self.stats['checkouts'] += 1
+            self.stats['wait_time_total'] += waited
+            self.stats['wait_time_max'] = max(self.stats['wait_time_max'], waited)
+            self._in_use += 1
+        return PooledConnection(self, raw)
+
+    def release(self, raw, discard=False):
+        """Return a connection to the pool, closing it if it is unhealthy or surplus"""
+        healthy = False
+        if not discard:
+            try:
+                # End any open transaction so the next borrower gets a fresh snapshot
+                raw.rollback()
+                healthy = True
+            except Exception:
+                pass
+
+        if healthy and self._idle.qsize() < self.pool_size:
+            self._idle.put(raw)
+        else:
+            self._discard(raw)
+
+        with self._lock:
+            self.stats['checkins'] += 1
+            self._in_use -= 1
+        self._slots.release()
+
+    def snapshot(self):
+        """Return a copy of the pool counters for metrics scraping"""
+        with self._lock:
+            data = dict(self.stats)
+            data['in_use'] = self._in_use
+        data['idle'] = self._idle.qsize()
+        data['pool_size'] = self.pool_size
+        data['max_overflow'] = self.max_overflow
+        data['avg_wait_time'] = data['wait_time_total'] / data['checkouts'] if data['checkouts'] else 0.0
+        return data
+
+DB_POOL = ConnectionPool(DB_CONFIG, **DB_POOL_CONFIG)
+
 def get_db_connection():
-    return mysql.connector.connect(**DB_CONFIG)
+    """Check out a pooled connection; it is returned on close() or at request teardown"""
+    conn = DB_POOL.acquire()
+    if has_request_context():
+        g.setdefault('db_connections', []).append(conn)
+    return conn
 
-def get_mpesa_access_token():
-    """Get M-Pesa access token"""
+@app.teardown_request
+def return_db_connections(exc):
+    """Return any connection a request forgot to close and count it as a leak"""
+    for conn in g.pop('db_connections', []):
+        if not conn.closed:
+            DB_POOL._count('leaks_detected')
+            print(f"Connection leak detected in endpoint {request.endpoint}")
+            conn.close()
+
+# Queries that find the highest number already issued for a sequence, used to
+# seed a (name, year) row the first time it is needed
+SEQUENCE_SEED_QUERIES = {
+    'APP': "SELECT MAX(application_number) FROM applications WHERE application_number LIKE CONCAT(%s, '%%')",
+    'REP': "SELECT MAX(application_number) FROM applications WHERE application_number LIKE CONCAT(%s, '%%')",
+    'ID': "SELECT MAX(generated_id_number) FROM applications WHERE generated_id_number LIKE CONCAT(%s, '%%')"
+}
+
+def reserve_sequence_range(conn, name, year, count):
+    """Reserve count consecutive values of a yearly sequence and return the first one.
+
+    Runs inside the caller's transaction: the sequence row stays locked until
+    the caller commits, and a rollback releases the reserved values.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT next_value FROM number_sequences WHERE name = %s AND year = %s FOR UPDATE
+    """, (name, year))
+    row = cursor.fetchone()
+
+    if row is None:
+        # First use of this sequence for the year: continue after any numbers issued before it existed
+        prefix = f"{name}{year}"
+        cursor.execute(SEQUENCE_SEED_QUERIES[name], (prefix,))
+        last_issued = cursor.fetchone()[0]
+        next_value = int(last_issued[len(prefix):]) + 1 if last_issued else 1
+        cursor.execute("""
+            INSERT IGNORE INTO number_sequences (name, year, next_value) VALUES (%s, %s, %s)
+        """, (name, year, next_value))
+        cursor.execute("""
+            SELECT next_value FROM number_sequences WHERE name = %s AND year = %s FOR UPDATE
+        """, (name, year))
+        row = cursor.fetchone()
+
+    start = row[0]
+    cursor.execute("""
+        UPDATE number_sequences SET next_value = next_value + %s WHERE name = %s AND year = %s
+    """, (count, name, year))
+    cursor.close()
+    return start
+
+class BlockSequenceAllocator:
+    """Hands out application numbers from blocks reserved per worker.
+
+    Each block costs one short transaction on the sequence row, so allocating
+    a number does not depend on the size of the applications table. Numbers
+    from a block that a worker never uses are skipped.
+
+    The block is reserved on the caller's connection rather than a second
+    one from the pool, and committed straight away, so callers allocate
+    before they write anything in their own transaction.
+    """
+
+    def __init__(self, name, block_size=20, digits=6):
+        self.name = name
+        self.block_size = block_size
+        self.digits = digits
+        self._blocks = {}  # year -> [next value, end value)
+        self._lock = threading.Lock()
+
+    def _reserve_block(self, conn, year, size):
+        try:
+            start = reserve_sequence_range(conn, self.name, year, size)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return [start, start + size]
+
+    def allocate(self, conn, count=1):
+        """Return count new numbers for the current year, reserving a block on conn if needed"""
+        year = datetime.now().year
+        numbers = []
+        with self._lock:
+            while len(numbers) < count:
+                block = self._blocks.get(year)
+                if not block or block[0] >= block[1]:
+                    block = self._reserve_block(conn, year, max(self.block_size, count - len(numbers)))
+                    self._blocks = {year: block}
+                take = min(block[1] - block[0], count - len(numbers))
+                numbers.extend(range(block[0], block[0] + take))
+                block[0] += take
+        return [f"{self.name}{year}{value:0{self.digits}d}" for value in numbers]
+
+    def next_number(self, conn):
+        return self.allocate(conn, 1)[0]
+
+def allocate_id_numbers(conn, count=1):
+    """Issue count consecutive national ID numbers inside the caller's transaction.
+
+    The ID sequence row stays locked until the approval commits, so numbers
+    are never handed out twice, and a rolled-back approval returns its numbers
+    to the sequence instead of leaving a gap. Callers approving in bulk should
+    lock their applications first and reserve exactly as many numbers as they
+    will assign.
+    """
+    year = datetime.now().year
+    start = reserve_sequence_range(conn, 'ID', year, count)
+    return [f"ID{year}{value:08d}" for value in range(start, start + count)]
+
+APPLICATION_NUMBERS = BlockSequenceAllocator('APP', SEQUENCE_CONFIG['application_block_size'])
+REPLACEMENT_NUMBERS = BlockSequenceAllocator('REP', SEQUENCE_CONFIG['application_block_size'])
+
+def create_mpesa_session():
+    """Create a keep-alive HTTP session shared by all Daraja calls"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=MPESA_CONFIG['http_pool_size']
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+MPESA_SESSION = create_mpesa_session()
+
+class MpesaTokenCache:
+    """Caches the Daraja OAuth token until shortly before it expires"""
+
+    def __init__(self, refresh_margin=60):
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {'hits': 0, 'refreshes': 0, 'failures': 0}
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _valid_token(self):
+        if self._token and time.monotonic() < self._expires_at - self.refresh_margin:
+            return self._token
+        return None
+
+    def get(self):
+        token = self._valid_token()
+        if token:
+            self._count('hits')
+            return token
+
+        # Only one thread refreshes; the rest wait and reuse its result
+        with self._lock:
+            token = self._valid_token()
+            if token:
+                self._count('hits')
+                return token
+
+            token_data = fetch_mpesa_access_token()
+            if not token_data or not token_data.get('access_token'):
+                self._count('failures')
+                return None
+
+            self._token = token_data['access_token']
+            self._expires_at = time.monotonic() + int(token_data.get('expires_in', 3599))
+            self._count('refreshes')
+            return self._token
+
+    def invalidate(self):
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+
+MPESA_TOKEN_CACHE = MpesaTokenCache(MPESA_CONFIG['token_refresh_margin'])
+
+def fetch_mpesa_access_token():
+    """Request a new OAuth token from Daraja"""
     try:
         print("Attempting to get M-Pesa access token...")
         url = f"{MPESA_CONFIG['base_url']}/oauth/v1/generate?grant_type=client_credentials"
@@ -52,19 +566,22 @@ def get_mpesa_access_token():
         }
         
         print(f"M-Pesa token URL: {url}")
-        response = requests.get(url, headers=headers)
+        response = MPESA_SESSION.get(url, headers=headers, timeout=MPESA_CONFIG['timeout'])
         print(f"M-Pesa token response status: {response.status_code}")
-        print(f"M-Pesa token response: {response.text}")
         
         response.raise_for_status()
         token_data = response.json()
         access_token = token_data.get('access_token')
         print(f"Successfully got access token: {access_token[:10]}..." if access_token else "No access token received")
-        return access_token
+        return token_data
     except Exception as e:
         print(f"Error getting M-Pesa token: {str(e)}")
         return None
 
+def get_mpesa_access_token():
+    """Get M-Pesa access token"""
+    return MPESA_TOKEN_CACHE.get()
+
 def initiate_stk_push(phone_number, amount, account_reference, transaction_desc):
     """Initiate M-Pesa STK push"""
     try:
@@ -102,8 +619,12 @@ def initiate_stk_push(phone_number, amount, account_reference, transaction_desc)
         print(f"STK push URL: {url}")
         print(f"STK push payload: {payload}")
         
-        response = requests.post(url, json=payload, headers=headers)
+        response = MPESA_SESSION.post(url, json=payload, headers=headers, timeout=MPESA_CONFIG['timeout'])
         print(f"STK push response status: {response.status_code}")
+
+        # Token revoked or rotated early; drop it so the next payment fetches a new one
+        if response.status_code == 401:
+            MPESA_TOKEN_CACHE.invalidate()
         print(f"STK push response: {response.text}")
         
         response_data = response.json()
@@ -120,6 +641,812 @@ def initiate_stk_push(phone_number, amount, account_reference, transaction_desc)
         print(f"Error initiating STK push: {str(e)}")
         return {'success': False, 'error': str(e)}
 
+def format_mpesa_phone_number(phone_number):
+    """Normalize a phone number to the 254XXXXXXXXX format Daraja expects"""
+    if phone_number.startswith('0'):
+        return '254' + phone_number[1:]
+    if not phone_number.startswith('254'):
+        return '254' + phone_number
+    return phone_number
+
+class StkPushDispatcher:
+    """Runs STK pushes on a bounded thread pool and records the outcome on the payment row"""
+
+    def __init__(self, max_workers=8, max_pending=200):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stk-push')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.stats = {'submitted': 0, 'succeeded': 0, 'failed': 0, 'rejected': 0}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def submit(self, payment_id, phone_number, amount, account_reference, transaction_desc):
+        """Queue an STK push; returns False when the dispatcher is saturated"""
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            return False
+
+        self._count('submitted')
+        future = self._executor.submit(
+            self._run, payment_id, phone_number, amount, account_reference, transaction_desc
+        )
+        future.add_done_callback(lambda f: self._slots.release())
+        return True
+
+    def _run(self, payment_id, phone_number, amount, account_reference, transaction_desc):
+        try:
+            stk_response = initiate_stk_push(phone_number, amount, account_reference, transaction_desc)
+            print(f"STK push response for payment {payment_id}: {stk_response}")
+
+            # Worker threads have no request teardown, so the connection must go back here
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                if stk_response.get('CheckoutRequestID'):
+                    cursor.execute("""
+                        UPDATE payments SET mpesa_checkout_id = %s WHERE id = %s
+                    """, (stk_response['CheckoutRequestID'], payment_id))
+                    self._count('succeeded')
+                else:
+                    cursor.execute("""
+                        UPDATE payments SET status = 'failed', failure_reason = %s WHERE id = %s
+                    """, (str(stk_response.get('error', 'Unknown error'))[:255], payment_id))
+                    self._count('failed')
+                conn.commit()
+                cursor.close()
+                
+                # The callback may have beaten us here; apply it now that it can be matched
+                if stk_response.get('CheckoutRequestID'):
+                    try:
+                        reconcile_mpesa_callback(conn, stk_response['CheckoutRequestID'])
+                    except Exception as e:
+                        print(f"Error applying early M-Pesa callback for payment {payment_id}: {str(e)}")
+        except Exception as e:
+            self._count('failed')
+            print(f"Error dispatching STK push for payment {payment_id}: {str(e)}")
+
+STK_DISPATCHER = StkPushDispatcher(**PAYMENT_DISPATCH_CONFIG)
+
+def encode_page_cursor(sort_value, row_id):
+    """Build the opaque next-page cursor from the last row's sort key"""
+    raw = json.dumps([sort_value.isoformat() if sort_value else None, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode('utf-8')
+
+def decode_page_cursor(token):
+    """Parse a cursor produced by encode_page_cursor; raises ValueError if it is malformed"""
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def parse_page_args():
+    """Read limit, cursor and include_total from the query string.
+
+    A request with neither limit nor cursor gets the whole list (limit None),
+    as these endpoints returned before they were paginated.
+    """
+    cursor_token = request.args.get('cursor')
+    if 'limit' in request.args or cursor_token:
+        limit = request.args.get('limit', PAGINATION_CONFIG['default_limit'], type=int)
+        limit = max(1, min(limit, PAGINATION_CONFIG['max_limit']))
+    else:
+        limit = None
+    return {
+        'limit': limit,
+        'cursor': decode_page_cursor(cursor_token) if cursor_token else None,
+        'include_total': request.args.get('include_total', '').lower() in ('1', 'true', 'yes')
+    }
+
+def application_filters_from_args(alias='a'):
+    """Translate status/type/constituency/officer_id query parameters into SQL conditions"""
+    conditions = []
+    params = []
+    filters = [
+        ('status', 'status'),
+        ('type', 'application_type'),
+        ('constituency', 'constituency'),
+        ('officer_id', 'officer_id')
+    ]
+    for arg, column in filters:
+        value = request.args.get(arg)
+        if value and value != 'all':
+            if arg == 'officer_id':
+                try:
+                    value = int(value)
+                except ValueError:
+                    raise ValueError('officer_id must be an integer')
+            conditions.append(f"{alias}.{column} = %s")
+            params.append(value)
+    return conditions, params
+
+def fetch_keyset_page(cursor, select_sql, from_sql, conditions, params, sort_column, id_column, page,
+                      count_from_sql=None):
+    """Fetch one page ordered by (sort_column, id_column) DESC using keyset pagination.
+
+    select_sql holds the SELECT list and from_sql the FROM/JOIN clause. The
+    optional total is counted over count_from_sql when given, so lookup joins
+    can be left out of the count. Returns (rows, next_cursor, total).
+    """
+    page_conditions = list(conditions)
+    page_params = list(params)
+    if page['cursor']:
+        sort_value, last_id = page['cursor']
+        page_conditions.append(f"({sort_column} < %s OR ({sort_column} = %s AND {id_column} < %s))")
+        page_params.extend([sort_value, sort_value, last_id])
+
+    where_sql = f" WHERE {' AND '.join(page_conditions)}" if page_conditions else ''
+    limit_sql = ''
+    if page['limit'] is not None:
+        limit_sql = " LIMIT %s"
+        page_params.append(page['limit'] + 1)
+    cursor.execute(
+        f"{select_sql} {from_sql}{where_sql} ORDER BY {sort_column} DESC, {id_column} DESC{limit_sql}",
+        page_params
+    )
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if page['limit'] is not None and len(rows) > page['limit']:
+        rows = rows[:page['limit']]
+        last = rows[-1]
+        next_cursor = encode_page_cursor(last[sort_column.split('.')[-1]], last[id_column.split('.')[-1]])
+
+    total = None
+    if page['include_total']:
+        count_where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        cursor.execute(f"SELECT COUNT(*) AS total {count_from_sql or from_sql}{count_where}", params)
+        total = cursor.fetchone()['total']
+
+    return rows, next_cursor, total
+
+def page_response(key, rows, next_cursor, total, page):
+    payload = {key: rows, 'next_cursor': next_cursor, 'limit': page['limit']}
+    if page['include_total']:
+        payload['total'] = total
+    return jsonify(payload), 200
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ttl seconds after they are stored"""
+
+    _MISSING = object()
+
+    def __init__(self, max_entries=256, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.stats['misses'] += 1
+                return default
+            self._data.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.stats['invalidations'] += 1
+
+    def invalidate_where(self, predicate):
+        """Drop every entry for which predicate(key) is true"""
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+                self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.stats)
+            data['entries'] = len(self._data)
+        lookups = data['hits'] + data['misses']
+        data['hit_rate'] = data['hits'] / lookups if lookups else 0.0
+        return data
+
+class ReportCache(TTLCache):
+    """Report results keyed by the normalized filter tuple (start, end, status, type, constituency).
+
+    Concurrent misses for the same filters share a single database load, and
+    status changes drop only the entries whose date range covers the change.
+    """
+
+    def __init__(self, max_entries=128, ttl=300):
+        super().__init__(max_entries, ttl)
+        self._in_flight = {}
+        self._generation = 0
+        self.stats['coalesced'] = 0
+
+    def get_or_load(self, key, loader):
+        value = self.get(key, self._MISSING)
+        if value is not self._MISSING:
+            return value
+
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = {'event': threading.Event(), 'value': None, 'error': None}
+                self._in_flight[key] = flight
+                generation = self._generation
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            flight['event'].wait()
+            if flight['error'] is not None:
+                raise flight['error']
+            return flight['value']
+
+        try:
+            value = loader()
+            flight['value'] = value
+            # Only keep the result if no invalidation happened while it was loading
+            with self._lock:
+                stale = generation != self._generation
+            if not stale:
+                self.set(key, value)
+            return value
+        except Exception as e:
+            flight['error'] = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight['event'].set()
+
+    def invalidate_dates(self, dates):
+        """Drop cached reports whose [start_date, end_date] covers any of the given dates"""
+        days = {day.isoformat() if hasattr(day, 'isoformat') else str(day) for day in dates}
+        if not days:
+            return
+        with self._lock:
+            self._generation += 1
+        self.invalidate_where(lambda key: any(key[0] <= day <= key[1] for day in days))
+
+REPORT_CACHE = ReportCache(**REPORT_CACHE_CONFIG)
+
+class OfficerStatusCache(TTLCache):
+    """Officer id -> status, so submissions can skip the officers lookup"""
+
+    def __init__(self, max_entries=2048, ttl=30):
+        super().__init__(max_entries, ttl)
+        self._generation = 0
+
+    def get_status(self, conn, officer_id):
+        """Return the officer's status, or None if there is no such officer"""
+        try:
+            key = int(officer_id)
+        except (TypeError, ValueError):
+            return None
+        status = self.get(key, self._MISSING)
+        if status is not self._MISSING:
+            return status
+
+        with self._lock:
+            generation = self._generation
+        cursor = conn.cursor()
+        cursor.execute("SELECT status FROM officers WHERE id = %s", (key,))
+        row = cursor.fetchone()
+        cursor.close()
+        status = row[0] if row else None
+
+        # An admin action that landed while we were reading wins over what we read
+        with self._lock:
+            stale = generation != self._generation
+        if not stale:
+            self.set(key, status)
+        return status
+
+    def invalidate(self, officer_id):
+        """Forget an officer after a status change; call after the change commits"""
+        with self._lock:
+            self._generation += 1
+        super().invalidate(int(officer_id))
+
+OFFICER_STATUS_CACHE = OfficerStatusCache(**OFFICER_CACHE_CONFIG)
+
+def is_officer_approved(conn, officer_id):
+    return OFFICER_STATUS_CACHE.get_status(conn, officer_id) == 'approved'
+
+class TrackerCache(TTLCache):
+    """Application number -> public tracker fields, or None for unknown numbers"""
+
+    def __init__(self, max_entries=20000, ttl=30):
+        super().__init__(max_entries, ttl)
+        self._generation = 0
+
+    def load(self, application_number):
+        """Read an application after a cache miss and keep it"""
+        with self._lock:
+            generation = self._generation
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT application_number, full_names, status, created_at, updated_at
+            FROM applications WHERE application_number = %s
+        """, (application_number,))
+        application = cursor.fetchone()
+        cursor.close()
+        conn.close()
+
+        # A status change that committed while we were reading wins over what we read
+        with self._lock:
+            stale = generation != self._generation
+        if not stale:
+            self.set(application_number, application)
+        return application
+
+    def invalidate_numbers(self, application_numbers):
+        """Forget applications after a status change; call after the change commits"""
+        with self._lock:
+            self._generation += 1
+        for application_number in application_numbers:
+            self.invalidate(application_number)
+
+TRACKER_CACHE = TrackerCache(**TRACKER_CACHE_CONFIG)
+
+class TokenBucketLimiter:
+    """Per-client token buckets; each allowed request spends one token"""
+
+    def __init__(self, rate=1.0, burst=30, max_clients=50000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # client -> (tokens, last refill)
+        self._lock = threading.Lock()
+        self.stats = {'allowed': 0, 'throttled': 0}
+
+    def client_key(self):
+        # remote_addr already reflects the trusted proxy when ProxyFix is on
+        return request.remote_addr or 'unknown'
+
+    def acquire(self, client):
+        """Spend a token; returns 0 if allowed, otherwise seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+                self.stats['allowed'] += 1
+            else:
+                wait = (1 - tokens) / self.rate
+                self.stats['throttled'] += 1
+            self._buckets[client] = (tokens, now)
+            # A dropped idle bucket would have refilled to the full burst anyway
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self.stats)
+            data['clients'] = len(self._buckets)
+        return data
+
+TRACKER_LIMITER = TokenBucketLimiter(**TRACKER_RATE_LIMIT_CONFIG)
+
+def resolve_constituency_id(conn, name):
+    """Map a constituency name to its catalogue id, or None if it is not in the catalogue"""
+    name = (name or '').strip()
+    if not name:
+        return None
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM constituencies WHERE name = %s", (name,))
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row else None
+
+# Status transitions
+def lock_applications(conn, application_ids):
+    """Lock applications for a status change and return them keyed by id"""
+    if not application_ids:
+        return {}
+    cursor = conn.cursor(dictionary=True)
+    placeholders = ', '.join(['%s'] * len(application_ids))
+    cursor.execute(f"""
+        SELECT id, application_number, officer_id, status, application_type, constituency,
+               created_at, existing_id_number, generated_id_number
+        FROM applications
+        WHERE id IN ({placeholders})
+        FOR UPDATE
+    """, list(application_ids))
+    rows = {row['id']: row for row in cursor.fetchall()}
+    cursor.close()
+    return rows
+
+def status_change(row, new_status):
+    """Describe the move of a locked application row to new_status"""
+    return {
+        'application_id': row['id'],
+        'application_number': row['application_number'],
+        'officer_id': row['officer_id'],
+        'application_type': row['application_type'],
+        'constituency': row['constituency'],
+        'created_at': row['created_at'],
+        'old_status': row['status'],
+        'new_status': new_status
+    }
+
+def new_application_change(application_id, application_number, officer_id, application_type,
+                           constituency, created_at):
+    """Describe a freshly inserted application, which enters as 'submitted'"""
+    return {
+        'application_id': application_id,
+        'application_number': application_number,
+        'officer_id': officer_id,
+        'application_type': application_type,
+        'constituency': constituency,
+        'created_at': created_at,
+        'old_status': None,
+        'new_status': 'submitted'
+    }
+
+def request_actor():
+    """(admin_id, officer_id, notes) for whoever is making the current request"""
+    if not has_request_context():
+        return None, None, None
+    admin_id = officer_id = None
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        try:
+            payload = jwt.decode(auth_header.split(' ')[1], app.config['SECRET_KEY'], algorithms=['HS256'])
+            admin_id = payload.get('admin_id')
+            officer_id = payload.get('officer_id')
+        except jwt.InvalidTokenError:
+            pass
+    station_id = g.get('station_id')
+    return admin_id, officer_id, f'station {station_id}' if station_id else None
+
+class StatusAuditWriter:
+    """Write-behind buffer for status_history rows.
+
+    In buffered mode rows are queued once their transaction has committed
+    (see publish_status_changes), so a rollback never leaves history behind.
+    """
+
+    INSERT = """
+        INSERT INTO status_history
+            (application_id, old_status, new_status, changed_by_admin_id,
+             changed_by_officer_id, changed_at, notes)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """
+
+    def __init__(self, mode='buffered', batch_size=500, flush_interval=2.0, max_pending=100000):
+        self.strict = mode == 'strict'
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = deque()
+        self.dead_letter = deque(maxlen=1000)  # Rows the database refused even without an actor
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.stats = {'written': 0, 'batches': 0, 'failures': 0, 'dropped': 0,
+                      'actor_cleared': 0, 'dead_lettered': 0}
+
+    def write(self, conn, rows):
+        """Insert rows on conn in batches; the caller commits"""
+        cursor = conn.cursor()
+        for start in range(0, len(rows), self.batch_size):
+            # executemany sends a plain INSERT ... VALUES as one multi-row statement
+            cursor.executemany(self.INSERT, rows[start:start + self.batch_size])
+        cursor.close()
+
+    def enqueue(self, rows):
+        with self._lock:
+            self._pending.extend(rows)
+            overflow = len(self._pending) - self.max_pending
+            for _ in range(max(overflow, 0)):
+                self._pending.popleft()
+            if overflow > 0:
+                self.stats['dropped'] += overflow
+            full = len(self._pending) >= self.batch_size
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='status-audit', daemon=True)
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything queued so far; rows go back on the queue if the insert fails"""
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                if not batch:
+                    return
+                conn = None
+                done = written = 0
+                try:
+                    conn = get_db_connection()
+                    try:
+                        self.write(conn, batch)
+                        conn.commit()
+                        done = written = len(batch)
+                    except (mysql.connector.IntegrityError, mysql.connector.DataError):
+                        # Some row can never be written as it stands, typically an actor
+                        # deleted since; find it rather than retrying the batch forever
+                        conn.rollback()
+                        for row in batch:
+                            written += self._write_row(conn, row)
+                            done += 1
+                except Exception as e:
+                    # Connection or server trouble: keep what is left for the next flush
+                    print(f"Status audit flush failed, {len(batch) - done} row(s) kept for retry: {e}")
+                    with self._lock:
+                        self._pending.extendleft(reversed(batch[done:]))
+                        self.stats['failures'] += 1
+                        self.stats['written'] += written
+                    return
+                finally:
+                    if conn is not None:
+                        conn.close()
+                with self._lock:
+                    self.stats['written'] += written
+                    self.stats['batches'] += 1
+
+    def _write_row(self, conn, row):
+        """Write one row, dropping its actor if needed; returns 1 if written, 0 if it went to dead_letter"""
+        cursor = conn.cursor()
+        try:
+            for attempt in (row, row[:3] + (None, None) + row[5:]):
+                try:
+                    cursor.execute(self.INSERT, attempt)
+                    conn.commit()
+                    if attempt is not row:
+                        with self._lock:
+                            self.stats['actor_cleared'] += 1
+                    return 1
+                except (mysql.connector.IntegrityError, mysql.connector.DataError) as e:
+                    conn.rollback()
+                    error = e
+            print(f"Status audit row for application {row[0]} refused, moved to dead letter: {error}")
+            with self._lock:
+                self.dead_letter.append(row)
+                self.stats['dead_lettered'] += 1
+            return 0
+        finally:
+            cursor.close()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, 'mode': 'strict' if self.strict else 'buffered',
+                    'pending': len(self._pending), 'dead_letter': len(self.dead_letter)}
+
+STATUS_AUDIT = StatusAuditWriter(**STATUS_AUDIT_CONFIG)
+atexit.register(STATUS_AUDIT.flush)
+
+def status_history_rows(changes):
+    return [change['history'] for change in changes if 'history' in change]
+
+def existing_actors(conn, admin_id, officer_id):
+    """Drop actor ids whose account no longer exists; a valid token can outlive its account"""
+    if officer_id and OFFICER_STATUS_CACHE.get_status(conn, officer_id) is None:
+        officer_id = None
+    if admin_id:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM admins WHERE id = %s", (admin_id,))
+        if not cursor.fetchone():
+            admin_id = None
+        cursor.close()
+    return admin_id, officer_id
+
+def record_status_changes(conn, changes):
+    """Apply status changes to the daily rollup and status history inside the caller's transaction"""
+    admin_id, officer_id, notes = request_actor()
+    if STATUS_AUDIT.strict:
+        # A history row that breaks a foreign key would fail the status change itself
+        admin_id, officer_id = existing_actors(conn, admin_id, officer_id)
+    now = datetime.now()
+    for change in changes:
+        if change['old_status'] == change['new_status']:
+            continue
+        # Submissions without a token are made by the officer named on the application
+        actor_officer_id = officer_id or (change['officer_id'] if change['old_status'] is None else None)
+        change['history'] = (change['application_id'], change['old_status'], change['new_status'],
+                             admin_id, actor_officer_id, now, notes)
+    if STATUS_AUDIT.strict:
+        STATUS_AUDIT.write(conn, status_history_rows(changes))
+
+    deltas = {}
+    for change in changes:
+        if change['old_status'] == change['new_status']:
+            continue
+        key = (change['created_at'].date(), change['constituency'] or '', change['application_type'])
+        if change['old_status'] is not None:
+            deltas[key + (change['old_status'],)] = deltas.get(key + (change['old_status'],), 0) - 1
+        deltas[key + (change['new_status'],)] = deltas.get(key + (change['new_status'],), 0) + 1
+
+    rows = [key + (delta,) for key, delta in sorted(deltas.items()) if delta]
+    if rows:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT INTO application_daily_stats
+                (stat_date, constituency, application_type, status, application_count)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE application_count = application_count + VALUES(application_count)
+        """, rows)
+        cursor.close()
+
+def transition_application(conn, application_id, new_status, allowed=None, extra_sets='', extra_params=()):
+    """Move one application to new_status and update the rollup in the same transaction.
+
+    allowed is a tuple of statuses, or a predicate on the locked row, that the
+    application must currently satisfy. Returns the change, or None when the
+    application does not exist or is not in an allowed state.
+    """
+    row = lock_applications(conn, [application_id]).get(application_id)
+    if not row:
+        return None
+    if allowed is not None:
+        permitted = allowed(row) if callable(allowed) else row['status'] in allowed
+        if not permitted:
+            return None
+
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        UPDATE applications 
+        SET status = %s, updated_at = %s{extra_sets}
+        WHERE id = %s
+    """, (new_status, datetime.now()) + tuple(extra_params) + (application_id,))
+    cursor.close()
+
+    change = status_change(row, new_status)
+    record_status_changes(conn, [change])
+    return change
+
+class StatusBroker:
+    """In-process feed of committed status changes for SSE and long-poll clients.
+
+    Events get consecutive versions within this worker; cursors are
+    "<stream id>:<version>" so a client that reconnects to another worker, or
+    to this one after a restart, is told to reload instead of missing events.
+    """
+
+    def __init__(self, buffer_size=10000, heartbeat=15, max_poll_wait=25, max_subscribers=5000):
+        self.stream_id = uuid.uuid4().hex[:8]
+        self.heartbeat = heartbeat
+        self.max_poll_wait = max_poll_wait
+        self.max_subscribers = max_subscribers
+        self._events = deque(maxlen=buffer_size)  # (version, event)
+        self._version = 0
+        self._subscribers = 0
+        self._cond = threading.Condition()
+        self.stats = {'published': 0, 'delivered': 0, 'resets': 0, 'refused': 0}
+
+    def publish(self, changes):
+        now = datetime.now().isoformat()
+        with self._cond:
+            for change in changes:
+                self._version += 1
+                self._events.append((self._version, {
+                    'application_id': change['application_id'],
+                    'application_number': change['application_number'],
+                    'officer_id': change['officer_id'],
+                    'constituency': change['constituency'],
+                    'old_status': change['old_status'],
+                    'status': change['new_status'],
+                    'at': now
+                }))
+            self.stats['published'] += len(changes)
+            self._cond.notify_all()
+
+    def cursor(self, version):
+        return f"{self.stream_id}:{version}"
+
+    def parse_cursor(self, token):
+        """Return (version, reset) for a client cursor; no cursor starts at the current version"""
+        with self._cond:
+            current = self._version
+            oldest = self._events[0][0] if self._events else current + 1
+        if not token:
+            return current, False
+        stream_id, _, version = token.partition(':')
+        if stream_id != self.stream_id or not version.isdigit() or int(version) > current:
+            return current, True
+        if int(version) < oldest - 1:
+            return current, True  # Events the client missed have left the buffer
+        return int(version), False
+
+    def subscribe(self):
+        with self._cond:
+            if self._subscribers >= self.max_subscribers:
+                self.stats['refused'] += 1
+                return False
+            self._subscribers += 1
+            return True
+
+    def unsubscribe(self):
+        with self._cond:
+            self._subscribers -= 1
+
+    def full(self):
+        with self._cond:
+            return self._subscribers >= self.max_subscribers
+
+    def wait(self, version, matches, timeout):
+        """Block until events after version match, or timeout; returns (events, new version)"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                events = []
+                for event_version, event in reversed(self._events):
+                    if event_version <= version:
+                        break
+                    if matches(event):
+                        events.append(dict(event, version=event_version))
+                # Non-matching events are skipped for good, not rescanned on the next wake-up
+                version = self._version
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0:
+                    events.reverse()
+                    self.stats['delivered'] += len(events)
+                    return events, version
+                self._cond.wait(remaining)
+
+    def snapshot(self):
+        with self._cond:
+            return {**self.stats, 'version': self._version, 'subscribers': self._subscribers,
+                    'buffered': len(self._events)}
+
+STATUS_BROKER = StatusBroker(**STATUS_EVENTS_CONFIG)
+
+def publish_status_changes(changes):
+    """Notify in-process caches and subscribers of committed status changes; call only after commit"""
+    if not changes:
+        return
+    dates = {change['created_at'].date() for change in changes}
+    REPORT_CACHE.invalidate_dates(dates)
+    REPORT_JOBS.invalidate_dates(dates)
+    TRACKER_CACHE.invalidate_numbers({change['application_number'] for change in changes})
+    STATUS_BROKER.publish(changes)
+    if not STATUS_AUDIT.strict:
+        STATUS_AUDIT.enqueue(status_history_rows(changes))
+
+def rebuild_daily_stats(conn):
+    """Recompute the daily rollup from the applications table"""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM application_daily_stats")
+    cursor.execute("""
+        INSERT INTO application_daily_stats
+            (stat_date, constituency, application_type, status, application_count)
+        SELECT DATE(created_at), COALESCE(constituency, ''), application_type, COALESCE(status, ''), COUNT(*)
+        FROM applications
+        GROUP BY DATE(created_at), COALESCE(constituency, ''), application_type, COALESCE(status, '')
+    """)
+    rows = cursor.rowcount
+    cursor.close()
+    return rows
+
 # Officer Authentication Routes
 @app.route('/api/officer/signup', methods=['POST'])
 def officer_signup():
@@ -139,17 +1466,22 @@ def officer_signup():
         cursor.execute("SELECT id FROM officers WHERE id_number = %s OR email = %s", 
                       (data['idNumber'], data['email']))
         if cursor.fetchone():
+            cursor.close()
+            conn.close()
             return jsonify({'error': 'Officer with this ID number or email already exists'}), 400
         
         # Hash password
         hashed_password = generate_password_hash(data['password'])
         
         # Insert new officer (pending approval)
+        constituency = data['constituency'].strip()
         cursor.execute("""
-            INSERT INTO officers (id_number, email, phone_number, full_name, station, constituency, password_hash, status, created_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, 'pending', %s)
+            INSERT INTO officers (id_number, email, phone_number, full_name, station, constituency,
+                                  constituency_id, password_hash, status, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'pending', %s)
         """, (data['idNumber'], data['email'], data['phoneNumber'], 
-              data['fullName'], data['station'], data['constituency'], hashed_password, datetime.now()))
+              data['fullName'], data['station'], constituency, resolve_constituency_id(conn, constituency),
+              hashed_password, datetime.now()))
         
         conn.commit()
         cursor.close()
@@ -267,19 +1599,79 @@ def admin_login():
         return jsonify({'error': str(e)}), 500
 
 # Constituency Management Routes
+def bump_cache_version(conn, name):
+    """Mark a cached catalogue as changed; runs inside the writer's transaction"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO cache_versions (name, version) VALUES (%s, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1
+    """, (name,))
+    cursor.close()
+
+class ConstituencyCatalogue:
+    """The constituency list, serialized once per version.
+
+    Writers bump cache_versions.constituencies in their transaction. Each
+    worker re-reads that single row at most every recheck_interval seconds and
+    reloads the list only when the version moved, so other workers see a
+    change within that interval and the worker that made it sees it at once.
+    """
+
+    def __init__(self, recheck_interval=5):
+        self.recheck_interval = recheck_interval
+        self._entry = None  # (version, body, etag)
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {'served': 0, 'not_modified': 0, 'version_checks': 0, 'reloads': 0}
+
+    def current(self):
+        """Return (body, etag), hitting the database only when the recheck interval has passed"""
+        with self._lock:
+            if self._entry and time.monotonic() - self._checked_at < self.recheck_interval:
+                return self._entry[1], self._entry[2]
+
+            conn = get_db_connection()
+            try:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute("SELECT version FROM cache_versions WHERE name = 'constituencies'")
+                row = cursor.fetchone()
+                version = row['version'] if row else 0
+                self.stats['version_checks'] += 1
+
+                if not self._entry or self._entry[0] != version:
+                    cursor.execute("SELECT id, name, created_at FROM constituencies ORDER BY name")
+                    body = app.json.dumps({'constituencies': cursor.fetchall()})
+                    etag = f"{version}-{hashlib.sha256(body.encode()).hexdigest()[:16]}"
+                    self._entry = (version, body, etag)
+                    self.stats['reloads'] += 1
+                cursor.close()
+            finally:
+                conn.close()
+            self._checked_at = time.monotonic()
+            return self._entry[1], self._entry[2]
+
+    def invalidate(self):
+        """Force a version check on the next request; call after a committed write"""
+        with self._lock:
+            self._checked_at = 0.0
+
+CONSTITUENCY_CATALOGUE = ConstituencyCatalogue(**CATALOGUE_CONFIG)
+
 @app.route('/api/constituencies', methods=['GET'])
 def get_constituencies():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        body, etag = CONSTITUENCY_CATALOGUE.current()
         
-        cursor.execute("SELECT id, name, created_at FROM constituencies ORDER BY name")
-        constituencies = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'constituencies': constituencies}), 200
+        if request.if_none_match.contains(etag):
+            CONSTITUENCY_CATALOGUE.stats['not_modified'] += 1
+            response = Response(status=304)
+        else:
+            CONSTITUENCY_CATALOGUE.stats['served'] += 1
+            response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        # Browsers keep the copy but revalidate on every use
+        response.cache_control.no_cache = True
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -304,10 +1696,23 @@ def add_constituency():
         
         cursor.execute("INSERT INTO constituencies (name, created_at) VALUES (%s, %s)", 
                       (name, datetime.now()))
+        constituency_id = cursor.lastrowid
+        
+        # Link officers and applications that already use this name
+        cursor.execute("""
+            UPDATE officers SET constituency_id = %s
+            WHERE constituency_id IS NULL AND TRIM(constituency) = %s
+        """, (constituency_id, name))
+        cursor.execute("""
+            UPDATE applications SET constituency_id = %s
+            WHERE constituency_id IS NULL AND TRIM(constituency) = %s
+        """, (constituency_id, name))
+        bump_cache_version(conn, 'constituencies')
         conn.commit()
         
         cursor.close()
         conn.close()
+        CONSTITUENCY_CATALOGUE.invalidate()
         
         return jsonify({'message': 'Constituency added successfully'}), 201
     except Exception as e:
@@ -325,9 +1730,11 @@ def delete_constituency(constituency_id):
             conn.close()
             return jsonify({'error': 'Constituency not found'}), 404
             
+        bump_cache_version(conn, 'constituencies')
         conn.commit()
         cursor.close()
         conn.close()
+        CONSTITUENCY_CATALOGUE.invalidate()
         
         return jsonify({'message': 'Constituency deleted successfully'}), 200
     except Exception as e:
@@ -367,6 +1774,8 @@ def approve_officer(officer_id):
         cursor.close()
         conn.close()
         
+        OFFICER_STATUS_CACHE.invalidate(officer_id)
+        
         return jsonify({'message': 'Officer approved successfully'}), 200
         
     except Exception as e:
@@ -384,14 +1793,423 @@ def reject_officer(officer_id):
         cursor.close()
         conn.close()
         
+        OFFICER_STATUS_CACHE.invalidate(officer_id)
+        
         return jsonify({'message': 'Officer rejected'}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+class UploadRejected(Exception):
+    """An uploaded file failed the size or type checks"""
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def blob_storage_path(sha256, extension):
+    """Sharded location of a blob under the upload directory: ab/cd/abcd...<ext>"""
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+def resolve_upload_path(name):
+    """Find a stored document by its documents.file_path or a bare blob name
+
+    Sharded paths are served as given. Bare names are looked up in the sharded
+    layout first and then in the flat directory, which still holds legacy
+    uploads and blobs that manage_uploads.py migrate has not moved yet.
+    """
+    upload_dir = UPLOAD_CONFIG['directory']
+    candidates = [name]
+    base = os.path.basename(name)
+    if '/' not in name and len(base) > 4:
+        candidates.insert(0, f"{base[:2]}/{base[2:4]}/{base}")
+    for candidate in candidates:
+        path = safe_join(upload_dir, candidate)
+        if path and os.path.isfile(path):
+            return candidate
+    return None
+
+def detect_upload_type(head):
+    """Return (mime_type, extension) for the first bytes of a file, or None"""
+    for signature, offset, mime_type, extension in UPLOAD_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            if mime_type == 'image/webp' and head[:4] != b'RIFF':
+                continue
+            return mime_type, extension
+    return None
+
+# Content-addressed document storage: every upload is stored once under the
+# SHA-256 of its bytes and documents rows point at the shared blob. Files are
+# staged beside the store and only renamed into place after the transaction
+# that references them commits.
+class StagedUploads:
+    def __init__(self):
+        self.staged = {}  # sha256 -> (temp path or None once placed, storage path)
+    
+    def add(self, file, field_name):
+        """Stream an upload to a temp file; returns (sha256, size, mime_type, extension)"""
+        upload_dir = UPLOAD_CONFIG['directory']
+        max_bytes = UPLOAD_CONFIG['max_file_bytes']
+        os.makedirs(upload_dir, exist_ok=True)
+        
+        digest = hashlib.sha256()
+        size = 0
+        detected = None
+        temp = tempfile.NamedTemporaryFile(dir=upload_dir, prefix='.incoming-', delete=False)
+        try:
+            with temp:
+                while True:
+                    chunk = file.stream.read(UPLOAD_CONFIG['chunk_size'])
+                    if not chunk:
+                        break
+                    if size == 0:
+                        detected = detect_upload_type(chunk)
+                        if not detected:
+                            raise UploadRejected(f'{field_name}: only JPEG, PNG, WEBP or PDF files are accepted', 415)
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise UploadRejected(f'{field_name}: file exceeds {max_bytes // (1024 * 1024)} MB', 413)
+                    digest.update(chunk)
+                    temp.write(chunk)
+            if size == 0:
+                raise UploadRejected(f'{field_name}: file is empty')
+        except Exception:
+            os.remove(temp.name)
+            raise
+        
+        mime_type, extension = detected
+        sha256 = digest.hexdigest()
+        if sha256 in self.staged:
+            os.remove(temp.name)  # The same file twice in one request is stored once
+        else:
+            self.staged[sha256] = (temp.name, blob_storage_path(sha256, extension))
+        return sha256, size, mime_type, extension
+    
+    def _place(self, temp_path, storage_path):
+        blob_path = os.path.join(UPLOAD_CONFIG['directory'], storage_path)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(temp_path, blob_path)
+    
+    def resolve(self, storage_paths, existing):
+        """Adopt the storage paths recorded in document_blobs; call before conn.commit()
+
+        A blob whose row already existed but whose file is missing is put in
+        place now, so the committed rows never point at nothing.
+        """
+        for sha256, (temp_path, _) in list(self.staged.items()):
+            if sha256 not in storage_paths:
+                continue
+            storage_path = storage_paths[sha256]
+            if temp_path and sha256 in existing and not os.path.exists(
+                os.path.join(UPLOAD_CONFIG['directory'], storage_path)
+            ):
+                print(f"Blob {sha256} was missing from {storage_path}; restoring it from this upload")
+                self._place(temp_path, storage_path)
+                temp_path = None
+            self.staged[sha256] = (temp_path, storage_path)
+    
+    def commit(self):
+        """Move staged files into the store; call after conn.commit()"""
+        for sha256, (temp_path, storage_path) in self.staged.items():
+            if temp_path:
+                try:
+                    if os.path.exists(os.path.join(UPLOAD_CONFIG['directory'], storage_path)):
+                        os.remove(temp_path)  # Already stored; keep the existing copy
+                    else:
+                        self._place(temp_path, storage_path)
+                except OSError as e:
+                    # The rows are committed; keep the staged copy so the blob can be put back by hand
+                    print(f"Could not store blob {sha256} at {storage_path} (staged copy kept at {temp_path}): {str(e)}")
+                    continue
+            THUMBNAILS.generate_all(storage_path)
+        self.staged = {}
+    
+    def discard(self):
+        """Delete staged files after a failed request"""
+        for temp_path, _ in self.staged.values():
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.staged = {}
+
+def derivative_path(path, size):
+    """Where the resized copy of an upload lives: beside it, as <name>.<size>.jpg"""
+    return f"{os.path.splitext(path)[0]}.{size}.jpg"
+
+def render_derivative(source_path, target_path, max_side, quality):
+    from PIL import Image, ImageOps  # Pillow is only needed once thumbnails are requested
+    
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side))
+        temp_path = f"{target_path}.{uuid.uuid4().hex}.tmp"
+        image.convert('RGB').save(temp_path, 'JPEG', quality=quality, optimize=True)
+    os.replace(temp_path, target_path)
+
+class DerivativeGenerator:
+    """Renders thumbnails of uploaded images in a thread pool, one render per file and size"""
+    
+    def __init__(self, sizes, image_extensions, quality=82, max_workers=2):
+        self.sizes = sizes
+        self.image_extensions = image_extensions
+        self.quality = quality
+        self.max_workers = max_workers
+        self._executor = None
+        self._pending = {}  # derivative path -> future, so concurrent requests share a render
+        self._lock = threading.Lock()
+        self._available = None
+        self.stats = {'generated': 0, 'failures': 0, 'coalesced': 0}
+    
+    def available(self):
+        if self._available is None:
+            try:
+                import PIL  # noqa: F401
+                self._available = True
+            except ImportError:
+                print("Pillow is not installed; serving original documents instead of thumbnails")
+                self._available = False
+        return self._available
+    
+    def supports(self, path):
+        return os.path.splitext(path)[1].lower() in self.image_extensions and self.available()
+    
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='thumbnail')
+        return self._executor
+    
+    def _render(self, path, size):
+        target = derivative_path(path, size)
+        upload_dir = UPLOAD_CONFIG['directory']
+        try:
+            render_derivative(os.path.join(upload_dir, path), os.path.join(upload_dir, target),
+                              self.sizes[size], self.quality)
+            self.stats['generated'] += 1
+        except Exception as e:
+            self.stats['failures'] += 1
+            print(f"Thumbnail {size} of {path} failed: {str(e)}")
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(target, None)
+    
+    def ensure(self, path, size):
+        """Return a future for the derivative, or None if it already exists or cannot be made"""
+        if not self.supports(path):
+            return None
+        target = derivative_path(path, size)
+        if os.path.exists(os.path.join(UPLOAD_CONFIG['directory'], target)):
+            return None
+        with self._lock:
+            future = self._pending.get(target)
+            if future:
+                self.stats['coalesced'] += 1
+            else:
+                future = self._get_executor().submit(self._render, path, size)
+                self._pending[target] = future
+        return future
+    
+    def generate_all(self, path):
+        """Queue every size for a newly stored upload without waiting"""
+        for size in self.sizes:
+            self.ensure(path, size)
+    
+    def snapshot(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {**self.stats, 'pending': pending}
+
+THUMBNAILS = DerivativeGenerator(
+    THUMBNAIL_CONFIG['sizes'],
+    THUMBNAIL_CONFIG['image_extensions'],
+    quality=THUMBNAIL_CONFIG['quality'],
+    max_workers=THUMBNAIL_CONFIG['max_workers']
+)
+
+def add_documents(cursor, entries, staged_uploads):
+    """Reference staged uploads from documents in the caller's transaction
+
+    entries are (application_id, doc_type, staged) tuples, where staged is what
+    StagedUploads.add returned, and staged_uploads the StagedUploads holding
+    their files. Returns the storage path of each entry.
+    """
+    hashes = list({staged[0] for _, _, staged in entries})
+    hash_placeholders = ', '.join(['%s'] * len(hashes))
+    cursor.execute(f"SELECT sha256 FROM document_blobs WHERE sha256 IN ({hash_placeholders})", hashes)
+    existing = {row[0] for row in cursor.fetchall()}
+    
+    # The first row for a hash decides its storage name; every document row
+    # referencing it, including repeats within this batch, adds one reference
+    cursor.executemany("""
+        INSERT INTO document_blobs (sha256, storage_path, size_bytes, mime_type, ref_count)
+        VALUES (%s, %s, %s, %s, 1)
+        ON DUPLICATE KEY UPDATE ref_count = ref_count + 1
+    """, [
+        (sha256, blob_storage_path(sha256, extension), size, mime_type)
+        for _, _, (sha256, size, mime_type, extension) in entries
+    ])
+    cursor.execute(f"""
+        SELECT sha256, storage_path FROM document_blobs
+        WHERE sha256 IN ({hash_placeholders})
+    """, hashes)
+    storage_paths = dict(cursor.fetchall())
+    # Files go where the blob row says, which may be a path adopted from before hashing
+    for uploads in staged_uploads:
+        uploads.resolve(storage_paths, existing)
+    
+    # file_path holds the path served under /uploads/
+    cursor.executemany("""
+        INSERT INTO documents (application_id, document_type, file_path, content_hash)
+        VALUES (%s, %s, %s, %s)
+    """, [
+        (application_id, doc_type, storage_paths[staged[0]], staged[0])
+        for application_id, doc_type, staged in entries
+    ])
+    return [storage_paths[staged[0]] for _, _, staged in entries]
+
+def add_document(cursor, uploads, application_id, doc_type, file):
+    """Stage an uploaded file and reference it from documents in the caller's transaction"""
+    staged = uploads.add(file, doc_type)
+    return add_documents(cursor, [(application_id, doc_type, staged)], [uploads])[0]
+
+# New application submissions
+NEW_APPLICATION_REQUIRED_FIELDS = [
+    'fullNames', 'dateOfBirth', 'gender', 'fatherName', 'motherName',
+    'districtOfBirth', 'tribe', 'homeDistrict', 'division',
+    'constituency', 'location', 'subLocation', 'villageEstate', 'occupation'
+]
+
+# Upload field name -> documents.document_type
+NEW_APPLICATION_DOC_TYPES = {
+    'passportPhoto': 'passport_photo',
+    'birthCertificate': 'birth_certificate',
+    'parentsId': 'parent_id_front'
+}
+
+NEW_APPLICATION_INSERT = """
+    INSERT INTO applications (
+        application_number, officer_id, application_type,
+        full_names, date_of_birth, gender, father_name, mother_name,
+        marital_status, husband_name, husband_id_no,
+        district_of_birth, tribe, clan, family, home_district,
+        division, constituency, constituency_id, location, sub_location, village_estate,
+        home_address, occupation, supporting_documents, status, created_at
+    ) VALUES (
+        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
+        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+    )
+"""
+
+def new_application_row(data, application_number, officer_id, constituency, constituency_id, created_at):
+    """Parameters for NEW_APPLICATION_INSERT from a submitted form"""
+    return (
+        application_number, officer_id, 'new',
+        data['fullNames'], data['dateOfBirth'], data['gender'],
+        data['fatherName'], data['motherName'], data.get('maritalStatus'),
+        data.get('husbandName'), data.get('husbandIdNo'),
+        data['districtOfBirth'], data['tribe'], data.get('clan'),
+        data.get('family'), data['homeDistrict'], data['division'],
+        constituency, constituency_id, data['location'], data['subLocation'],
+        data['villageEstate'], data.get('homeAddress'), data['occupation'],
+        json.dumps(data.get('supportingDocuments', {})), 'submitted', created_at
+    )
+
+# Lost ID replacements
+LOST_ID_REQUIRED_FIELDS = ['existing_id_number', 'ob_number', 'full_names']
+
+# Upload field names, which are also the documents.document_type values
+LOST_ID_DOC_TYPES = ('ob_photo', 'passport_photo', 'birth_certificate')
+
+LOST_ID_INSERT = """
+    INSERT INTO applications (
+        application_number, officer_id, application_type,
+        full_names, date_of_birth, gender, father_name, mother_name, 
+        marital_status, district_of_birth, tribe, home_district,
+        division, constituency, constituency_id, location, sub_location, village_estate,
+        occupation, existing_id_number, generated_id_number, renewal_reason, ob_number,
+        status, created_at
+    ) VALUES (
+        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+    )
+"""
+
+def parse_date_of_birth(value):
+    """Normalize an ISO or YYYY-MM-DD date of birth to YYYY-MM-DD, or None if it is missing or invalid"""
+    if not value or value in ('null', 'None') or not str(value).strip():
+        return None
+    try:
+        if 'T' in str(value):  # ISO format
+            return datetime.fromisoformat(str(value).replace('Z', '+00:00')).strftime('%Y-%m-%d')
+        if len(str(value)) == 10 and str(value).count('-') == 2:  # YYYY-MM-DD
+            datetime.strptime(str(value), '%Y-%m-%d')
+            return str(value)
+        print(f"Invalid date format: {value}")
+    except (ValueError, TypeError) as e:
+        print(f"Error parsing date_of_birth: {e}")
+    return None
+
+def lost_id_application_row(data, application_number, officer_id, constituency, constituency_id,
+                            date_of_birth, created_at):
+    """Parameters for LOST_ID_INSERT from a submitted lost ID form"""
+    return (
+        application_number, officer_id, 'renewal',
+        data['full_names'], date_of_birth, data.get('gender'),
+        data.get('father_name'), data.get('mother_name'), data.get('marital_status'),
+        data.get('district_of_birth'), data.get('tribe'), data.get('home_district'),
+        data.get('division'), constituency, constituency_id, data.get('location'),
+        data.get('sub_location'), data.get('village_estate'), data.get('occupation'),
+        data['existing_id_number'], None, 'lost', data['ob_number'],
+        'submitted', created_at
+    )
+
+# Column sizes and ENUM values from the applications table, so a bad item is
+# reported on its own instead of failing a whole multi-row INSERT
+NEW_APPLICATION_FIELD_LIMITS = {
+    'fullNames': 100, 'fatherName': 100, 'motherName': 100, 'husbandName': 100, 'husbandIdNo': 20,
+    'districtOfBirth': 100, 'tribe': 100, 'clan': 100, 'family': 100, 'homeDistrict': 100,
+    'division': 100, 'constituency': 100, 'location': 100, 'subLocation': 100,
+    'villageEstate': 100, 'homeAddress': 255, 'occupation': 100
+}
+NEW_APPLICATION_CHOICES = {
+    'gender': ('male', 'female'),
+    'maritalStatus': ('single', 'married', 'divorced', 'widowed')
+}
+
+def validate_new_application(data):
+    """Return why a submitted form cannot be stored, or None if it can"""
+    missing_fields = [field for field in NEW_APPLICATION_REQUIRED_FIELDS if not data.get(field)]
+    if missing_fields:
+        return f'Missing required fields: {", ".join(missing_fields)}'
+    for field, limit in NEW_APPLICATION_FIELD_LIMITS.items():
+        value = data.get(field)
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            return f'{field} must be text'
+        if len(value.strip()) > limit:
+            return f'{field} must be at most {limit} characters'
+    for field, choices in NEW_APPLICATION_CHOICES.items():
+        if data.get(field) and data[field] not in choices:
+            return f'{field} must be one of: {", ".join(choices)}'
+    if not isinstance(data['dateOfBirth'], str) or not parse_date_of_birth(data['dateOfBirth']):
+        return 'dateOfBirth must be a date (YYYY-MM-DD)'
+    return None
+
+def request_officer_id(fallback=None):
+    """Officer id from the Bearer token, or the id the client sent in the form"""
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        try:
+            token = auth_header.split(' ')[1]
+            payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+            if payload.get('officer_id'):
+                return payload['officer_id']
+        except Exception as e:
+            print('JWT decode failed:', e)
+    return fallback
+
 # Application Routes
 @app.route('/api/applications', methods=['POST'])
 def submit_application():
+    uploads = StagedUploads()
     try:
         print("Received request:", request.method, request.content_type)
         
@@ -408,11 +2226,7 @@ def submit_application():
             print("Processing form data:", list(data.keys()) if data else "No data")
         
         # Validate required fields
-        required_fields = ['fullNames', 'dateOfBirth', 'gender', 'fatherName', 'motherName', 
-                          'districtOfBirth', 'tribe', 'homeDistrict', 'division', 
-                          'constituency', 'location', 'subLocation', 'villageEstate', 'occupation']
-        
-        missing_fields = [field for field in required_fields if not data.get(field)]
+        missing_fields = [field for field in NEW_APPLICATION_REQUIRED_FIELDS if not data.get(field)]
         if missing_fields:
             print("Missing required fields:", missing_fields)
             return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
@@ -421,22 +2235,8 @@ def submit_application():
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        # Determine submitting officer
-        officer_id = None
-
-        # Try JWT from Authorization header
-        auth_header = request.headers.get('Authorization', '')
-        if auth_header.startswith('Bearer '):
-            try:
-                token = auth_header.split(' ')[1]
-                payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-                officer_id = payload.get('officer_id')
-            except Exception as e:
-                print('JWT decode failed:', e)
-
-        # Fallback to explicit officerId in payload
-        if not officer_id:
-            officer_id = data.get('officerId')
+        # Determine submitting officer: JWT first, then explicit officerId in payload
+        officer_id = request_officer_id(data.get('officerId'))
 
         # Validate officer
         if not officer_id:
@@ -444,74 +2244,39 @@ def submit_application():
             conn.close()
             return jsonify({'error': 'Officer ID missing'}), 400
 
-        cursor.execute("SELECT id FROM officers WHERE id = %s AND status = 'approved'", (officer_id,))
-        officer_result = cursor.fetchone()
-        if not officer_result:
+        if not is_officer_approved(conn, officer_id):
             cursor.close()
             conn.close()
             return jsonify({'error': 'Invalid or unapproved officer'}), 400
 
-        # Generate application number (sequential per total count)
-        cursor.execute("SELECT COUNT(*) FROM applications")
-        count = cursor.fetchone()[0]
-        application_number = f"APP{datetime.now().year}{count + 1:06d}"
+        # Generate application number from the APP sequence
+        application_number = APPLICATION_NUMBERS.next_number(conn)
+        created_at = datetime.now()
+        constituency = data['constituency'].strip()
         
         print(f"Generated application number: {application_number}")
         
         # Insert application
-        cursor.execute("""
-            INSERT INTO applications (
-                application_number, officer_id, application_type,
-                full_names, date_of_birth, gender, father_name, mother_name,
-                marital_status, husband_name, husband_id_no,
-                district_of_birth, tribe, clan, family, home_district,
-                division, constituency, location, sub_location, village_estate,
-                home_address, occupation, supporting_documents, status, created_at
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-            )
-        """, (
-            application_number, officer_id, 'new',
-            data['fullNames'], data['dateOfBirth'], data['gender'],
-            data['fatherName'], data['motherName'], data.get('maritalStatus'),
-            data.get('husbandName'), data.get('husbandIdNo'),
-            data['districtOfBirth'], data['tribe'], data.get('clan'),
-            data.get('family'), data['homeDistrict'], data['division'],
-            data['constituency'], data['location'], data['subLocation'],
-            data['villageEstate'], data.get('homeAddress'), data['occupation'],
-            json.dumps(data.get('supportingDocuments', {})), 'submitted', datetime.now()
+        cursor.execute(NEW_APPLICATION_INSERT, new_application_row(
+            data, application_number, officer_id, constituency,
+            resolve_constituency_id(conn, constituency), created_at
         ))
         
         application_id = cursor.lastrowid
+        change = new_application_change(
+            application_id, application_number, officer_id, 'new', constituency, created_at
+        )
+        record_status_changes(conn, [change])
         
         # Handle file uploads (only if files were sent)
-        upload_dir = 'uploads'
-        os.makedirs(upload_dir, exist_ok=True)
-        
         for file_key, file in files.items():
             if file and file.filename:
-                # Create safe filename
-                filename = f"{application_number}_{file_key}_{file.filename}"
-                file_path = os.path.join(upload_dir, filename)
-                file.save(file_path)
-                
-                # Map file types
-                doc_type_mapping = {
-                    'passportPhoto': 'passport_photo',
-                    'birthCertificate': 'birth_certificate', 
-                    'parentsId': 'parent_id_front'
-                }
-                
-                doc_type = doc_type_mapping.get(file_key, file_key)
-                
-                # Insert document record - store only filename for URL serving
-                cursor.execute("""
-                    INSERT INTO documents (application_id, document_type, file_path)
-                    VALUES (%s, %s, %s)
-                """, (application_id, doc_type, filename))
+                doc_type = NEW_APPLICATION_DOC_TYPES.get(file_key, file_key)
+                add_document(cursor, uploads, application_id, doc_type, file)
         
         conn.commit()
+        uploads.commit()
+        publish_status_changes([change])
         cursor.close()
         conn.close()
         
@@ -520,24 +2285,172 @@ def submit_application():
             'applicationNumber': application_number
         }), 201
         
+    except UploadRejected as e:
+        uploads.discard()
+        return jsonify({'error': str(e)}), e.status_code
+    except RequestEntityTooLarge:
+        return jsonify({'error': 'Upload exceeds the request size limit'}), 413
     except Exception as e:
+        uploads.discard()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/applications/track/<application_number>', methods=['GET'])
-def track_application(application_number):
+@app.route('/api/applications/batch', methods=['POST'])
+def submit_application_batch():
+    """Submit many new applications in one transaction
+
+    Accepts JSON {"applications": [...]} or multipart with an "applications"
+    JSON field and files named "<index>.<field>", e.g. "0.passportPhoto".
+    Invalid items are reported and skipped; the rest are inserted together.
+    The body may be up to BATCH_SUBMISSION_CONFIG['max_request_bytes'].
+    """
+    staged_uploads = []
     try:
+        if request.content_type and 'application/json' in request.content_type:
+            payload = request.get_json() or {}
+            items = payload.get('applications')
+            officer_hint = payload.get('officerId')
+            files = request.files
+        else:
+            items = json.loads(request.form.get('applications') or 'null')
+            officer_hint = request.form.get('officerId')
+            files = request.files
+        
+        max_items = BATCH_SUBMISSION_CONFIG['max_items']
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'applications must be a non-empty list'}), 400
+        if len(items) > max_items:
+            return jsonify({'error': f'At most {max_items} applications per batch'}), 400
+        
+        officer_id = request_officer_id(officer_hint)
+        if not officer_id:
+            return jsonify({'error': 'Officer ID missing'}), 400
+        
         conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
+        if not is_officer_approved(conn, officer_id):
+            cursor.close()
+            conn.close()
+            return jsonify({'error': 'Invalid or unapproved officer'}), 400
         
-        cursor.execute("""
-            SELECT application_number, full_names, status, created_at, updated_at
-            FROM applications WHERE application_number = %s
-        """, (application_number,))
+        files_by_index = {}
+        for file_key, file in files.items(multi=True):
+            index, _, field = file_key.partition('.')
+            if file and file.filename:
+                files_by_index.setdefault(index, []).append((field, file))
+        
+        # Validate every item and stage its files before any number is allocated
+        results = [None] * len(items)
+        valid = []
+        for index, data in enumerate(items):
+            if not isinstance(data, dict):
+                results[index] = {'index': index, 'status': 'invalid', 'error': 'Expected an object'}
+                continue
+            error = validate_new_application(data)
+            if error:
+                results[index] = {
+                    'index': index, 'status': 'invalid', 'clientReference': data.get('clientReference'),
+                    'error': error
+                }
+                continue
+            data = dict(data, dateOfBirth=parse_date_of_birth(data['dateOfBirth']))
+            
+            uploads = StagedUploads()
+            documents = []
+            try:
+                for field, file in files_by_index.get(str(index), []):
+                    if field not in NEW_APPLICATION_DOC_TYPES:
+                        raise UploadRejected(f'Unknown document field: {field}')
+                    doc_type = NEW_APPLICATION_DOC_TYPES[field]
+                    documents.append((doc_type, uploads.add(file, doc_type)))
+            except UploadRejected as e:
+                uploads.discard()
+                results[index] = {
+                    'index': index, 'status': 'invalid', 'clientReference': data.get('clientReference'),
+                    'error': str(e)
+                }
+                continue
+            staged_uploads.append(uploads)
+            valid.append((index, data, documents))
         
-        application = cursor.fetchone()
+        if not valid:
+            cursor.close()
+            conn.close()
+            return jsonify({'error': 'No valid applications in batch', 'results': results}), 400
+        
+        # One block of numbers, one multi-row INSERT
+        numbers = APPLICATION_NUMBERS.allocate(conn, len(valid))
+        created_at = datetime.now()
+        constituency_ids = {}
+        rows = []
+        for (index, data, _), application_number in zip(valid, numbers):
+            constituency = data['constituency'].strip()
+            if constituency not in constituency_ids:
+                constituency_ids[constituency] = resolve_constituency_id(conn, constituency)
+            rows.append(new_application_row(
+                data, application_number, officer_id, constituency,
+                constituency_ids[constituency], created_at
+            ))
+        cursor.executemany(NEW_APPLICATION_INSERT, rows)
+        
+        # Read the ids back by number instead of assuming they are consecutive
+        cursor.execute(f"""
+            SELECT application_number, id FROM applications
+            WHERE application_number IN ({', '.join(['%s'] * len(numbers))})
+        """, numbers)
+        application_ids = dict(cursor.fetchall())
+        
+        changes = []
+        document_entries = []
+        for (index, data, documents), application_number in zip(valid, numbers):
+            application_id = application_ids[application_number]
+            changes.append(new_application_change(
+                application_id, application_number, officer_id, 'new',
+                data['constituency'].strip(), created_at
+            ))
+            document_entries.extend((application_id, doc_type, staged) for doc_type, staged in documents)
+            results[index] = {
+                'index': index, 'status': 'created', 'clientReference': data.get('clientReference'),
+                'applicationNumber': application_number, 'applicationId': application_id
+            }
+        
+        if document_entries:
+            add_documents(cursor, document_entries, staged_uploads)
+        record_status_changes(conn, changes)
+        
+        conn.commit()
+        for uploads in staged_uploads:
+            uploads.commit()
+        publish_status_changes(changes)
         cursor.close()
         conn.close()
         
+        return jsonify({
+            'message': f'{len(valid)} of {len(items)} applications submitted',
+            'created': len(valid),
+            'results': results
+        }), 201
+        
+    except RequestEntityTooLarge:
+        limit_mb = BATCH_SUBMISSION_CONFIG['max_request_bytes'] // (1024 * 1024)
+        return jsonify({'error': f'Batch exceeds {limit_mb} MB; split it into smaller batches'}), 413
+    except Exception as e:
+        for uploads in staged_uploads:
+            uploads.discard()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/applications/track/<application_number>', methods=['GET'])
+def track_application(application_number):
+    try:
+        application = TRACKER_CACHE.get(application_number, TTLCache._MISSING)
+        if application is TTLCache._MISSING:
+            # Only lookups that reach the database spend the client's tokens
+            retry_after = TRACKER_LIMITER.acquire(TRACKER_LIMITER.client_key())
+            if retry_after:
+                response = jsonify({'error': 'Too many requests, please try again shortly'})
+                response.headers['Retry-After'] = str(int(retry_after) + 1)
+                return response, 429
+            application = TRACKER_CACHE.load(application_number)
+        
         if not application:
             return jsonify({'error': 'Application not found'}), 404
             
@@ -549,72 +2462,79 @@ def track_application(application_number):
 @app.route('/api/admin/officers/approved', methods=['GET'])
 def get_approved_officers():
     try:
+        try:
+            page = parse_page_args()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        conditions = ["o.status IN ('approved', 'suspended')"]
+        params = []
+        for arg in ('status', 'constituency'):
+            value = request.args.get(arg)
+            if value and value != 'all':
+                conditions.append(f"o.{arg} = %s")
+                params.append(value)
+
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
         
-        cursor.execute("""
-            SELECT id, id_number, email, phone_number, full_name, station, status, created_at
-            FROM officers WHERE status IN ('approved', 'suspended')
-            ORDER BY created_at DESC
-        """)
-        officers = cursor.fetchall()
+        officers, next_cursor, total = fetch_keyset_page(
+            cursor,
+            """SELECT o.id, o.id_number, o.email, o.phone_number, o.full_name, o.station,
+                      o.constituency, o.status, o.created_at""",
+            "FROM officers o",
+            conditions, params, 'o.created_at', 'o.id', page
+        )
         
         cursor.close()
         conn.close()
         
-        return jsonify({'officers': officers}), 200
+        return page_response('officers', officers, next_cursor, total, page)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def list_applications_page(fixed_conditions, sort_column, extra_columns=''):
+    """Shared handler for the paginated admin application lists"""
+    try:
+        page = parse_page_args()
+        conditions, params = application_filters_from_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conditions = fixed_conditions + conditions
+
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+
+    applications, next_cursor, total = fetch_keyset_page(
+        cursor,
+        f"""SELECT a.id, a.application_number, a.full_names, a.status,
+                   a.application_type, a.created_at, a.updated_at{extra_columns},
+                   o.full_name as officer_name""",
+        "FROM applications a LEFT JOIN officers o ON a.officer_id = o.id",
+        conditions, params, sort_column, 'a.id', page,
+        count_from_sql="FROM applications a"
+    )
+
+    cursor.close()
+    conn.close()
+
+    return page_response('applications', applications, next_cursor, total, page)
+
 @app.route('/api/admin/applications', methods=['GET'])
 def get_all_applications():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
         # Get only pending applications (submitted status)
-        cursor.execute("""
-            SELECT a.id, a.application_number, a.full_names, a.status, 
-                   a.application_type, a.created_at, a.updated_at,
-                   o.full_name as officer_name
-            FROM applications a 
-            LEFT JOIN officers o ON a.officer_id = o.id
-            WHERE a.status = 'submitted'
-            ORDER BY a.created_at DESC
-        """)
-        
-        applications = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'applications': applications}), 200
-        
+        return list_applications_page(["a.status = 'submitted'"], 'a.created_at')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/admin/applications/history', methods=['GET'])
 def get_application_history():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get all applications regardless of status
-        cursor.execute("""
-            SELECT a.id, a.application_number, a.full_names, a.status, 
-                   a.application_type, a.created_at, a.updated_at,
-                   a.generated_id_number, o.full_name as officer_name
-            FROM applications a 
-            LEFT JOIN officers o ON a.officer_id = o.id
-            ORDER BY a.created_at DESC
-        """)
-        
-        applications = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'applications': applications}), 200
-        
+        # Get all applications regardless of status, optionally filtered
+        return list_applications_page([], 'a.created_at', ', a.generated_id_number')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -664,13 +2584,9 @@ def approve_application(application_id):
 
         print(f"[approve_application] Start - application_id={application_id}")
 
-        # Get application details to check if it's a renewal
-        cursor.execute("""
-            SELECT application_type, existing_id_number 
-            FROM applications 
-            WHERE id = %s
-        """, (application_id,))
-        app_details = cursor.fetchone()
+        # Get application details to check if it's a renewal; lock the row so
+        # concurrent approvals of the same application cannot both issue a number
+        app_details = lock_applications(conn, [application_id]).get(application_id)
         print(f"[approve_application] app_details={app_details}")
 
         if not app_details:
@@ -688,23 +2604,11 @@ def approve_application(application_id):
                 WHERE id = %s
             """, (datetime.now(), application_id))
         else:
-            # Generate new ID number for new applications using proper sequence
-            year = datetime.now().year
-            prefix = f"ID{year}"
-
-            # Note: avoid passing a value with '%' via params; use CONCAT to append wildcard in SQL.
-            cursor.execute("""
-                SELECT COALESCE(MAX(CAST(SUBSTRING(generated_id_number, 7) AS UNSIGNED)), 0) AS max_id
-                FROM applications
-                WHERE generated_id_number LIKE CONCAT(%s, '%%')
-            """, (prefix,))
-            result = cursor.fetchone()
-            max_id = result['max_id'] if result and result['max_id'] is not None else 0
-
-            print(f"[approve_application] year={year}, prefix={prefix}, max_id={max_id}")
+            # Keep a number already issued to this application; otherwise take
+            # the next one from the ID sequence within this transaction
+            id_number = app_details['generated_id_number'] or allocate_id_numbers(conn)[0]
 
-            # Build next ID number
-            id_number = f"{prefix}{int(max_id) + 1:08d}"
+            print(f"[approve_application] id_number={id_number}")
 
             # Update application status and assign new ID number
             cursor.execute("""
@@ -718,9 +2622,13 @@ def approve_application(application_id):
             conn.close()
             return jsonify({'error': 'Application not found'}), 404
 
+        change = status_change(app_details, 'approved')
+        record_status_changes(conn, [change])
+
         conn.commit()
         cursor.close()
         conn.close()
+        publish_status_changes([change])
 
         print(f"[approve_application] Success - application_id={application_id}, id_number={id_number}")
 
@@ -738,23 +2646,17 @@ def approve_application(application_id):
 def reject_application(application_id):
     try:
         conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
         
         # Update application status
-        cursor.execute("""
-            UPDATE applications 
-            SET status = 'rejected', updated_at = %s
-            WHERE id = %s
-        """, (datetime.now(), application_id))
+        change = transition_application(conn, application_id, 'rejected')
         
-        if cursor.rowcount == 0:
-            cursor.close()
+        if not change:
             conn.close()
             return jsonify({'error': 'Application not found'}), 404
         
         conn.commit()
-        cursor.close()
         conn.close()
+        publish_status_changes([change])
         
         return jsonify({'message': 'Application rejected successfully'}), 200
         
@@ -764,52 +2666,14 @@ def reject_application(application_id):
 @app.route('/api/admin/applications/dispatch', methods=['GET'])
 def get_dispatch_applications():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        query = """
-            SELECT a.id, a.application_number, a.full_names, a.application_type, 
-                   a.generated_id_number, a.created_at, a.updated_at, o.full_name as officer_name
-            FROM applications a
-            LEFT JOIN officers o ON a.officer_id = o.id
-            WHERE a.status = 'ready_for_dispatch'
-            ORDER BY a.updated_at DESC
-        """
-        
-        cursor.execute(query)
-        applications = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'applications': applications}), 200
-        
+        return list_applications_page(["a.status = 'ready_for_dispatch'"], 'a.updated_at', ', a.generated_id_number')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/admin/applications/preview', methods=['GET'])
 def get_preview_applications():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        query = """
-            SELECT a.id, a.application_number, a.full_names, a.application_type, 
-                   a.generated_id_number, a.created_at, a.updated_at, o.full_name as officer_name
-            FROM applications a
-            LEFT JOIN officers o ON a.officer_id = o.id
-            WHERE a.status = 'approved'
-            ORDER BY a.updated_at DESC
-        """
-        
-        cursor.execute(query)
-        applications = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'applications': applications}), 200
-        
+        return list_applications_page(["a.status = 'approved'"], 'a.updated_at', ', a.generated_id_number')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -817,23 +2681,17 @@ def get_preview_applications():
 def print_application(application_id):
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
         
         # Update application status to 'ready_for_dispatch' (printed, ready for dispatch)
-        cursor.execute("""
-            UPDATE applications 
-            SET status = 'ready_for_dispatch', updated_at = %s
-            WHERE id = %s AND status = 'approved'
-        """, (datetime.now(), application_id))
+        change = transition_application(conn, application_id, 'ready_for_dispatch', allowed=('approved',))
         
-        if cursor.rowcount == 0:
-            cursor.close()
+        if not change:
             conn.close()
             return jsonify({'error': 'Application not found or not in approved status'}), 404
         
         conn.commit()
-        cursor.close()
         conn.close()
+        publish_status_changes([change])
         
         return jsonify({'message': 'Application marked as printed successfully'}), 200
         
@@ -844,29 +2702,182 @@ def print_application(application_id):
 def dispatch_application(application_id):
     try:
         conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
         
         # Update application status to dispatched
-        cursor.execute("""
-            UPDATE applications 
-            SET status = 'dispatched', updated_at = %s
-            WHERE id = %s AND status = 'ready_for_dispatch'
-        """, (datetime.now(), application_id))
+        change = transition_application(conn, application_id, 'dispatched', allowed=('ready_for_dispatch',))
         
-        if cursor.rowcount == 0:
-            cursor.close()
+        if not change:
             conn.close()
             return jsonify({'error': 'Application not found or not approved'}), 404
         
         conn.commit()
-        cursor.close()
         conn.close()
+        publish_status_changes([change])
         
         return jsonify({'message': 'Application dispatched successfully'}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Bulk state transitions: action -> (statuses it applies to, resulting status)
+BULK_TRANSITIONS = {
+    'approve': (('submitted',), 'approved'),
+    'reject': (('submitted',), 'rejected'),
+    'print': (('approved',), 'ready_for_dispatch'),
+    'dispatch': (('ready_for_dispatch',), 'dispatched')
+}
+
+def parse_bulk_filter(filters):
+    """Validate a bulk filter; raises ValueError naming the bad field"""
+    if not isinstance(filters, dict):
+        raise ValueError('filter must be an object')
+    parsed = {}
+    for field in ('constituency', 'application_type'):
+        if filters.get(field):
+            if not isinstance(filters[field], str):
+                raise ValueError(f'{field} must be a string')
+            parsed[field] = filters[field]
+    if filters.get('officer_id'):
+        try:
+            parsed['officer_id'] = int(filters['officer_id'])
+        except (TypeError, ValueError):
+            raise ValueError('officer_id must be an integer')
+    for field in ('created_from', 'created_to'):
+        if filters.get(field):
+            try:
+                parsed[field] = datetime.strptime(str(filters[field]), '%Y-%m-%d')
+            except ValueError:
+                raise ValueError(f'{field} must be a date in YYYY-MM-DD format')
+    return parsed
+
+def select_bulk_application_ids(conn, from_statuses, filters, limit):
+    """Find application ids in from_statuses matching a parsed bulk filter"""
+    conditions = [f"status IN ({', '.join(['%s'] * len(from_statuses))})"]
+    params = list(from_statuses)
+    for field in ('constituency', 'application_type', 'officer_id'):
+        if filters.get(field):
+            conditions.append(f"{field} = %s")
+            params.append(filters[field])
+    if filters.get('created_from'):
+        conditions.append("created_at >= %s")
+        params.append(filters['created_from'])
+    if filters.get('created_to'):
+        conditions.append("created_at < %s")
+        params.append(filters['created_to'] + timedelta(days=1))
+
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT id FROM applications
+        WHERE {' AND '.join(conditions)}
+        ORDER BY created_at, id
+        LIMIT %s
+    """, params + [limit])
+    ids = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return ids
+
+@app.route('/api/admin/applications/bulk/<action>', methods=['POST'])
+def bulk_transition_applications(action):
+    try:
+        if action not in BULK_TRANSITIONS:
+            return jsonify({'error': f"Unknown action. Use one of: {', '.join(BULK_TRANSITIONS)}"}), 400
+        from_statuses, new_status = BULK_TRANSITIONS[action]
+        
+        data = request.get_json() or {}
+        max_items = BULK_TRANSITION_CONFIG['max_items']
+        chunk_size = BULK_TRANSITION_CONFIG['chunk_size']
+        
+        if not data.get('ids') and not data.get('filter'):
+            return jsonify({'error': 'Provide either ids or filter'}), 400
+        
+        if data.get('ids'):
+            if not isinstance(data['ids'], list) or not all(
+                isinstance(application_id, int) and not isinstance(application_id, bool)
+                for application_id in data['ids']
+            ):
+                return jsonify({'error': 'ids must be a list of application ids'}), 400
+            ids = list(dict.fromkeys(data['ids']))
+            if len(ids) > max_items:
+                return jsonify({'error': f'At most {max_items} applications per request'}), 400
+        else:
+            try:
+                filters = parse_bulk_filter(data['filter'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        conn = get_db_connection()
+        
+        if not data.get('ids'):
+            ids = select_bulk_application_ids(conn, from_statuses, filters, max_items)
+        
+        # Lock every requested row first so the whole batch is decided in one transaction
+        eligible = []
+        wrong_state = []
+        not_found = []
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            rows = lock_applications(conn, chunk)
+            for application_id in chunk:
+                row = rows.get(application_id)
+                if not row:
+                    not_found.append(application_id)
+                elif row['status'] not in from_statuses:
+                    wrong_state.append({'id': application_id, 'status': row['status']})
+                else:
+                    eligible.append(row)
+        
+        # Approvals take all their new ID numbers from the sequence in one block
+        id_numbers = {}
+        if action == 'approve':
+            needs_number = [
+                row for row in eligible
+                if not row['generated_id_number']
+                and not (row['application_type'] == 'renewal' and row['existing_id_number'])
+            ]
+            if needs_number:
+                numbers = allocate_id_numbers(conn, len(needs_number))
+                id_numbers = {row['id']: number for row, number in zip(needs_number, numbers)}
+        
+        now = datetime.now()
+        cursor = conn.cursor()
+        status_placeholders = ', '.join(['%s'] * len(from_statuses))
+        for start in range(0, len(eligible), chunk_size):
+            chunk = [row['id'] for row in eligible[start:start + chunk_size]]
+            id_placeholders = ', '.join(['%s'] * len(chunk))
+            set_sql = "status = %s, updated_at = %s"
+            params = [new_status, now]
+            numbered = [application_id for application_id in chunk if application_id in id_numbers]
+            if numbered:
+                set_sql += ", generated_id_number = CASE id " + ' '.join(['WHEN %s THEN %s'] * len(numbered)) + " ELSE generated_id_number END"
+                for application_id in numbered:
+                    params.extend([application_id, id_numbers[application_id]])
+            cursor.execute(f"""
+                UPDATE applications SET {set_sql}
+                WHERE id IN ({id_placeholders}) AND status IN ({status_placeholders})
+            """, params + chunk + list(from_statuses))
+        cursor.close()
+        
+        changes = [status_change(row, new_status) for row in eligible]
+        record_status_changes(conn, changes)
+        
+        conn.commit()
+        conn.close()
+        publish_status_changes(changes)
+        
+        response = {
+            'message': f'{len(eligible)} application(s) updated',
+            'action': action,
+            'succeeded': [row['id'] for row in eligible],
+            'wrong_state': wrong_state,
+            'not_found': not_found
+        }
+        if action == 'approve':
+            response['id_numbers'] = {str(application_id): number for application_id, number in id_numbers.items()}
+        return jsonify(response), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Officer Application Management Routes
 @app.route('/api/officer/applications', methods=['GET'])
 def get_officer_applications():
@@ -878,7 +2889,7 @@ def get_officer_applications():
         cursor = conn.cursor()
         
         # First get the officer's constituency and station
-        cursor.execute("SELECT station, constituency FROM officers WHERE id = %s", (officer_id,))
+        cursor.execute("SELECT station, constituency, constituency_id FROM officers WHERE id = %s", (officer_id,))
         officer_result = cursor.fetchone()
         
         if not officer_result:
@@ -888,23 +2899,38 @@ def get_officer_applications():
         
         officer_station = (officer_result[0] or '').strip()
         officer_constituency = (officer_result[1] or '').strip()
+        officer_constituency_id = officer_result[2]
         
         # Prefer constituency, but fall back to station if constituency is missing
         location_key = officer_constituency if officer_constituency else officer_station
         
-        if not location_key:
+        if not officer_constituency_id and not location_key:
             cursor.close()
             conn.close()
             return jsonify({'error': 'Officer has no constituency or station set'}), 400
         
-        # Get all applications from the officer's constituency or ones processed by this officer
-        cursor.execute("""
-            SELECT id, application_number, full_names, status, created_at, 
-                   updated_at, generated_id_number
-            FROM applications 
-            WHERE (TRIM(constituency) = %s OR officer_id = %s)
+        # Get all applications from the officer's constituency or ones processed by this officer.
+        # Each half of the UNION is a lookup on its own index instead of a scan over an OR.
+        if officer_constituency_id:
+            location_condition = "constituency_id = %s"
+            location_value = officer_constituency_id
+        else:
+            # Officers whose constituency is not in the catalogue match on the stored name
+            location_condition = "TRIM(constituency) = %s"
+            location_value = location_key
+        
+        cursor.execute(f"""
+            (SELECT id, application_number, full_names, status, created_at, 
+                    updated_at, generated_id_number
+             FROM applications 
+             WHERE {location_condition})
+            UNION
+            (SELECT id, application_number, full_names, status, created_at, 
+                    updated_at, generated_id_number
+             FROM applications 
+             WHERE officer_id = %s)
             ORDER BY created_at DESC
-        """, (location_key, officer_id,))
+        """, (location_value, officer_id))
         
         applications = []
         for row in cursor.fetchall():
@@ -927,24 +2953,26 @@ def get_officer_applications():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def card_collectable(row):
+    return row['status'] == 'ready_for_collection' or (
+        row['status'] in ('', 'dispatched') and row['generated_id_number'] is not None
+    )
+
 @app.route('/api/officer/applications/<int:application_id>/card-arrived', methods=['PUT'])
 def mark_card_arrived(application_id):
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
         
-        cursor.execute("""
-            UPDATE applications 
-            SET status = 'ready_for_collection', updated_at = %s 
-            WHERE id = %s AND status = 'dispatched'
-        """, (datetime.now(), application_id))
+        # Card has reached the station: ready for the applicant to collect
+        change = transition_application(conn, application_id, 'ready_for_collection', allowed=('dispatched',))
         
-        if cursor.rowcount == 0:
+        if not change:
+            conn.close()
             return jsonify({'error': 'Application not found or not in dispatched status'}), 404
         
         conn.commit()
-        cursor.close()
         conn.close()
+        publish_status_changes([change])
         
         return jsonify({'message': 'Card arrival confirmed'}), 200
         
@@ -955,20 +2983,17 @@ def mark_card_arrived(application_id):
 def mark_card_collected(application_id):
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
         
-        cursor.execute("""
-            UPDATE applications 
-            SET status = 'collected', updated_at = %s 
-            WHERE id = %s AND (status = 'ready_for_collection' OR (status IN ('', 'dispatched') AND generated_id_number IS NOT NULL))
-        """, (datetime.now(), application_id))
+        # Cards can be collected once arrived, or straight from dispatch when an ID was issued
+        change = transition_application(conn, application_id, 'collected', allowed=card_collectable)
         
-        if cursor.rowcount == 0:
+        if not change:
+            conn.close()
             return jsonify({'error': 'Application not found or card not arrived yet'}), 404
         
         conn.commit()
-        cursor.close()
         conn.close()
+        publish_status_changes([change])
         
         return jsonify({'message': 'Card collection confirmed'}), 200
         
@@ -1023,6 +3048,7 @@ def search_application_by_id(id_number):
 
 @app.route('/api/applications/lost-id', methods=['POST'])
 def submit_lost_id_application():
+    uploads = StagedUploads()
     try:
         print("Received lost ID application request")
         
@@ -1038,34 +3064,12 @@ def submit_lost_id_application():
         current_time = datetime.now(eat_tz)
         
         # Handle date_of_birth format - ensure it's properly formatted for MySQL
-        date_of_birth = data.get('date_of_birth')
-        print(f"Raw date_of_birth received: '{date_of_birth}' (type: {type(date_of_birth)})")
-        
-        if date_of_birth and date_of_birth != 'null' and date_of_birth != 'None' and str(date_of_birth).strip():
-            try:
-                # Try to parse different date formats
-                if 'T' in str(date_of_birth):  # ISO format
-                    parsed_date = datetime.fromisoformat(str(date_of_birth).replace('Z', '+00:00'))
-                    date_of_birth = parsed_date.strftime('%Y-%m-%d')
-                elif len(str(date_of_birth)) == 10 and str(date_of_birth).count('-') == 2:  # YYYY-MM-DD
-                    # Validate the date format
-                    datetime.strptime(str(date_of_birth), '%Y-%m-%d')
-                    date_of_birth = str(date_of_birth)
-                else:
-                    print(f"Invalid date format: {date_of_birth}")
-                    date_of_birth = None
-            except (ValueError, TypeError) as e:
-                print(f"Error parsing date_of_birth: {e}")
-                date_of_birth = None
-        else:
-            print("Date of birth is null, empty, or invalid")
-            date_of_birth = None
-        
+        print(f"Raw date_of_birth received: '{data.get('date_of_birth')}'")
+        date_of_birth = parse_date_of_birth(data.get('date_of_birth'))
         print("Processed date of birth:", date_of_birth)
         
         # Validate required fields
-        required_fields = ['existing_id_number', 'ob_number', 'full_names']
-        missing_fields = [field for field in required_fields if not data.get(field)]
+        missing_fields = [field for field in LOST_ID_REQUIRED_FIELDS if not data.get(field)]
         if missing_fields:
             print("Missing required fields:", missing_fields)
             return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
@@ -1086,69 +3090,35 @@ def submit_lost_id_application():
         cursor = conn.cursor()
         
         # Validate officer_id (must exist and be approved) or set to NULL
-        if officer_id:
-            cursor.execute("SELECT id FROM officers WHERE id = %s AND status = 'approved'", (officer_id,))
-            if cursor.fetchone() is None:
-                officer_id = None
+        if officer_id and not is_officer_approved(conn, officer_id):
+            officer_id = None
         
-        # Get current count for application number
-        cursor.execute("SELECT COUNT(*) FROM applications WHERE application_type = 'renewal'")
-        count = cursor.fetchone()[0]
-        application_number = f"REP{datetime.now().year}{count + 1:06d}"
+        # Generate application number from the REP sequence
+        application_number = REPLACEMENT_NUMBERS.next_number(conn)
+        constituency = (data.get('constituency') or '').strip() or None
         
         print(f"Generated application number: {application_number}")
         
         # Insert lost ID application
-        cursor.execute("""
-            INSERT INTO applications (
-                application_number, officer_id, application_type,
-                full_names, date_of_birth, gender, father_name, mother_name, 
-                marital_status, district_of_birth, tribe, home_district,
-                division, constituency, location, sub_location, village_estate,
-                occupation, existing_id_number, generated_id_number, renewal_reason, ob_number,
-                status, created_at
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-            )
-        """, (
-            application_number, officer_id, 'renewal',
-            data['full_names'], date_of_birth, data.get('gender'),
-            data.get('father_name'), data.get('mother_name'), data.get('marital_status'),
-            data.get('district_of_birth'), data.get('tribe'), data.get('home_district'),
-            data.get('division'), data.get('constituency'), data.get('location'),
-            data.get('sub_location'), data.get('village_estate'), data.get('occupation'),
-            data['existing_id_number'], None, 'lost', data['ob_number'],
-            'submitted', current_time
+        cursor.execute(LOST_ID_INSERT, lost_id_application_row(
+            data, application_number, officer_id, constituency,
+            resolve_constituency_id(conn, constituency), date_of_birth, current_time
         ))
         
         application_id = cursor.lastrowid
+        change = new_application_change(
+            application_id, application_number, officer_id, 'renewal', constituency, current_time
+        )
+        record_status_changes(conn, [change])
         
         # Handle file uploads
-        upload_dir = 'uploads'
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Define expected files for lost ID applications
-        file_mappings = {
-            'ob_photo': 'ob_photo',
-            'passport_photo': 'passport_photo', 
-            'birth_certificate': 'birth_certificate'
-        }
-        
-        for file_key, doc_type in file_mappings.items():
-            if file_key in files and files[file_key].filename:
-                file = files[file_key]
-                # Create safe filename
-                filename = f"{application_number}_{file_key}_{file.filename}"
-                file_path = os.path.join(upload_dir, filename)
-                file.save(file_path)
-                
-                # Insert document record - store only filename for URL serving
-                cursor.execute("""
-                    INSERT INTO documents (application_id, document_type, file_path)
-                    VALUES (%s, %s, %s)
-                """, (application_id, doc_type, filename))
+        for doc_type in LOST_ID_DOC_TYPES:
+            if doc_type in files and files[doc_type].filename:
+                add_document(cursor, uploads, application_id, doc_type, files[doc_type])
         
         conn.commit()
+        uploads.commit()
+        publish_status_changes([change])
         cursor.close()
         conn.close()
         
@@ -1158,7 +3128,13 @@ def submit_lost_id_application():
             'applicationId': application_id
         }), 201
         
+    except UploadRejected as e:
+        uploads.discard()
+        return jsonify({'error': str(e)}), e.status_code
+    except RequestEntityTooLarge:
+        return jsonify({'error': 'Upload exceeds the request size limit'}), 413
     except Exception as e:
+        uploads.discard()
         print(f"Error in lost ID application: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
@@ -1189,58 +3165,48 @@ def submit_payment():
         ))
         
         payment_id = cursor.lastrowid
-        conn.commit()
-        
-        # Handle M-Pesa payment
+
+        account_reference = None
         if data['payment_method'] == 'mpesa':
-            phone_number = data['phone_number']
-            print(f"Processing M-Pesa payment for phone: {phone_number}")
-            
-            # Format phone number (remove leading 0 and add 254)
-            if phone_number.startswith('0'):
-                phone_number = '254' + phone_number[1:]
-            elif not phone_number.startswith('254'):
-                phone_number = '254' + phone_number
-            
-            print(f"Formatted phone number: {phone_number}")
-            
             # Get application details for reference
             cursor.execute("SELECT application_number FROM applications WHERE id = %s", (data['application_id'],))
             app_result = cursor.fetchone()
             account_reference = app_result[0] if app_result else f"APP{data['application_id']}"
-            
-            print(f"Account reference: {account_reference}")
-            
-            # Initiate STK push
-            stk_response = initiate_stk_push(
+
+        conn.commit()
+        
+        # Handle M-Pesa payment: the STK push runs in the background and the
+        # client polls /api/payments/<id> for the CheckoutRequestID
+        if data['payment_method'] == 'mpesa':
+            phone_number = format_mpesa_phone_number(data['phone_number'])
+            print(f"Queueing M-Pesa payment {payment_id} for phone: {phone_number}, reference: {account_reference}")
+
+            queued = STK_DISPATCHER.submit(
+                payment_id,
                 phone_number, 
                 int(data['amount']), 
                 account_reference,
                 "ID Renewal Payment"
             )
             
-            print(f"STK push response: {stk_response}")
-            
-            # Check if STK push was successful
-            if stk_response.get('CheckoutRequestID'):
+            if not queued:
                 cursor.execute("""
-                    UPDATE payments SET mpesa_checkout_id = %s WHERE id = %s
-                """, (stk_response['CheckoutRequestID'], payment_id))
-                conn.commit()
-                print(f"Updated payment {payment_id} with checkout ID: {stk_response['CheckoutRequestID']}")
-            else:
-                # STK push failed
-                print(f"STK push failed: {stk_response}")
-                cursor.execute("""
-                    UPDATE payments SET status = 'failed' WHERE id = %s
-                """, (payment_id,))
+                    UPDATE payments SET status = 'failed', failure_reason = %s WHERE id = %s
+                """, ('Payment service busy', payment_id))
                 conn.commit()
                 cursor.close()
                 conn.close()
-                return jsonify({
-                    'error': f"M-Pesa payment failed: {stk_response.get('error', 'Unknown error')}",
-                    'details': stk_response
-                }), 400
+                return jsonify({'error': 'M-Pesa payment service is busy, please retry shortly'}), 503
+
+            cursor.close()
+            conn.close()
+
+            return jsonify({
+                'message': 'Payment queued, STK push will be sent shortly',
+                'paymentId': payment_id,
+                'status': 'pending',
+                'statusUrl': f'/api/payments/{payment_id}'
+            }), 202
         
         cursor.close()
         conn.close()
@@ -1248,12 +3214,94 @@ def submit_payment():
         return jsonify({
             'message': 'Payment initiated successfully',
             'paymentId': payment_id,
-            'mpesa_response': stk_response if data['payment_method'] == 'mpesa' else None
+            'mpesa_response': None
         }), 201
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/payments/<int:payment_id>', methods=['GET'])
+def get_payment_status(payment_id):
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        
+        cursor.execute("""
+            SELECT id, application_id, amount, payment_method, status,
+                   mpesa_checkout_id, mpesa_receipt, failure_reason, created_at, updated_at
+            FROM payments WHERE id = %s
+        """, (payment_id,))
+        payment = cursor.fetchone()
+        
+        cursor.close()
+        conn.close()
+        
+        if not payment:
+            return jsonify({'error': 'Payment not found'}), 404
+        
+        return jsonify({'payment': payment}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def reconcile_mpesa_callback(conn, checkout_request_id):
+    """Apply a recorded M-Pesa callback to its payment, once the payment carries the checkout id.
+
+    Both the callback route and the STK dispatcher call this after committing
+    their half, so whichever commits last finds the other's. The locked
+    callback row is deleted when applied, so it is applied only once.
+    Returns False while no payment matches yet.
+    """
+    changes = []
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT result_code, mpesa_receipt FROM mpesa_pending_callbacks
+            WHERE checkout_request_id = %s FOR UPDATE
+        """, (checkout_request_id,))
+        pending = cursor.fetchone()
+        if not pending:
+            conn.rollback()
+            return True  # Already applied
+        result_code, mpesa_receipt_number = pending
+        
+        # Update payment status based on result
+        if result_code == 0:  # Success
+            cursor.execute("""
+                UPDATE payments 
+                SET status = 'completed', mpesa_receipt = %s, updated_at = %s
+                WHERE mpesa_checkout_id = %s
+            """, (mpesa_receipt_number, datetime.now(), checkout_request_id))
+        else:
+            # Payment failed
+            cursor.execute("""
+                UPDATE payments 
+                SET status = 'failed', updated_at = %s
+                WHERE mpesa_checkout_id = %s
+            """, (datetime.now(), checkout_request_id))
+        
+        # Get application ID to update status
+        cursor.execute("SELECT application_id FROM payments WHERE mpesa_checkout_id = %s", (checkout_request_id,))
+        payment_result = cursor.fetchone()
+        if not payment_result:
+            # The dispatcher has not stored the checkout id yet; it reconciles once it has
+            conn.rollback()
+            return False
+        
+        if result_code == 0:
+            change = transition_application(conn, payment_result[0], 'submitted')
+            if change:
+                changes.append(change)
+        cursor.execute("DELETE FROM mpesa_pending_callbacks WHERE checkout_request_id = %s", (checkout_request_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    publish_status_changes(changes)
+    return True
+
 @app.route('/api/mpesa/callback', methods=['POST'])
 def mpesa_callback():
     """Handle M-Pesa callback"""
@@ -1266,47 +3314,26 @@ def mpesa_callback():
         result_code = stk_callback.get('ResultCode')
         
         if checkout_request_id:
+            # Extract transaction details
+            callback_metadata = stk_callback.get('CallbackMetadata', {}).get('Item', [])
+            mpesa_receipt_number = None
+            for item in callback_metadata:
+                if item.get('Name') == 'MpesaReceiptNumber':
+                    mpesa_receipt_number = item.get('Value')
+                    break
+            
+            # Record the callback first, so it survives arriving before the checkout id is stored
             conn = get_db_connection()
             cursor = conn.cursor()
-            
-            # Update payment status based on result
-            if result_code == 0:  # Success
-                # Extract transaction details
-                callback_metadata = stk_callback.get('CallbackMetadata', {}).get('Item', [])
-                mpesa_receipt_number = None
-                for item in callback_metadata:
-                    if item.get('Name') == 'MpesaReceiptNumber':
-                        mpesa_receipt_number = item.get('Value')
-                        break
-                
-                # Update payment and application status
-                cursor.execute("""
-                    UPDATE payments 
-                    SET status = 'completed', mpesa_receipt = %s, updated_at = %s
-                    WHERE mpesa_checkout_id = %s
-                """, (mpesa_receipt_number, datetime.now(), checkout_request_id))
-                
-                # Get application ID to update status
-                cursor.execute("SELECT application_id FROM payments WHERE mpesa_checkout_id = %s", (checkout_request_id,))
-                payment_result = cursor.fetchone()
-                
-                if payment_result:
-                    application_id = payment_result[0]
-                    cursor.execute("""
-                        UPDATE applications 
-                        SET status = 'submitted', updated_at = %s
-                        WHERE id = %s
-                    """, (datetime.now(), application_id))
-            else:
-                # Payment failed
-                cursor.execute("""
-                    UPDATE payments 
-                    SET status = 'failed', updated_at = %s
-                    WHERE mpesa_checkout_id = %s
-                """, (datetime.now(), checkout_request_id))
-            
+            cursor.execute("""
+                INSERT IGNORE INTO mpesa_pending_callbacks (checkout_request_id, result_code, mpesa_receipt)
+                VALUES (%s, %s, %s)
+            """, (checkout_request_id, result_code if isinstance(result_code, int) else 1, mpesa_receipt_number))
             conn.commit()
             cursor.close()
+            
+            if not reconcile_mpesa_callback(conn, checkout_request_id):
+                print(f"M-Pesa callback {checkout_request_id} arrived before its payment was dispatched; kept for the dispatcher")
             conn.close()
         
         return jsonify({'ResultCode': 0, 'ResultDesc': 'Success'}), 200
@@ -1319,23 +3346,17 @@ def mpesa_callback():
 def submit_for_approval(application_id):
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
         
         # Update application status to indicate it's submitted for approval
-        cursor.execute("""
-            UPDATE applications 
-            SET status = 'submitted', updated_at = %s
-            WHERE id = %s
-        """, (datetime.now(), application_id))
+        change = transition_application(conn, application_id, 'submitted')
         
-        if cursor.rowcount == 0:
-            cursor.close()
+        if not change:
             conn.close()
             return jsonify({'error': 'Application not found'}), 404
         
         conn.commit()
-        cursor.close()
         conn.close()
+        publish_status_changes([change])
         
         return jsonify({'message': 'Application submitted for approval'}), 200
         
@@ -1351,6 +3372,7 @@ def suspend_officer(officer_id):
         conn.commit()
         cursor.close()
         conn.close()
+        OFFICER_STATUS_CACHE.invalidate(officer_id)
         return jsonify({'message': 'Officer suspended successfully'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1364,6 +3386,7 @@ def unsuspend_officer(officer_id):
         conn.commit()
         cursor.close()
         conn.close()
+        OFFICER_STATUS_CACHE.invalidate(officer_id)
         return jsonify({'message': 'Officer unsuspended successfully'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1381,275 +3404,818 @@ def delete_officer(officer_id):
         conn.commit()
         cursor.close()
         conn.close()
+        OFFICER_STATUS_CACHE.invalidate(officer_id)
         return jsonify({'message': 'Officer deleted successfully'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# File serving route
-@app.route('/uploads/<filename>')
-def serve_uploaded_file(filename):
+# Metrics route
+@app.route('/api/admin/metrics', methods=['GET'])
+def get_metrics():
+    return jsonify({
+        'db_pool': DB_POOL.snapshot(),
+        'mpesa_token': dict(MPESA_TOKEN_CACHE.stats),
+        'stk_dispatcher': dict(STK_DISPATCHER.stats),
+        'report_cache': REPORT_CACHE.snapshot(),
+        'report_jobs': dict(REPORT_JOBS.stats),
+        'thumbnails': THUMBNAILS.snapshot(),
+        'officer_status_cache': OFFICER_STATUS_CACHE.snapshot(),
+        'constituency_catalogue': dict(CONSTITUENCY_CATALOGUE.stats),
+        'status_events': STATUS_BROKER.snapshot(),
+        'tracker_cache': TRACKER_CACHE.snapshot(),
+        'tracker_rate_limit': TRACKER_LIMITER.snapshot(),
+        'status_audit': STATUS_AUDIT.snapshot()
+    }), 200
+
+# Offline station sync. Stations journal work locally (see station.py) and
+# replay it here; every journal entry carries a UUID that is recorded with its
+# outcome, so a push can be retried any number of times.
+class StationOpRejected(Exception):
+    """A journal entry that can never be applied; the station should stop retrying it"""
+
+def authenticate_station():
+    """Return the station id for a valid X-Station-Id / X-Station-Token pair, or None"""
+    station_id = request.headers.get('X-Station-Id', '')
+    token = request.headers.get('X-Station-Token', '')
+    expected = STATION_SYNC_CONFIG['tokens'].get(station_id)
+    if not expected or not hmac.compare_digest(expected, token):
+        return None
+    g.station_id = station_id  # Recorded as the source of any status changes it replays
+    return station_id
+
+def validate_station_payload(op_type, payload):
+    """Check a journal entry's shape before anything is written.
+
+    A malformed entry can never be applied, so it is rejected here rather
+    than failing later and being retried forever at the head of the journal.
+    """
+    if not isinstance(payload, dict):
+        raise StationOpRejected('Journal entry payload must be an object')
+    
+    if op_type in ('card_arrived', 'card_collected'):
+        if not isinstance(payload.get('application_id'), int):
+            raise StationOpRejected('application_id must be an integer')
+        return payload
+    if op_type not in ('submit_application', 'submit_lost_id'):
+        raise StationOpRejected(f"Unknown operation type: {op_type}")
+    
     try:
-        return send_from_directory('uploads', filename)
-    except Exception as e:
-        return jsonify({'error': 'File not found'}), 404
+        datetime.fromisoformat(payload['created_at'])
+    except (KeyError, TypeError, ValueError):
+        raise StationOpRejected('created_at must be an ISO timestamp')
+    if not payload.get('provisional') and not isinstance(payload.get('application_number'), str):
+        raise StationOpRejected('application_number is required unless the number is provisional')
+    officer_id = payload.get('officer_id')
+    if officer_id is not None and not isinstance(officer_id, int):
+        raise StationOpRejected('officer_id must be an integer')
+    
+    data = payload.get('data')
+    if not isinstance(data, dict):
+        raise StationOpRejected('data must be an object')
+    if op_type == 'submit_application':
+        required_fields, text_fields, date_field = NEW_APPLICATION_REQUIRED_FIELDS, ('constituency',), 'dateOfBirth'
+    else:
+        required_fields, text_fields, date_field = LOST_ID_REQUIRED_FIELDS, ('constituency', 'date_of_birth'), None
+    missing_fields = [field for field in required_fields if not data.get(field)]
+    if missing_fields:
+        raise StationOpRejected(f'Missing required fields: {", ".join(missing_fields)}')
+    for field in list(required_fields) + list(text_fields):
+        if data.get(field) is not None and not isinstance(data[field], str):
+            raise StationOpRejected(f'{field} must be text')
+    if date_field and not parse_date_of_birth(data[date_field]):
+        raise StationOpRejected(f'{date_field} is not a valid date')
+    
+    documents = payload.get('documents', [])
+    if not isinstance(documents, list) or not all(
+        isinstance(document, dict) and isinstance(document.get('document_type'), str)
+        and isinstance(document.get('sha256'), str) for document in documents
+    ):
+        raise StationOpRejected('documents must be a list of {document_type, sha256} objects')
+    return payload
 
-# Reports endpoints
-@app.route('/api/admin/reports', methods=['GET'])
-def get_admin_reports():
+def station_op_number(conn, op):
+    """Allocate the central number an entry will need, before its claim opens a transaction.
+
+    Provisional submissions and lost-ID entries get one; anything else, or an
+    entry too malformed to tell, gets None and is judged by validation.
+    """
+    payload = op.get('payload')
+    if not isinstance(payload, dict):
+        return None
+    if op.get('type') == 'submit_application' and payload.get('provisional'):
+        return APPLICATION_NUMBERS.next_number(conn)
+    if op.get('type') == 'submit_lost_id':
+        return REPLACEMENT_NUMBERS.next_number(conn)
+    return None
+
+def apply_station_submission(conn, cursor, uploads, payload, new_number):
+    officer_id = payload.get('officer_id')
+    if not is_officer_approved(conn, officer_id):
+        raise StationOpRejected('Invalid or unapproved officer')
+    
+    data = payload.get('data') or {}
+    missing_fields = [field for field in NEW_APPLICATION_REQUIRED_FIELDS if not data.get(field)]
+    if missing_fields:
+        raise StationOpRejected(f'Missing required fields: {", ".join(missing_fields)}')
+    
+    # Numbers from a block the station reserved are kept; provisional ones are
+    # replaced with the number station_op_number took from the sequence
+    if payload.get('provisional'):
+        application_number = new_number
+    else:
+        application_number = payload['application_number']
+    created_at = datetime.fromisoformat(payload['created_at'])
+    constituency = data['constituency'].strip()
+    
+    try:
+        cursor.execute(NEW_APPLICATION_INSERT, new_application_row(
+            data, application_number, officer_id, constituency,
+            resolve_constituency_id(conn, constituency), created_at
+        ))
+    except mysql.connector.IntegrityError as e:
+        raise StationOpRejected(f'Application could not be stored: {e.msg}')
+    application_id = cursor.lastrowid
+    add_station_documents(cursor, uploads, application_id, payload.get('documents', []))
+    
+    change = new_application_change(
+        application_id, application_number, officer_id, 'new', constituency, created_at
+    )
+    record_status_changes(conn, [change])
+    return {'applicationId': application_id, 'applicationNumber': application_number}, [change]
+
+def add_station_documents(cursor, uploads, application_id, documents):
+    """Stage the pushed files behind a station submission and check them against their hashes"""
+    entries = []
+    for document in documents:
+        file = request.files.get(document['sha256'])
+        if not file:
+            raise StationOpRejected(f"Document {document['document_type']} was not uploaded")
+        file.stream.seek(0)  # The same file may back several documents in one push
+        staged = uploads.add(file, document['document_type'])
+        if staged[0] != document['sha256']:
+            raise StationOpRejected(f"Document {document['document_type']} failed its checksum")
+        entries.append((application_id, document['document_type'], staged))
+    if entries:
+        add_documents(cursor, entries, [uploads])
+
+def apply_station_lost_id(conn, cursor, uploads, payload, new_number):
+    # As at the counter, an unknown or unapproved officer is dropped rather than rejected
+    officer_id = payload.get('officer_id')
+    if officer_id and not is_officer_approved(conn, officer_id):
+        officer_id = None
+    
+    data = payload.get('data') or {}
+    missing_fields = [field for field in LOST_ID_REQUIRED_FIELDS if not data.get(field)]
+    if missing_fields:
+        raise StationOpRejected(f'Missing required fields: {", ".join(missing_fields)}')
+    
+    # Stations only reserve APP numbers, so replacements always get theirs here
+    application_number = new_number
+    created_at = datetime.fromisoformat(payload['created_at'])
+    constituency = (data.get('constituency') or '').strip() or None
+    
+    cursor.execute(LOST_ID_INSERT, lost_id_application_row(
+        data, application_number, officer_id, constituency,
+        resolve_constituency_id(conn, constituency), parse_date_of_birth(data.get('date_of_birth')), created_at
+    ))
+    application_id = cursor.lastrowid
+    add_station_documents(cursor, uploads, application_id, payload.get('documents', []))
+    
+    change = new_application_change(
+        application_id, application_number, officer_id, 'renewal', constituency, created_at
+    )
+    record_status_changes(conn, [change])
+    return {'applicationId': application_id, 'applicationNumber': application_number}, [change]
+
+def apply_station_card_event(conn, payload, new_status, allowed):
+    change = transition_application(conn, payload.get('application_id'), new_status, allowed=allowed)
+    if not change:
+        raise StationOpRejected('Application not found or not in a state that allows this update')
+    return {'applicationId': change['application_id'], 'status': new_status}, [change]
+
+@app.route('/api/stations/sync/reserve', methods=['POST'])
+def reserve_station_numbers():
     try:
-        # Get query parameters
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        status = request.args.get('status', 'all')
-        report_type = request.args.get('report_type', 'applications')
-        constituency = request.args.get('constituency', 'all')
+        station_id = authenticate_station()
+        if not station_id:
+            return jsonify({'error': 'Unknown station or bad token'}), 401
         
-        if not start_date or not end_date:
-            return jsonify({'error': 'Start date and end date are required'}), 400
+        count = (request.get_json() or {}).get('count', 100)
+        if not isinstance(count, int) or not 0 < count <= STATION_SYNC_CONFIG['max_block']:
+            return jsonify({'error': f"count must be between 1 and {STATION_SYNC_CONFIG['max_block']}"}), 400
         
+        year = datetime.now().year
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Base query
-        base_query = '''
-            SELECT a.id, a.application_number, a.full_names, a.status, 
-                   a.application_type, a.created_at, a.updated_at, 
-                   o.full_name as officer_name, a.generated_id_number
-            FROM applications a
-            LEFT JOIN officers o ON a.officer_id = o.id
-            WHERE DATE(a.created_at) BETWEEN %s AND %s
-        '''
-        
-        params = [start_date, end_date]
-        
-        # Add status filter if not 'all'
-        if status != 'all':
-            base_query += ' AND a.status = %s'
-            params.append(status)
-        
-        # Add constituency filter if not 'all'
-        if constituency != 'all':
-            base_query += ' AND a.constituency = %s'
-            params.append(constituency)
-        
-        # Add report type filter
-        if report_type == 'renewals':
-            base_query += ' AND a.application_type = %s'
-            params.append('renewal')
-        elif report_type == 'new_applications':
-            base_query += ' AND a.application_type = %s'
-            params.append('new')
-        
-        base_query += ' ORDER BY a.created_at DESC'
-        
-        cursor.execute(base_query, params)
-        applications = cursor.fetchall()
-        
-        # Get statistics
-        stats_query = '''
-            SELECT 
-                COUNT(*) as total,
-                COUNT(CASE WHEN status = 'submitted' THEN 1 END) as pending,
-                COUNT(CASE WHEN status = 'approved' THEN 1 END) as approved,
-                COUNT(CASE WHEN status = 'rejected' THEN 1 END) as rejected,
-                COUNT(CASE WHEN status = 'dispatched' THEN 1 END) as dispatched,
-                COUNT(CASE WHEN status = 'collected' THEN 1 END) as collected
-            FROM applications
-            WHERE DATE(created_at) BETWEEN %s AND %s
-        '''
-        
-        stats_params = [start_date, end_date]
-        
-        if status != 'all':
-            stats_query += ' AND status = %s'
-            stats_params.append(status)
-        
-        if constituency != 'all':
-            stats_query += ' AND constituency = %s'
-            stats_params.append(constituency)
-            
-        if report_type == 'renewals':
-            stats_query += ' AND application_type = %s'
-            stats_params.append('renewal')
-        elif report_type == 'new_applications':
-            stats_query += ' AND application_type = %s'
-            stats_params.append('new')
-        
-        cursor.execute(stats_query, stats_params)
-        stats = cursor.fetchone()
-        
-        cursor.close()
+        start = reserve_sequence_range(conn, APPLICATION_NUMBERS.name, year, count)
+        conn.commit()
         conn.close()
-        
-        # Convert applications to list of dictionaries
-        application_list = []
-        for app in applications:
-            if report_type == 'officers_by_constituency':
-                # Special handling for officers report - different column structure
-                application_list.append({
-                    'id': app[3],  # o.id
-                    'application_number': app[0],  # o.station (station)
-                    'full_names': app[1],  # o.full_name (officer name)
-                    'status': app[2],  # o.status (officer status)
-                    'application_type': app[8],  # 'officer_report'
-                    'created_at': app[9].isoformat() if app[9] else None,
-                    'updated_at': app[10].isoformat() if app[10] else None,
-                    'officer_name': app[1],  # o.full_name
-                    'generated_id_number': app[7]  # o.id_number
-                })
-            else:
-                # Standard application structure
-                application_list.append({
-                    'id': app[0],
-                    'application_number': app[1],
-                    'full_names': app[2],
-                    'status': app[3],
-                    'application_type': app[4],
-                    'created_at': app[5].isoformat() if app[5] else None,
-                    'updated_at': app[6].isoformat() if app[6] else None,
-                    'officer_name': app[7] or 'N/A',
-                    'generated_id_number': app[8]
-                })
+        print(f"Station {station_id} reserved {APPLICATION_NUMBERS.name} numbers {start}-{start + count - 1} for {year}")
         
         return jsonify({
-            'applications': application_list,
-            'stats': {
-                'total': stats[0] or 0,
-                'pending': stats[1] or 0,
-                'approved': stats[2] or 0,
-                'rejected': stats[3] or 0,
-                'dispatched': stats[4] or 0,
-                'collected': stats[5] or 0
-            }
-        })
+            'prefix': APPLICATION_NUMBERS.name,
+            'digits': APPLICATION_NUMBERS.digits,
+            'year': year,
+            'start': start,
+            'end': start + count
+        }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/admin/reports/export', methods=['GET'])
-def export_admin_reports():
+@app.route('/api/stations/sync/push', methods=['POST'])
+def push_station_journal():
+    """Apply a station's journal entries in order
+
+    Multipart body: "ops" is a JSON list of {uuid, type, payload} and each
+    document travels as a file part named by its SHA-256. Every entry gets a
+    result: applied, duplicate (already applied earlier), rejected, or retry;
+    processing stops at the first retry so entries are never applied out of order.
+    """
     try:
-        # Get query parameters
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        status = request.args.get('status', 'all')
-        report_type = request.args.get('report_type', 'applications')
-        constituency = request.args.get('constituency', 'all')
-        export_format = request.args.get('format', 'csv')
+        station_id = authenticate_station()
+        if not station_id:
+            return jsonify({'error': 'Unknown station or bad token'}), 401
         
-        if not start_date or not end_date:
-            return jsonify({'error': 'Start date and end date are required'}), 400
+        ops = json.loads(request.form.get('ops') or '[]')
+        if not isinstance(ops, list) or len(ops) > STATION_SYNC_CONFIG['max_ops']:
+            return jsonify({'error': f"ops must be a list of at most {STATION_SYNC_CONFIG['max_ops']} entries"}), 400
         
         conn = get_db_connection()
         cursor = conn.cursor()
+        results = []
+        
+        for op in ops:
+            op_uuid = op.get('uuid') if isinstance(op, dict) else None
+            if not isinstance(op_uuid, str) or not 0 < len(op_uuid) <= 36:
+                # Nothing to record the rejection under
+                results.append({'uuid': op_uuid, 'status': 'rejected', 'error': 'Journal entry has no valid uuid'})
+                continue
+            cursor.execute("SELECT status, result FROM station_sync_ops WHERE op_uuid = %s", (op_uuid,))
+            recorded = cursor.fetchone()
+            if recorded:
+                results.append({'uuid': op_uuid, 'status': 'duplicate', 'outcome': recorded[0],
+                                'result': json.loads(recorded[1]) if recorded[1] else None})
+                continue
+            
+            uploads = StagedUploads()
+            try:
+                # Numbers are reserved in their own short transaction, so this comes before the claim
+                new_number = station_op_number(conn, op)
+                
+                # Claim the UUID first: a concurrent push of the same entry waits on this row
+                try:
+                    cursor.execute("""
+                        INSERT INTO station_sync_ops (op_uuid, station_id, op_type, status)
+                        VALUES (%s, %s, %s, 'applied')
+                    """, (op_uuid, station_id, str(op.get('type'))[:30]))
+                except mysql.connector.IntegrityError:
+                    # That push got there first; the next push reports its outcome as a duplicate
+                    conn.rollback()
+                    results.append({'uuid': op_uuid, 'status': 'retry', 'error': 'Entry is being applied by another push'})
+                    break
+                
+                payload = validate_station_payload(op.get('type'), op.get('payload'))
+                if op.get('type') == 'submit_application':
+                    result, changes = apply_station_submission(conn, cursor, uploads, payload, new_number)
+                elif op.get('type') == 'submit_lost_id':
+                    result, changes = apply_station_lost_id(conn, cursor, uploads, payload, new_number)
+                elif op.get('type') == 'card_arrived':
+                    result, changes = apply_station_card_event(conn, payload, 'ready_for_collection', ('dispatched',))
+                elif op.get('type') == 'card_collected':
+                    result, changes = apply_station_card_event(conn, payload, 'collected', card_collectable)
+                
+                cursor.execute("UPDATE station_sync_ops SET result = %s WHERE op_uuid = %s",
+                               (json.dumps(result), op_uuid))
+                conn.commit()
+                uploads.commit()
+                publish_status_changes(changes)
+                results.append({'uuid': op_uuid, 'status': 'applied', 'result': result})
+                
+            except (StationOpRejected, UploadRejected, KeyError, TypeError, ValueError,
+                    mysql.connector.DataError, mysql.connector.IntegrityError) as e:
+                conn.rollback()
+                uploads.discard()
+                if not isinstance(e, (StationOpRejected, UploadRejected)):
+                    # Bad data fails the same way on every attempt; only database and
+                    # connection trouble is worth retrying
+                    e = StationOpRejected(f'Malformed journal entry: {type(e).__name__}: {e}')
+                # Rejections are recorded too, so a retried push gets the same answer
+                cursor.execute("""
+                    INSERT IGNORE INTO station_sync_ops (op_uuid, station_id, op_type, status, result)
+                    VALUES (%s, %s, %s, 'rejected', %s)
+                """, (op_uuid, station_id, str(op.get('type'))[:30], json.dumps({'error': str(e)})))
+                conn.commit()
+                results.append({'uuid': op_uuid, 'status': 'rejected', 'error': str(e)})
+                
+            except Exception as e:
+                conn.rollback()
+                uploads.discard()
+                print(f"Station {station_id} op {op_uuid} failed, will be retried: {str(e)}")
+                results.append({'uuid': op_uuid, 'status': 'retry', 'error': str(e)})
+                break
         
-        # Same query as the reports endpoint
-        base_query = '''
-            SELECT a.application_number, a.full_names, a.status, 
-                   a.application_type, a.created_at, 
-                   o.full_name as officer_name, a.generated_id_number
-            FROM applications a
-            LEFT JOIN officers o ON a.officer_id = o.id
-            WHERE DATE(a.created_at) BETWEEN %s AND %s
-        '''
-        
-        params = [start_date, end_date]
+        cursor.close()
+        conn.close()
+        return jsonify({'results': results}), 200
         
-        if status != 'all':
-            base_query += ' AND a.status = %s'
-            params.append(status)
+    except RequestEntityTooLarge:
+        return jsonify({'error': 'Push exceeds the request size limit'}), 413
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/stations/sync/pull', methods=['GET'])
+def pull_station_slice():
+    """Applications of one constituency changed since a timestamp, oldest change first"""
+    try:
+        station_id = authenticate_station()
+        if not station_id:
+            return jsonify({'error': 'Unknown station or bad token'}), 401
+        
+        constituency = (request.args.get('constituency') or '').strip()
+        if not constituency:
+            return jsonify({'error': 'constituency is required'}), 400
+        try:
+            since = datetime.fromisoformat(request.args['since']) if request.args.get('since') else None
+            cursor_token = request.args.get('cursor')
+            after = decode_page_cursor(cursor_token) if cursor_token else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        limit = STATION_SYNC_CONFIG['pull_limit']
         
-        if constituency != 'all':
-            base_query += ' AND a.constituency = %s'
-            params.append(constituency)
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        constituency_id = resolve_constituency_id(conn, constituency)
+        if constituency_id:
+            conditions, params = ["constituency_id = %s"], [constituency_id]
+        else:
+            conditions, params = ["constituency = %s"], [constituency]
+        if since:
+            conditions.append("updated_at >= %s")
+            params.append(since)
+        if after:
+            conditions.append("(updated_at > %s OR (updated_at = %s AND id > %s))")
+            params.extend([after[0], after[0], after[1]])
+        
+        cursor.execute(f"""
+            SELECT id, application_number, officer_id, application_type, full_names, constituency,
+                   status, generated_id_number, created_at, updated_at
+            FROM applications
+            WHERE {' AND '.join(conditions)}
+            ORDER BY updated_at, id
+            LIMIT %s
+        """, params + [limit + 1])
+        rows = cursor.fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_page_cursor(rows[-1]['updated_at'], rows[-1]['id'])
+        
+        officers = []
+        if not after:
+            # The officer list is small; send it with the first page only
+            cursor.execute("""
+                SELECT id, status FROM officers WHERE constituency_id = %s OR constituency = %s
+            """, (constituency_id, constituency))
+            officers = cursor.fetchall()
         
-        if report_type == 'renewals':
-            base_query += ' AND a.application_type = %s'
-            params.append('renewal')
-        elif report_type == 'new_applications':
-            base_query += ' AND a.application_type = %s'
-            params.append('new')
+        cursor.close()
+        conn.close()
         
-        base_query += ' ORDER BY a.created_at DESC'
+        for row in rows:
+            row['created_at'] = row['created_at'].isoformat() if row['created_at'] else None
+            row['updated_at'] = row['updated_at'].isoformat() if row['updated_at'] else None
         
-        cursor.execute(base_query, params)
-        applications = cursor.fetchall()
+        return jsonify({
+            'applications': rows,
+            'officers': officers,
+            'next_cursor': next_cursor
+        }), 200
         
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Status event routes
+def status_event_filter():
+    """Build the event predicate from application_number, constituency or officer_id"""
+    application_number = request.args.get('application_number')
+    constituency = (request.args.get('constituency') or '').strip()
+    officer_id = request.args.get('officer_id', type=int)
+    
+    if application_number:
+        return lambda event: event['application_number'] == application_number
+    
+    if officer_id:
+        # Officers follow their constituency plus anything they submitted themselves
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT constituency FROM officers WHERE id = %s", (officer_id,))
+        row = cursor.fetchone()
         cursor.close()
         conn.close()
+        if not row:
+            return None
+        officer_constituency = (row[0] or '').strip()
+        return lambda event: event['officer_id'] == officer_id or (
+            officer_constituency and event['constituency'] == officer_constituency
+        )
+    
+    if constituency:
+        return lambda event: event['constituency'] == constituency
+    return None
+
+def status_event_stream(broker, matches):
+    """SSE response following broker for events accepted by matches; resumes from Last-Event-ID"""
+    version, reset = broker.parse_cursor(
+        request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    )
+    if broker.full():
+        broker.stats['refused'] += 1
+        return jsonify({'error': 'Too many subscribers, retry later'}), 503
+    
+    # The slot is taken when streaming starts and given back when the server
+    # closes the response, which also happens if the body is never iterated
+    subscribed = []
+    
+    def release():
+        if subscribed:
+            subscribed.pop()
+            broker.unsubscribe()
+    
+    def generate(version, reset):
+        if not broker.subscribe():
+            # Filled up since the check above; the client reconnects later
+            yield "retry: 30000\n\n"
+            return
+        subscribed.append(True)
+        yield "retry: 3000\n\n"
+        if reset:
+            broker.stats['resets'] += 1
+            yield f"id: {broker.cursor(version)}\nevent: reset\ndata: {{}}\n\n"
+        while True:
+            events, version = broker.wait(version, matches, broker.heartbeat)
+            for event in events:
+                yield (f"id: {broker.cursor(event['version'])}\n"
+                       f"event: status\ndata: {json.dumps(event)}\n\n")
+            if not events:
+                yield ": keep-alive\n\n"
+    
+    response = Response(generate(version, reset), mimetype='text/event-stream')
+    response.call_on_close(release)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Let nginx pass events straight through
+    return response
+
+@app.route('/api/events/stream', methods=['GET'])
+def stream_status_events():
+    """Server-Sent Events: one "status" event per change"""
+    try:
+        matches = status_event_filter()
+        if not matches:
+            return jsonify({'error': 'Provide application_number, constituency or officer_id'}), 400
+        return status_event_stream(STATUS_BROKER, matches)
         
-        if export_format == 'csv':
-            import io
-            import csv
-            
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # Write header
-            writer.writerow([
-                'Application Number', 'Applicant Name', 'Status', 
-                'Application Type', 'Created Date', 'Officer Name', 'ID Number'
-            ])
-            
-            # Write data
-            for app in applications:
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/events/poll', methods=['GET'])
+def poll_status_events():
+    """Long-poll fallback: waits up to timeout seconds for changes after the given cursor"""
+    try:
+        matches = status_event_filter()
+        if not matches:
+            return jsonify({'error': 'Provide application_number, constituency or officer_id'}), 400
+        version, reset = STATUS_BROKER.parse_cursor(request.args.get('cursor'))
+        timeout = min(request.args.get('timeout', STATUS_BROKER.max_poll_wait, type=int),
+                      STATUS_BROKER.max_poll_wait)
+        
+        # A reset answers at once: the client must reload before following changes
+        events = []
+        if reset:
+            STATUS_BROKER.stats['resets'] += 1
+        elif timeout > 0:
+            if not STATUS_BROKER.subscribe():
+                return jsonify({'error': 'Too many subscribers, retry later'}), 503
+            try:
+                events, version = STATUS_BROKER.wait(version, matches, timeout)
+            finally:
+                STATUS_BROKER.unsubscribe()
+        
+        return jsonify({
+            'cursor': STATUS_BROKER.cursor(version),
+            'reset': reset,
+            'events': events
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# File serving route
+def upload_content_hash(path):
+    """The SHA-256 a blob is named after, or None for legacy uploads"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if len(stem) == 64 and all(c in '0123456789abcdef' for c in stem):
+        return stem
+    return None
+
+@app.route('/uploads/<path:filename>')
+def serve_uploaded_file(filename):
+    try:
+        size = request.args.get('size')
+        if size and size not in THUMBNAIL_CONFIG['sizes']:
+            return jsonify({'error': f"size must be one of: {', '.join(THUMBNAIL_CONFIG['sizes'])}"}), 400
+        
+        resolved = resolve_upload_path(filename)
+        if not resolved:
+            return jsonify({'error': 'File not found'}), 404
+        
+        # Blobs are named by their hash, so the hash is a strong validator and
+        # the bytes can be cached for good. Documents hold personal data, so
+        # caching is limited to the browser.
+        content_hash = upload_content_hash(resolved)
+        etag = content_hash
+        max_age = UPLOAD_CONFIG['blob_max_age'] if content_hash else UPLOAD_CONFIG['legacy_max_age']
+        
+        # ?size= serves a resized copy of an image, rendering it on first use;
+        # anything that cannot be resized falls back to the original
+        if size and THUMBNAILS.supports(resolved):
+            future = THUMBNAILS.ensure(resolved, size)
+            if future:
+                try:
+                    future.result(timeout=THUMBNAIL_CONFIG['wait_timeout'])
+                except Exception:
+                    pass
+            thumbnail = derivative_path(resolved, size)
+            if os.path.exists(os.path.join(UPLOAD_CONFIG['directory'], thumbnail)):
+                resolved = thumbnail
+                etag = f"{content_hash}-{size}" if content_hash else None
+        
+        if UPLOAD_CONFIG['offload'] == 'x-accel-redirect':
+            if etag and request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = Response()
+                response.headers['X-Accel-Redirect'] = UPLOAD_CONFIG['accel_prefix'] + resolved
+                response.mimetype = mimetypes.guess_type(resolved)[0] or 'application/octet-stream'
+            if etag:
+                response.set_etag(etag)
+        else:
+            # send_file answers If-None-Match / If-Modified-Since with 304 and Range
+            # with 206, and switches to X-Sendfile when USE_X_SENDFILE is set
+            response = send_file(
+                safe_join(UPLOAD_CONFIG['directory'], resolved),
+                etag=etag or True,
+                conditional=True,
+                max_age=max_age
+            )
+            response.accept_ranges = 'bytes'
+        
+        response.cache_control.public = False
+        response.cache_control.private = True
+        response.cache_control.max_age = max_age
+        if content_hash:
+            response.cache_control.immutable = True
+        return response
+    except Exception as e:
+        return jsonify({'error': 'File not found'}), 404
+
+# Report query builder
+REPORT_STATUS_COLUMNS = [
+    ('pending', 'submitted'),
+    ('approved', 'approved'),
+    ('rejected', 'rejected'),
+    ('dispatched', 'dispatched'),
+    ('collected', 'collected')
+]
+
+def parse_report_filters(args=None):
+    """Read the report filters from the query string (or args); raises ValueError for bad dates"""
+    if args is None:
+        args = request.args
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+    if not start_date or not end_date:
+        raise ValueError('Start date and end date are required')
+
+    try:
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError('Dates must be in YYYY-MM-DD format')
+
+    return {
+        'start_date': start.strftime('%Y-%m-%d'),
+        'end_date': end.strftime('%Y-%m-%d'),
+        # Half-open range [start, end + 1 day) keeps created_at comparable against its index
+        'range_start': start,
+        'range_end': end + timedelta(days=1),
+        'status': args.get('status', 'all'),
+        'report_type': args.get('report_type', 'applications'),
+        'constituency': args.get('constituency', 'all')
+    }
+
+def report_where_clause(filters, alias='a'):
+    """Build the sargable WHERE clause and parameters shared by the report queries"""
+    prefix = f"{alias}." if alias else ''
+    conditions = [f"{prefix}created_at >= %s", f"{prefix}created_at < %s"]
+    params = [filters['range_start'], filters['range_end']]
+
+    if filters['status'] != 'all':
+        conditions.append(f"{prefix}status = %s")
+        params.append(filters['status'])
+
+    if filters['constituency'] != 'all':
+        conditions.append(f"{prefix}constituency = %s")
+        params.append(filters['constituency'])
+
+    if filters['report_type'] == 'renewals':
+        conditions.append(f"{prefix}application_type = %s")
+        params.append('renewal')
+    elif filters['report_type'] == 'new_applications':
+        conditions.append(f"{prefix}application_type = %s")
+        params.append('new')
+
+    return ' WHERE ' + ' AND '.join(conditions), params
+
+def report_rows_query(filters, columns):
+    """Return the SQL and parameters listing the report's applications, newest first"""
+    where_sql, params = report_where_clause(filters)
+    query = f"""
+        SELECT {columns}
+        FROM applications a
+        LEFT JOIN officers o ON a.officer_id = o.id
+        {where_sql}
+        ORDER BY a.created_at DESC
+    """
+    return query, params
+
+def fetch_report_stats(cursor, filters):
+    """Count the report's applications in total and per status from the daily rollup"""
+    conditions = ["stat_date >= %s", "stat_date < %s"]
+    params = [filters['range_start'].date(), filters['range_end'].date()]
+
+    if filters['status'] != 'all':
+        conditions.append("status = %s")
+        params.append(filters['status'])
+
+    if filters['constituency'] != 'all':
+        conditions.append("constituency = %s")
+        params.append(filters['constituency'])
+
+    if filters['report_type'] == 'renewals':
+        conditions.append("application_type = %s")
+        params.append('renewal')
+    elif filters['report_type'] == 'new_applications':
+        conditions.append("application_type = %s")
+        params.append('new')
+
+    cursor.execute(f"""
+        SELECT status, SUM(application_count)
+        FROM application_daily_stats
+        WHERE {' AND '.join(conditions)}
+        GROUP BY status
+    """, params)
+    counts = {status: int(count or 0) for status, count in cursor.fetchall()}
+
+    stats = {'total': sum(counts.values())}
+    for name, status in REPORT_STATUS_COLUMNS:
+        stats[name] = counts.get(status, 0)
+    return stats
+
+REPORT_EXPORT_COLUMNS = """
+    a.application_number, a.full_names, a.status, 
+    a.application_type, a.created_at, 
+    o.full_name as officer_name, a.generated_id_number
+"""
+
+def stream_report_csv(filters):
+    """Yield the report as CSV chunks read from an unbuffered (server-side) cursor"""
+    conn = get_db_connection()
+    cursor = None
+    finished = False
+    try:
+        setup = conn.cursor()
+        setup.execute("SELECT @@SESSION.net_write_timeout")
+        previous_timeout = setup.fetchone()[0]
+        setup.execute("SET SESSION net_write_timeout = %s", (REPORT_EXPORT_CONFIG['net_write_timeout'],))
+        setup.close()
+
+        cursor = conn.cursor(buffered=False)
+        query, params = report_rows_query(filters, REPORT_EXPORT_COLUMNS)
+        cursor.execute(query, params)
+
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow([
+            'Application Number', 'Applicant Name', 'Status', 
+            'Application Type', 'Created Date', 'Officer Name', 'ID Number'
+        ])
+
+        while True:
+            rows = cursor.fetchmany(REPORT_EXPORT_CONFIG['csv_batch_size'])
+            for app in rows:
                 writer.writerow([
                     app[0], app[1], app[2], app[3], 
                     app[4].strftime('%Y-%m-%d %H:%M:%S') if app[4] else '',
                     app[5] or 'N/A', app[6] or 'N/A'
                 ])
-            
-            output.seek(0)
-            
-            return Response(
-                output.getvalue(),
-                mimetype='text/csv',
-                headers={'Content-Disposition': f'attachment; filename={report_type}_report_{start_date}_to_{end_date}.csv'}
-            )
-        
-        elif export_format == 'pdf':
-            from reportlab.lib.pagesizes import letter, A4
-            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-            from reportlab.lib import colors
-            from reportlab.lib.units import inch
-            import io
-            
-            # Create PDF buffer
-            buffer = io.BytesIO()
-            
-            # Create PDF document
-            doc = SimpleDocTemplate(buffer, pagesize=A4)
-            elements = []
-            
-            # Get styles
-            styles = getSampleStyleSheet()
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=16,
-                spaceAfter=30,
-                alignment=1  # Center alignment
-            )
-            
-            # Add title
-            title_text = f"{report_type.replace('_', ' ').title()} Report"
-            if status != 'all':
-                title_text += f" - {status.title()} Status"
-            if constituency != 'all':
-                title_text += f" - {constituency}"
-            title_text += f"<br/>Period: {start_date} to {end_date}"
-            
-            title = Paragraph(title_text, title_style)
-            elements.append(title)
-            elements.append(Spacer(1, 20))
-            
-            # Prepare table data
-            table_data = [
-                ['Application #', 'Applicant Name', 'Status', 'Type', 'Date', 'Officer', 'ID Number']
-            ]
-            
-            for app in applications:
+            if output.tell():
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate(0)
+            if not rows:
+                break
+        finished = True
+    finally:
+        if finished:
+            cursor.close()
+            try:
+                # The pooled connection goes back with the session as other borrowers expect it
+                reset = conn.cursor()
+                reset.execute("SET SESSION net_write_timeout = %s", (previous_timeout,))
+                reset.close()
+            except Exception as e:
+                print(f"Could not restore net_write_timeout after CSV export: {str(e)}")
+                conn.discard()
+            else:
+                conn.close()
+        else:
+            # Client went away mid-export: drop the connection rather than drain the result set
+            print("CSV export aborted before completion")
+            conn.discard()
+
+def render_report_pdf(filters, output_path):
+    """Render a report PDF to output_path; runs in a worker process with its own connection"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, LongTable, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+
+    start_date = filters['start_date']
+    end_date = filters['end_date']
+    status = filters['status']
+    report_type = filters['report_type']
+    constituency = filters['constituency']
+
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    doc = SimpleDocTemplate(tmp_path, pagesize=A4)
+    elements = []
+    
+    # Get styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        spaceAfter=30,
+        alignment=1  # Center alignment
+    )
+    
+    # Add title
+    title_text = f"{report_type.replace('_', ' ').title()} Report"
+    if status != 'all':
+        title_text += f" - {status.title()} Status"
+    if constituency != 'all':
+        title_text += f" - {constituency}"
+    title_text += f"<br/>Period: {start_date} to {end_date}"
+    
+    elements.append(Paragraph(title_text, title_style))
+    elements.append(Spacer(1, 20))
+    
+    header = ['Application #', 'Applicant Name', 'Status', 'Type', 'Date', 'Officer', 'ID Number']
+    col_widths = [1.0*inch, 1.5*inch, 0.8*inch, 1.0*inch, 0.8*inch, 1.2*inch, 1.0*inch]
+    table_style = TableStyle([
+        # Header row styling
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        
+        # Data rows styling
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        
+        # Alternating row colors
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+    ])
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        cursor = conn.cursor(buffered=False)
+        query, params = report_rows_query(filters, REPORT_EXPORT_COLUMNS)
+        cursor.execute(query, params)
+
+        # One LongTable per chunk keeps each table's layout pass small; the header repeats on every page
+        while True:
+            rows = cursor.fetchmany(REPORT_JOB_CONFIG['rows_per_table'])
+            if not rows:
+                break
+            table_data = [header]
+            for app in rows:
                 table_data.append([
                     app[0] or 'N/A',  # application_number
                     app[1] or 'N/A',  # full_names
@@ -1659,130 +4225,414 @@ def export_admin_reports():
                     app[5] or 'N/A',  # officer_name
                     app[6] or 'N/A'   # generated_id_number
                 ])
-            
-            # Create table
-            table = Table(table_data, colWidths=[1.0*inch, 1.5*inch, 0.8*inch, 1.0*inch, 0.8*inch, 1.2*inch, 1.0*inch])
-            
-            # Style the table
-            table.setStyle(TableStyle([
-                # Header row styling
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                
-                # Data rows styling
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                
-                # Alternating row colors
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-            ]))
-            
+            table = LongTable(table_data, colWidths=col_widths, repeatRows=1)
+            table.setStyle(table_style)
             elements.append(table)
-            
-            # Add summary statistics
-            elements.append(Spacer(1, 30))
-            summary_style = ParagraphStyle(
-                'Summary',
-                parent=styles['Normal'],
-                fontSize=10,
-                spaceAfter=6
+        cursor.close()
+
+        # Get stats for summary - use same filters as main query
+        cursor = conn.cursor()
+        stats = fetch_report_stats(cursor, filters)
+        cursor.close()
+    finally:
+        conn.close()
+    
+    # Add summary statistics
+    elements.append(Spacer(1, 30))
+    summary_style = ParagraphStyle(
+        'Summary',
+        parent=styles['Normal'],
+        fontSize=10,
+        spaceAfter=6
+    )
+    elements.append(Paragraph("<b>Report Summary:</b>", summary_style))
+    
+    summary_data = [
+        ['Metric', 'Count'],
+        ['Total Applications', str(stats['total'])],
+        ['Pending', str(stats['pending'])],
+        ['Approved', str(stats['approved'])],
+        ['Rejected', str(stats['rejected'])],
+        ['Dispatched', str(stats['dispatched'])],
+        ['Collected', str(stats['collected'])]
+    ]
+    
+    summary_table = Table(summary_data, colWidths=[2*inch, 1*inch])
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    elements.append(summary_table)
+    
+    # Add footer with generation timestamp
+    elements.append(Spacer(1, 20))
+    footer_text = f"Report generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    elements.append(Paragraph(footer_text, styles['Normal']))
+    
+    try:
+        doc.build(elements)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return output_path
+
+def report_cache_key(filters):
+    """Name of a cached report file: its date range, then a hash of the normalized filter set"""
+    normalized = [filters[key] for key in ('start_date', 'end_date', 'status', 'report_type', 'constituency')]
+    digest = hashlib.sha256(json.dumps(normalized).encode()).hexdigest()
+    return f"{filters['start_date']}_{filters['end_date']}_{digest}"
+
+def report_key_range(cache_key):
+    """(start_date, end_date) encoded in a cache key, or None for files named another way"""
+    parts = cache_key.split('_')
+    if len(parts) != 3:
+        return None
+    return parts[0], parts[1]
+
+class ReportJobManager:
+    """Tracks PDF report jobs rendered in a process pool and caches finished files on disk"""
+
+    def __init__(self, max_workers=2, cache_dir='report_cache', cache_ttl=600, max_jobs=500,
+                 max_cache_bytes=500 * 1024 * 1024, max_cache_files=200):
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl
+        self.max_jobs = max_jobs
+        self.max_cache_bytes = max_cache_bytes
+        self.max_cache_files = max_cache_files
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._running = {}  # cache key -> job id, so identical exports share one render
+        self._stale_jobs = set()  # Running renders whose applications changed underneath them
+        self._unusable = set()  # Cache keys whose file on disk came from such a render
+        self._lock = threading.Lock()
+        self.stats = {'invalidated': 0, 'expired': 0, 'evicted': 0}
+
+    def _get_executor(self):
+        # Created lazily and with spawn, so worker processes never inherit locks held by request threads
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
             )
-            
-            # Get stats for summary - use same filters as main query
-            stats_query = '''
-                SELECT 
-                    COUNT(*) as total,
-                    COUNT(CASE WHEN status = 'submitted' THEN 1 END) as pending,
-                    COUNT(CASE WHEN status = 'approved' THEN 1 END) as approved,
-                    COUNT(CASE WHEN status = 'rejected' THEN 1 END) as rejected,
-                    COUNT(CASE WHEN status = 'dispatched' THEN 1 END) as dispatched,
-                    COUNT(CASE WHEN status = 'collected' THEN 1 END) as collected
-                FROM applications
-                WHERE DATE(created_at) BETWEEN %s AND %s
-            '''
-            
-            stats_params = [start_date, end_date]
-            
-            # Apply same filters as main report query
-            if status != 'all':
-                stats_query += ' AND status = %s'
-                stats_params.append(status)
-            
-            if constituency != 'all':
-                stats_query += ' AND constituency = %s'
-                stats_params.append(constituency)
-                
-            if report_type == 'renewals':
-                stats_query += ' AND application_type = %s'
-                stats_params.append('renewal')
-            elif report_type == 'new_applications':
-                stats_query += ' AND application_type = %s'
-                stats_params.append('new')
-            
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute(stats_query, stats_params)
-            stats = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            
-            summary_title = Paragraph("<b>Report Summary:</b>", summary_style)
-            elements.append(summary_title)
-            
-            summary_data = [
-                ['Metric', 'Count'],
-                ['Total Applications', str(stats[0] or 0)],
-                ['Pending', str(stats[1] or 0)],
-                ['Approved', str(stats[2] or 0)],
-                ['Rejected', str(stats[3] or 0)],
-                ['Dispatched', str(stats[4] or 0)],
-                ['Collected', str(stats[5] or 0)]
-            ]
-            
-            summary_table = Table(summary_data, colWidths=[2*inch, 1*inch])
-            summary_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.lightblue),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ]))
-            
-            elements.append(summary_table)
-            
-            # Add footer with generation timestamp
-            elements.append(Spacer(1, 20))
-            footer_text = f"Report generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-            footer = Paragraph(footer_text, styles['Normal'])
-            elements.append(footer)
-            
-            # Build PDF
-            doc.build(elements)
-            
-            # Get PDF content
-            buffer.seek(0)
-            pdf_content = buffer.getvalue()
-            buffer.close()
-            
+        return self._executor
+
+    def cache_path(self, cache_key):
+        return os.path.join(self.cache_dir, f"{cache_key}.pdf")
+
+    def _is_fresh(self, cache_key):
+        path = self.cache_path(cache_key)
+        return (cache_key not in self._unusable and os.path.exists(path)
+                and time.time() - os.path.getmtime(path) < self.cache_ttl)
+
+    def _remove(self, path, counter):
+        try:
+            os.remove(path)
+            self.stats[counter] += 1
+        except FileNotFoundError:
+            pass
+
+    def _prune(self):
+        """Delete expired PDFs, leftovers of crashed renders, then the oldest files over the caps"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        now = time.time()
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if name.endswith('.tmp'):
+                if now - stat.st_mtime > 3600:
+                    self._remove(path, 'expired')
+            elif name.endswith('.pdf'):
+                if now - stat.st_mtime >= self.cache_ttl:
+                    self._remove(path, 'expired')
+                else:
+                    files.append((stat.st_mtime, stat.st_size, path, name[:-4]))
+
+        files.sort()
+        total = sum(size for _, size, _, _ in files)
+        while files and (total > self.max_cache_bytes or len(files) > self.max_cache_files):
+            _, size, path, cache_key = files.pop(0)
+            self._remove(path, 'evicted')
+            total -= size
+
+    def invalidate_dates(self, dates):
+        """Drop cached PDFs, and running renders, whose date range covers any of the given dates"""
+        days = {day.isoformat() if hasattr(day, 'isoformat') else str(day) for day in dates}
+        if not days:
+            return
+        with self._lock:
+            # The cache directory is the record of what exists; file names carry the range
+            cache_keys = set(self._running)
+            if os.path.isdir(self.cache_dir):
+                cache_keys.update(name[:-4] for name in os.listdir(self.cache_dir) if name.endswith('.pdf'))
+            for cache_key in cache_keys:
+                date_range = report_key_range(cache_key)
+                if date_range and not any(date_range[0] <= day <= date_range[1] for day in days):
+                    continue
+                self._remove(self.cache_path(cache_key), 'invalidated')
+                if cache_key in self._running:
+                    self._stale_jobs.add(self._running.pop(cache_key))
+
+    def _new_job(self, filters, cache_key, status):
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': status,
+            'cache_key': cache_key,
+            'filename': f"{filters['report_type']}_report_{filters['start_date']}_to_{filters['end_date']}.pdf",
+            'error': None,
+            'created_at': datetime.now().isoformat(),
+            'finished_at': None
+        }
+        job['status_url'] = f"/api/admin/reports/jobs/{job['id']}"
+        job['download_url'] = f"/api/admin/reports/jobs/{job['id']}/download"
+        self._jobs[job['id']] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+        return job
+
+    def submit(self, filters):
+        """Return a job for these filters, reusing a fresh cached file or an identical running job"""
+        cache_key = report_cache_key(filters)
+        with self._lock:
+            if self._is_fresh(cache_key):
+                job = self._new_job(filters, cache_key, 'completed')
+                job['finished_at'] = job['created_at']
+                return dict(job)
+
+            running_id = self._running.get(cache_key)
+            if running_id and running_id in self._jobs:
+                return dict(self._jobs[running_id])
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._prune()
+            job = self._new_job(filters, cache_key, 'running')
+            self._running[cache_key] = job['id']
+            future = self._get_executor().submit(render_report_pdf, filters, self.cache_path(cache_key))
+            future.add_done_callback(lambda f, job_id=job['id']: self._finish(job_id, f))
+            return dict(job)
+
+    def _finish(self, job_id, future):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            if self._running.get(job['cache_key']) == job_id:
+                self._running.pop(job['cache_key'])
+            error = future.exception()
+            if error:
+                print(f"Report job {job_id} failed: {error}")
+                job['status'] = 'failed'
+                job['error'] = str(error)
+            else:
+                job['status'] = 'completed'
+                if job_id in self._stale_jobs:
+                    # Applications changed while this rendered: its requester still gets
+                    # the file, but later exports render again
+                    self._unusable.add(job['cache_key'])
+                else:
+                    self._unusable.discard(job['cache_key'])
+            self._stale_jobs.discard(job_id)
+            job['finished_at'] = datetime.now().isoformat()
+            self._prune()
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+REPORT_JOBS = ReportJobManager(
+    max_workers=REPORT_JOB_CONFIG['max_workers'],
+    cache_dir=REPORT_JOB_CONFIG['cache_dir'],
+    cache_ttl=REPORT_JOB_CONFIG['cache_ttl'],
+    max_jobs=REPORT_JOB_CONFIG['max_jobs'],
+    max_cache_bytes=REPORT_JOB_CONFIG['max_cache_bytes'],
+    max_cache_files=REPORT_JOB_CONFIG['max_cache_files']
+)
+
+def send_report_pdf(job):
+    """Send a finished report, or None if its file has been pruned or invalidated since"""
+    try:
+        return send_file(
+            REPORT_JOBS.cache_path(job['cache_key']),
+            mimetype='application/pdf',
+            as_attachment=True,
+            download_name=job['filename']
+        )
+    except FileNotFoundError:
+        return None
+
+# Reports endpoints
+def load_admin_report(filters):
+    """Run the report queries for one filter set"""
+    report_type = filters['report_type']
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    query, params = report_rows_query(filters, """
+        a.id, a.application_number, a.full_names, a.status, 
+        a.application_type, a.created_at, a.updated_at, 
+        o.full_name as officer_name, a.generated_id_number
+    """)
+    cursor.execute(query, params)
+    applications = cursor.fetchall()
+    
+    # Get statistics
+    stats = fetch_report_stats(cursor, filters)
+    
+    cursor.close()
+    conn.close()
+    
+    # Convert applications to list of dictionaries
+    application_list = []
+    for app in applications:
+        if report_type == 'officers_by_constituency':
+            # Special handling for officers report - different column structure
+            application_list.append({
+                'id': app[3],  # o.id
+                'application_number': app[0],  # o.station (station)
+                'full_names': app[1],  # o.full_name (officer name)
+                'status': app[2],  # o.status (officer status)
+                'application_type': app[8],  # 'officer_report'
+                'created_at': app[9].isoformat() if app[9] else None,
+                'updated_at': app[10].isoformat() if app[10] else None,
+                'officer_name': app[1],  # o.full_name
+                'generated_id_number': app[7]  # o.id_number
+            })
+        else:
+            # Standard application structure
+            application_list.append({
+                'id': app[0],
+                'application_number': app[1],
+                'full_names': app[2],
+                'status': app[3],
+                'application_type': app[4],
+                'created_at': app[5].isoformat() if app[5] else None,
+                'updated_at': app[6].isoformat() if app[6] else None,
+                'officer_name': app[7] or 'N/A',
+                'generated_id_number': app[8]
+            })
+    
+    return {
+        'applications': application_list,
+        'stats': stats
+    }
+
+@app.route('/api/admin/reports', methods=['GET'])
+def get_admin_reports():
+    try:
+        try:
+            filters = parse_report_filters()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Identical concurrent requests share one load; results are reused until invalidated
+        cache_key = tuple(filters[key] for key in ('start_date', 'end_date', 'status', 'report_type', 'constituency'))
+        report = REPORT_CACHE.get_or_load(cache_key, lambda: load_admin_report(filters))
+        
+        return jsonify(report)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/reports/export', methods=['GET'])
+def export_admin_reports():
+    try:
+        export_format = request.args.get('format', 'csv')
+        if export_format not in ('csv', 'pdf'):
+            return jsonify({'error': 'Invalid export format. Use csv or pdf.'}), 400
+        try:
+            filters = parse_report_filters()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        start_date = filters['start_date']
+        end_date = filters['end_date']
+        report_type = filters['report_type']
+        
+        if export_format == 'csv':
+            # Stream rows as they are read; no Content-Length, so the response is chunked
             return Response(
-                pdf_content,
-                mimetype='application/pdf',
-                headers={'Content-Disposition': f'attachment; filename={report_type}_report_{start_date}_to_{end_date}.pdf'}
+                stream_with_context(stream_report_csv(filters)),
+                mimetype='text/csv',
+                headers={
+                    'Content-Disposition': f'attachment; filename={report_type}_report_{start_date}_to_{end_date}.csv',
+                    'X-Accel-Buffering': 'no'
+                }
             )
         
-        else:
-            return jsonify({'error': 'Invalid export format. Use csv or pdf.'}), 400
+        # PDF exports render in the background; a cached report is sent straight away
+        job = REPORT_JOBS.submit(filters)
+        if job['status'] == 'completed':
+            response = send_report_pdf(job)
+            if response:
+                return response
+            # Removed between the cache check and sending; render it again
+            job = REPORT_JOBS.submit(filters)
+        return jsonify({'job': job}), 202
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/admin/reports/rollup/rebuild', methods=['POST'])
+def rebuild_report_rollup():
+    try:
+        conn = get_db_connection()
+        rows = rebuild_daily_stats(conn)
+        conn.commit()
+        conn.close()
+        REPORT_CACHE.clear()
+        
+        return jsonify({'message': 'Report rollup rebuilt', 'rows': rows}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/reports/jobs', methods=['POST'])
+def create_report_job():
+    try:
+        try:
+            filters = parse_report_filters(request.get_json(silent=True) or request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        job = REPORT_JOBS.submit(filters)
+        return jsonify({'job': job}), 202 if job['status'] != 'completed' else 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/reports/jobs/<job_id>', methods=['GET'])
+def get_report_job(job_id):
+    job = REPORT_JOBS.get(job_id)
+    if not job:
+        return jsonify({'error': 'Report job not found'}), 404
+    return jsonify({'job': job}), 200
+
+@app.route('/api/admin/reports/jobs/<job_id>/download', methods=['GET'])
+def download_report_job(job_id):
+    try:
+        job = REPORT_JOBS.get(job_id)
+        if not job:
+            return jsonify({'error': 'Report job not found'}), 404
+        if job['status'] != 'completed':
+            return jsonify({'error': f"Report is not ready (status: {job['status']})"}), 409
+        response = send_report_pdf(job)
+        if not response:
+            return jsonify({'error': 'Report has expired, please export it again'}), 410
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 if __name__ == '__main__':
     app.run(debug=True, host='localhost', port=5000)
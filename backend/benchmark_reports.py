@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Benchmark the admin report queries on a synthetic applications table
+Builds a scratch database, fills it with generated rows and times the old
+DATE(created_at) BETWEEN filter against the half-open range filter, before
+and after adding the report indexes.
+
+Usage: python benchmark_reports.py [rows]   (default 1,000,000 rows)
+"""
+
+import mysql.connector
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Database configuration (the benchmark creates and drops its own database)
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',  # Your MySQL username
+    'password': ''  # Your MySQL password
+}
+BENCH_DATABASE = 'dig_id_report_bench'
+
+CONSTITUENCIES = ['Nairobi West', 'Nairobi East', 'Nairobi North', 'Mombasa', 'Kisumu', 'Nakuru',
+                  'Eldoret', 'Thika', 'Kitale', 'Garissa', 'Machakos', 'Nyeri']
+STATUSES = ['submitted', 'approved', 'rejected', 'ready_for_dispatch', 'dispatched',
+            'ready_for_collection', 'collected']
+REPORT_INDEXES = [
+    "CREATE INDEX idx_applications_created_status ON applications (created_at, status)",
+    "CREATE INDEX idx_applications_constituency_created ON applications (constituency, created_at)",
+    "CREATE INDEX idx_applications_type_created ON applications (application_type, created_at)"
+]
+
+# (name, old query, new query); each selects the same rows for a one-month window
+STATS_COLUMNS = """
+    COUNT(*) as total,
+    COUNT(CASE WHEN status = 'submitted' THEN 1 END) as pending,
+    COUNT(CASE WHEN status = 'approved' THEN 1 END) as approved,
+    COUNT(CASE WHEN status = 'rejected' THEN 1 END) as rejected,
+    COUNT(CASE WHEN status = 'dispatched' THEN 1 END) as dispatched,
+    COUNT(CASE WHEN status = 'collected' THEN 1 END) as collected
+"""
+QUERIES = [
+    ('stats, all constituencies',
+     f"SELECT {STATS_COLUMNS} FROM applications WHERE DATE(created_at) BETWEEN %(start)s AND %(end)s",
+     f"SELECT {STATS_COLUMNS} FROM applications WHERE created_at >= %(start)s AND created_at < %(end_excl)s"),
+    ('stats, one constituency',
+     f"SELECT {STATS_COLUMNS} FROM applications WHERE DATE(created_at) BETWEEN %(start)s AND %(end)s AND constituency = %(constituency)s",
+     f"SELECT {STATS_COLUMNS} FROM applications WHERE created_at >= %(start)s AND created_at < %(end_excl)s AND constituency = %(constituency)s"),
+    ('rows, renewals only',
+     "SELECT id, application_number, status, created_at FROM applications WHERE DATE(created_at) BETWEEN %(start)s AND %(end)s AND application_type = 'renewal' ORDER BY created_at DESC",
+     "SELECT id, application_number, status, created_at FROM applications WHERE created_at >= %(start)s AND created_at < %(end_excl)s AND application_type = 'renewal' ORDER BY created_at DESC"),
+    ('rows, approved only',
+     "SELECT id, application_number, status, created_at FROM applications WHERE DATE(created_at) BETWEEN %(start)s AND %(end)s AND status = 'approved' ORDER BY created_at DESC",
+     "SELECT id, application_number, status, created_at FROM applications WHERE created_at >= %(start)s AND created_at < %(end_excl)s AND status = 'approved' ORDER BY created_at DESC")
+]
+PARAMS = {
+    'start': '2025-06-01',
+    'end': '2025-06-30',
+    'end_excl': '2025-07-01',
+    'constituency': 'Kisumu'
+}
+
+def create_table(cursor, rows):
+    cursor.execute(f"DROP DATABASE IF EXISTS {BENCH_DATABASE}")
+    cursor.execute(f"CREATE DATABASE {BENCH_DATABASE}")
+    cursor.execute(f"USE {BENCH_DATABASE}")
+    cursor.execute("""
+        CREATE TABLE applications (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            application_number VARCHAR(50) UNIQUE NOT NULL,
+            application_type ENUM('new', 'renewal') NOT NULL,
+            full_names VARCHAR(100) NOT NULL,
+            constituency VARCHAR(100) NULL,
+            status VARCHAR(30) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    print(f"Inserting {rows:,} synthetic applications...")
+    random.seed(42)
+    start = datetime(2023, 1, 1)
+    span_seconds = int((datetime(2026, 1, 1) - start).total_seconds())
+    batch = []
+    for i in range(1, rows + 1):
+        batch.append((
+            f"APP{i:010d}",
+            'renewal' if random.random() < 0.2 else 'new',
+            f"Applicant {i}",
+            random.choice(CONSTITUENCIES),
+            random.choice(STATUSES),
+            start + timedelta(seconds=random.randrange(span_seconds))
+        ))
+        if len(batch) == 10000:
+            cursor.executemany("""
+                INSERT INTO applications (application_number, application_type, full_names,
+                                          constituency, status, created_at)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, batch)
+            batch = []
+    if batch:
+        cursor.executemany("""
+            INSERT INTO applications (application_number, application_type, full_names,
+                                      constituency, status, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, batch)
+    cursor.execute("ANALYZE TABLE applications")
+    cursor.fetchall()
+
+def time_query(cursor, query, repeats=5):
+    """Return the median wall time of a query in milliseconds"""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        cursor.execute(query, PARAMS)
+        cursor.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def explain_access(cursor, query):
+    cursor.execute("EXPLAIN " + query, PARAMS)
+    plan = cursor.fetchone()
+    return f"type={plan['type']} key={plan['key']} rows={plan['rows']}"
+
+def run_suite(cursor, label):
+    print(f"\n=== {label} ===")
+    print(f"{'query':<28} {'old ms':>10} {'new ms':>10}  new plan")
+    for name, old_query, new_query in QUERIES:
+        old_ms = time_query(cursor, old_query)
+        new_ms = time_query(cursor, new_query)
+        print(f"{name:<28} {old_ms:>10.1f} {new_ms:>10.1f}  {explain_access(cursor, new_query)}")
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    conn = mysql.connector.connect(**DB_CONFIG, autocommit=True)
+    cursor = conn.cursor(dictionary=True)
+    try:
+        create_table(cursor, rows)
+        run_suite(cursor, 'Without report indexes')
+        for statement in REPORT_INDEXES:
+            cursor.execute(statement)
+        cursor.execute("ANALYZE TABLE applications")
+        cursor.fetchall()
+        run_suite(cursor, 'With report indexes')
+    finally:
+        cursor.execute(f"DROP DATABASE IF EXISTS {BENCH_DATABASE}")
+        cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -36,3 +36,138 @@ ALTER TABLE applications MODIFY COLUMN status ENUM('submitted', 'approved', 'rej
 ALTER TABLE payments ADD COLUMN IF NOT EXISTS mpesa_checkout_id VARCHAR(100);
 ALTER TABLE payments ADD COLUMN IF NOT EXISTS mpesa_receipt VARCHAR(100);
 ALTER TABLE payments ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
+
+-- Record why a background STK push failed
+ALTER TABLE payments ADD COLUMN IF NOT EXISTS failure_reason VARCHAR(255) NULL;
+
+-- Per-year number sequences (APP/REP application numbers, ID numbers)
+CREATE TABLE IF NOT EXISTS number_sequences (
+    name VARCHAR(20) NOT NULL,
+    year SMALLINT NOT NULL,
+    next_value BIGINT NOT NULL,
+    PRIMARY KEY (name, year)
+);
+
+-- Continue the application sequences after the numbers already issued
+INSERT IGNORE INTO number_sequences (name, year, next_value)
+SELECT LEFT(application_number, 3), CAST(SUBSTRING(application_number, 4, 4) AS UNSIGNED),
+       MAX(CAST(SUBSTRING(application_number, 8) AS UNSIGNED)) + 1
+FROM applications
+WHERE application_number REGEXP '^(APP|REP)[0-9]{10,}$'
+GROUP BY LEFT(application_number, 3), SUBSTRING(application_number, 4, 4);
+
+-- Continue the national ID sequence after the numbers already issued
+INSERT IGNORE INTO number_sequences (name, year, next_value)
+SELECT 'ID', CAST(SUBSTRING(generated_id_number, 3, 4) AS UNSIGNED),
+       MAX(CAST(SUBSTRING(generated_id_number, 7) AS UNSIGNED)) + 1
+FROM applications
+WHERE generated_id_number REGEXP '^ID[0-9]{12}$'
+GROUP BY SUBSTRING(generated_id_number, 3, 4);
+
+-- Indexes backing keyset pagination of the admin lists (InnoDB appends id to each)
+CREATE INDEX IF NOT EXISTS idx_applications_created ON applications (created_at);
+CREATE INDEX IF NOT EXISTS idx_applications_status_created ON applications (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_applications_status_updated ON applications (status, updated_at);
+CREATE INDEX IF NOT EXISTS idx_applications_officer_created ON applications (officer_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_officers_status_created ON officers (status, created_at);
+
+-- Composite indexes matching the report filter combinations
+CREATE INDEX IF NOT EXISTS idx_applications_created_status ON applications (created_at, status);
+CREATE INDEX IF NOT EXISTS idx_applications_constituency_created ON applications (constituency, created_at);
+CREATE INDEX IF NOT EXISTS idx_applications_type_created ON applications (application_type, created_at);
+
+-- Per-day application counts by constituency, type and status (keyed on the creation date)
+CREATE TABLE IF NOT EXISTS application_daily_stats (
+    stat_date DATE NOT NULL,
+    constituency VARCHAR(100) NOT NULL DEFAULT '',
+    application_type VARCHAR(20) NOT NULL,
+    status VARCHAR(30) NOT NULL,
+    application_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (stat_date, constituency, application_type, status),
+    INDEX idx_daily_stats_constituency (constituency, stat_date)
+);
+
+-- Initial fill; POST /api/admin/reports/rollup/rebuild recomputes it later
+DELETE FROM application_daily_stats;
+INSERT INTO application_daily_stats (stat_date, constituency, application_type, status, application_count)
+SELECT DATE(created_at), COALESCE(constituency, ''), application_type, COALESCE(status, ''), COUNT(*)
+FROM applications
+GROUP BY DATE(created_at), COALESCE(constituency, ''), application_type, COALESCE(status, '');
+
+-- Normalize constituency to a foreign key on officers and applications
+ALTER TABLE officers ADD COLUMN IF NOT EXISTS constituency_id INT NULL;
+ALTER TABLE applications ADD COLUMN IF NOT EXISTS constituency_id INT NULL;
+
+UPDATE officers o
+JOIN constituencies c ON c.name = TRIM(o.constituency)
+SET o.constituency_id = c.id
+WHERE o.constituency_id IS NULL;
+
+UPDATE applications a
+JOIN constituencies c ON c.name = TRIM(a.constituency)
+SET a.constituency_id = c.id
+WHERE a.constituency_id IS NULL;
+
+ALTER TABLE officers
+    ADD CONSTRAINT fk_officers_constituency FOREIGN KEY IF NOT EXISTS (constituency_id) REFERENCES constituencies(id) ON DELETE SET NULL;
+ALTER TABLE applications
+    ADD CONSTRAINT fk_applications_constituency FOREIGN KEY IF NOT EXISTS (constituency_id) REFERENCES constituencies(id) ON DELETE SET NULL;
+
+-- Officer dashboard lookups: constituency_id and officer_id halves of the UNION
+CREATE INDEX IF NOT EXISTS idx_applications_constituency_id_created ON applications (constituency_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_officers_constituency_id ON officers (constituency_id);
+
+-- Content-addressed document storage: one blob per distinct SHA-256
+CREATE TABLE IF NOT EXISTS document_blobs (
+    sha256 CHAR(64) PRIMARY KEY,
+    storage_path VARCHAR(255) NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    mime_type VARCHAR(100) NOT NULL,
+    ref_count INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Legacy rows keep content_hash NULL until manage_uploads.py adopt hashes them
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash CHAR(64) NULL;
+CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents (content_hash);
+
+-- Offline station sync: one row per replayed journal entry, so pushes are idempotent
+CREATE TABLE IF NOT EXISTS station_sync_ops (
+    op_uuid CHAR(36) PRIMARY KEY,
+    station_id VARCHAR(50) NOT NULL,
+    op_type VARCHAR(30) NOT NULL,
+    status ENUM('applied', 'rejected') NOT NULL,
+    result JSON NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_station_sync_ops_station (station_id, applied_at)
+);
+
+-- Station pulls: changes in one constituency ordered by updated_at
+CREATE INDEX IF NOT EXISTS idx_applications_constituency_id_updated ON applications (constituency_id, updated_at);
+
+-- Version counters for in-process caches; writers bump a row in their transaction
+CREATE TABLE IF NOT EXISTS cache_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1
+);
+INSERT IGNORE INTO cache_versions (name, version) VALUES ('constituencies', 1);
+
+-- Status history: time-in-status queries read one application's rows in order.
+-- Deleting an officer or admin keeps their audit rows and clears the actor
+CREATE INDEX IF NOT EXISTS idx_status_history_application_changed ON status_history (application_id, changed_at);
+ALTER TABLE status_history
+    DROP FOREIGN KEY IF EXISTS status_history_ibfk_2,
+    DROP FOREIGN KEY IF EXISTS status_history_ibfk_3;
+ALTER TABLE status_history
+    ADD CONSTRAINT fk_status_history_admin FOREIGN KEY IF NOT EXISTS (changed_by_admin_id) REFERENCES admins(id) ON DELETE SET NULL,
+    ADD CONSTRAINT fk_status_history_officer FOREIGN KEY IF NOT EXISTS (changed_by_officer_id) REFERENCES officers(id) ON DELETE SET NULL;
+
+-- M-Pesa callbacks waiting to be matched to their payment. A callback can
+-- arrive before the STK dispatcher has stored the CheckoutRequestID
+CREATE TABLE IF NOT EXISTS mpesa_pending_callbacks (
+    checkout_request_id VARCHAR(100) PRIMARY KEY,
+    result_code INT NOT NULL,
+    mpesa_receipt VARCHAR(100) NULL,
+    received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_payments_mpesa_checkout_id ON payments (mpesa_checkout_id);
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Safaricom Daraja API
+Run this script and start the backend with MPESA_BASE_URL=http://localhost:8089
+to exercise the payment flow without the sandbox
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import sys
+import time
+import uuid
+
+# Fake server configuration
+FAKE_CONFIG = {
+    'port': 8089,
+    'token_expires_in': 3599,  # Seconds, sent as a string like the real API
+    'stk_delay': 0.0  # Seconds to sleep before answering an STK push
+}
+
+STATS = {'token_requests': 0, 'stk_requests': 0}
+ISSUED_TOKENS = set()
+
+class FakeDarajaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Allow keep-alive so session reuse is observable
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.startswith('/oauth/v1/generate'):
+            STATS['token_requests'] += 1
+            token = uuid.uuid4().hex
+            ISSUED_TOKENS.add(token)
+            self.send_json(200, {
+                'access_token': token,
+                'expires_in': str(FAKE_CONFIG['token_expires_in'])
+            })
+        elif self.path == '/stats':
+            self.send_json(200, STATS)
+        else:
+            self.send_json(404, {'errorMessage': 'Not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+
+        if self.path != '/mpesa/stkpush/v1/processrequest':
+            self.send_json(404, {'errorMessage': 'Not found'})
+            return
+
+        STATS['stk_requests'] += 1
+        token = self.headers.get('Authorization', '').replace('Bearer ', '')
+        if token not in ISSUED_TOKENS:
+            self.send_json(401, {'errorCode': '404.001.03', 'errorMessage': 'Invalid Access Token'})
+            return
+
+        if FAKE_CONFIG['stk_delay']:
+            time.sleep(FAKE_CONFIG['stk_delay'])
+
+        self.send_json(200, {
+            'MerchantRequestID': uuid.uuid4().hex[:12],
+            'CheckoutRequestID': f"ws_CO_{uuid.uuid4().hex[:20]}",
+            'ResponseCode': '0',
+            'ResponseDescription': 'Success. Request accepted for processing',
+            'CustomerMessage': f"Success. Request accepted for processing ({payload.get('AccountReference')})"
+        })
+
+    def log_message(self, format, *args):
+        print(f"[fake-daraja] {self.address_string()} {format % args}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        FAKE_CONFIG['stk_delay'] = float(sys.argv[1])
+    server = ThreadingHTTPServer(('localhost', FAKE_CONFIG['port']), FakeDarajaHandler)
+    print(f"Fake Daraja listening on http://localhost:{FAKE_CONFIG['port']} (stk delay {FAKE_CONFIG['stk_delay']}s)")
+    server.serve_forever()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for the content-addressed document store
+Run from the backend directory:
+
+    python manage_uploads.py adopt    # hash legacy uploads into the blob store
+    python manage_uploads.py migrate  # move flat blobs into the sharded ab/cd/ layout
+    python manage_uploads.py gc       # fix ref counts and delete unreferenced blobs
+    python manage_uploads.py verify   # re-hash every blob and report corruption
+
+migrate works in batches and can be stopped and re-run at any point; the
+backend serves blobs from either location while it runs.
+"""
+
+import mysql.connector
+import hashlib
+import mimetypes
+import os
+import sys
+import time
+
+# Database configuration
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',  # Your MySQL username
+    'password': '',  # Your MySQL password
+    'database': 'dig_id'
+}
+
+UPLOAD_DIR = 'uploads'
+CHUNK_SIZE = 64 * 1024
+GC_GRACE_SECONDS = 24 * 3600  # Leave recent files alone; an upload may still be committing
+MIGRATE_BATCH_SIZE = 500
+DERIVATIVE_SIZES = ('small', 'medium', 'large')  # Thumbnails the backend writes as <name>.<size>.jpg
+
+def blob_storage_path(sha256, extension):
+    """Sharded location of a blob under the upload directory (same as app.py)"""
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+def adopt(conn):
+    """Move legacy {application_number}_{key}_{name} files into the blob store"""
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT id, file_path FROM documents WHERE content_hash IS NULL ORDER BY id")
+    documents = cursor.fetchall()
+    adopted = missing = 0
+
+    for document in documents:
+        legacy_path = os.path.join(UPLOAD_DIR, document['file_path'])
+        if not os.path.isfile(legacy_path):
+            print(f"Missing file for document {document['id']}: {legacy_path}")
+            missing += 1
+            continue
+
+        sha256, size = hash_file(legacy_path)
+        mime_type = mimetypes.guess_type(legacy_path)[0] or 'application/octet-stream'
+        cursor.execute("""
+            INSERT INTO document_blobs (sha256, storage_path, size_bytes, mime_type, ref_count)
+            VALUES (%s, %s, %s, %s, 1)
+            ON DUPLICATE KEY UPDATE ref_count = ref_count + 1
+        """, (sha256, blob_storage_path(sha256, mimetypes.guess_extension(mime_type) or ''), size, mime_type))
+        cursor.execute("SELECT storage_path FROM document_blobs WHERE sha256 = %s", (sha256,))
+        storage_path = cursor.fetchone()['storage_path']
+
+        blob_path = os.path.join(UPLOAD_DIR, storage_path)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.link(legacy_path, blob_path)
+        cursor.execute("UPDATE documents SET file_path = %s, content_hash = %s WHERE id = %s",
+                       (storage_path, sha256, document['id']))
+        conn.commit()
+        # The legacy name is only removed once the row points at the blob
+        os.remove(legacy_path)
+        adopted += 1
+
+    cursor.close()
+    print(f"Adopted {adopted} document(s), {missing} missing")
+
+def migrate(conn):
+    """Move flat <sha256><ext> blobs to ab/cd/<sha256><ext>, one batch per transaction"""
+    cursor = conn.cursor(dictionary=True)
+    moved = missing = 0
+
+    while True:
+        # Rows already migrated contain a '/', so a re-run picks up where the last one stopped
+        cursor.execute("""
+            SELECT sha256, storage_path FROM document_blobs
+            WHERE storage_path NOT LIKE '%%/%%'
+            ORDER BY sha256
+            LIMIT %s
+        """, (MIGRATE_BATCH_SIZE,))
+        blobs = cursor.fetchall()
+        if not blobs:
+            break
+
+        for blob in blobs:
+            sharded = blob_storage_path(blob['sha256'], os.path.splitext(blob['storage_path'])[1])
+            flat_path = os.path.join(UPLOAD_DIR, blob['storage_path'])
+            sharded_path = os.path.join(UPLOAD_DIR, sharded)
+
+            # Move the file before the rows; the backend finds bare names in
+            # either place, so a crash between the two steps is harmless
+            if os.path.exists(flat_path):
+                os.makedirs(os.path.dirname(sharded_path), exist_ok=True)
+                os.replace(flat_path, sharded_path)
+            elif not os.path.exists(sharded_path):
+                print(f"Missing file for blob {blob['sha256']}: {flat_path}")
+                missing += 1
+
+            cursor.execute("UPDATE document_blobs SET storage_path = %s WHERE sha256 = %s",
+                           (sharded, blob['sha256']))
+            cursor.execute("UPDATE documents SET file_path = %s WHERE content_hash = %s",
+                           (sharded, blob['sha256']))
+            moved += 1
+
+        conn.commit()
+        print(f"Migrated {moved} blob(s) so far")
+
+    cursor.close()
+    print(f"Migration complete: {moved} blob(s) moved, {missing} missing")
+
+def gc(conn):
+    """Recount references from documents, then delete blobs nothing points at"""
+    cursor = conn.cursor(dictionary=True)
+    # Documents disappear through ON DELETE CASCADE, so the counts are rebuilt
+    # here rather than trusted
+    cursor.execute("""
+        UPDATE document_blobs b
+        SET ref_count = (SELECT COUNT(*) FROM documents d WHERE d.content_hash = b.sha256)
+    """)
+    conn.commit()
+
+    cutoff = time.time() - GC_GRACE_SECONDS
+    cursor.execute("SELECT sha256, storage_path, created_at FROM document_blobs WHERE ref_count = 0")
+    removed = 0
+    for blob in cursor.fetchall():
+        blob_path = os.path.join(UPLOAD_DIR, blob['storage_path'])
+        if blob['created_at'].timestamp() > cutoff:
+            continue
+        cursor.execute("DELETE FROM document_blobs WHERE sha256 = %s AND ref_count = 0", (blob['sha256'],))
+        if cursor.rowcount:
+            conn.commit()
+            if os.path.exists(blob_path):
+                os.remove(blob_path)
+            removed += 1
+
+    # Blob files with no row at all come from uploads whose transaction rolled back
+    cursor.execute("SELECT storage_path FROM document_blobs")
+    known = {row['storage_path'] for row in cursor.fetchall()}
+    cursor.execute("SELECT file_path FROM documents WHERE content_hash IS NULL")
+    known.update(row['file_path'] for row in cursor.fetchall())
+    cursor.close()
+
+    known_stems = {os.path.splitext(path)[0] for path in known}
+
+    orphans = 0
+    for directory, _, names in os.walk(UPLOAD_DIR):
+        for name in names:
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, UPLOAD_DIR).replace(os.sep, '/')
+            if relative in known or os.path.getmtime(path) > cutoff:
+                continue
+            # Thumbnails live as long as the file they were made from
+            stem, size = os.path.splitext(os.path.splitext(relative)[0])
+            if relative.endswith('.jpg') and size[1:] in DERIVATIVE_SIZES and stem in known_stems:
+                continue
+            os.remove(path)
+            orphans += 1
+
+    print(f"Removed {removed} unreferenced blob(s) and {orphans} orphaned file(s)")
+
+def verify(conn):
+    """Re-hash every blob and compare with its name"""
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT sha256, storage_path, size_bytes FROM document_blobs ORDER BY sha256")
+    checked = bad = 0
+    for blob in cursor.fetchall():
+        blob_path = os.path.join(UPLOAD_DIR, blob['storage_path'])
+        checked += 1
+        if not os.path.isfile(blob_path):
+            print(f"MISSING  {blob['storage_path']}")
+            bad += 1
+            continue
+        sha256, size = hash_file(blob_path)
+        if sha256 != blob['sha256'] or size != blob['size_bytes']:
+            print(f"CORRUPT  {blob['storage_path']} (hash {sha256}, {size} bytes)")
+            bad += 1
+    cursor.close()
+    print(f"Checked {checked} blob(s), {bad} problem(s)")
+    return bad
+
+COMMANDS = {'adopt': adopt, 'migrate': migrate, 'gc': gc, 'verify': verify}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print(f"Usage: python manage_uploads.py [{'|'.join(COMMANDS)}]")
+        sys.exit(1)
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        result = COMMANDS[sys.argv[1]](conn)
+    finally:
+        conn.close()
+    sys.exit(1 if result else 0)
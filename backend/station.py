@@ -0,0 +1,892 @@
+#!/usr/bin/env python3
+"""
+Offline-first station mode
+Runs at a registration station in place of the central backend for the
+officer screens. Submissions, lost ID replacements and card-arrived/collected
+updates are written to a local SQLite journal and answered immediately; a
+background sync pushes the journal to the central backend (/api/stations/sync/*)
+whenever the link is up and pulls down the station's constituency. Officer
+sign-in, ID search and the constituency list fall back to local copies when
+the link is down; every other /api route is passed through to the central
+backend and needs the link.
+
+    python station.py            # serve the officer API on port 5000 and sync in the background
+    python station.py sync       # run one sync pass and exit
+    python station.py status     # print journal and number-block counts
+
+Testing with two local databases: run app.py against MySQL on another port
+with STATION_SYNC_TOKENS=test-station:secret, then start this script with
+STATION_CENTRAL_URL=http://localhost:5001 STATION_TOKEN=secret.
+"""
+
+from flask import Flask, request, jsonify, Response
+from flask_cors import CORS
+from werkzeug.security import generate_password_hash, check_password_hash
+from datetime import datetime, timedelta
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+import jwt
+import requests
+
+import app as central
+
+# Station configuration
+STATION_CONFIG = {
+    'station_id': os.environ.get('STATION_ID', 'test-station'),
+    'token': os.environ.get('STATION_TOKEN', ''),
+    'central_url': os.environ.get('STATION_CENTRAL_URL', 'http://localhost:5001'),
+    'constituency': os.environ.get('STATION_CONSTITUENCY', ''),
+    'database': os.environ.get('STATION_DB', 'station.db'),
+    'upload_dir': os.environ.get('STATION_UPLOAD_DIR', 'station_uploads'),
+    'port': 5000,  # The officer screens talk to localhost:5000
+    'sync_interval': 30,  # Seconds between background sync passes
+    'push_batch_size': 50,  # Journal entries per push
+    'push_batch_bytes': 15 * 1024 * 1024,  # Stay under the central MAX_CONTENT_LENGTH
+    'number_block_size': 100,  # Application numbers reserved per request
+    'number_low_water': 20,  # Reserve more when fewer than this remain
+    'pull_overlap': 300,  # Seconds re-read on every pull, for rows committed late
+    'timeout': (5, 60)  # (connect, read) seconds for calls to the central backend
+}
+
+# Documents are staged and content-addressed exactly as on the central
+# backend, just in the station's own directory; stations keep originals only
+central.UPLOAD_CONFIG['directory'] = os.path.abspath(STATION_CONFIG['upload_dir'])
+central.THUMBNAILS.image_extensions = ()
+
+STATION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    op_uuid TEXT UNIQUE NOT NULL,
+    op_type TEXT NOT NULL,
+    application_number TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',  -- pending, synced, rejected
+    result TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    synced_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_journal_status ON journal (status, seq);
+
+CREATE TABLE IF NOT EXISTS applications (
+    application_number TEXT PRIMARY KEY,
+    id INTEGER UNIQUE,  -- Central id; NULL until the submission has been synced
+    op_uuid TEXT,
+    officer_id INTEGER,
+    application_type TEXT,
+    full_names TEXT,
+    constituency TEXT,
+    status TEXT,
+    generated_id_number TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    pending_sync INTEGER NOT NULL DEFAULT 0,
+    sync_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_applications_created ON applications (created_at);
+
+CREATE TABLE IF NOT EXISTS officers (
+    id INTEGER PRIMARY KEY,
+    status TEXT NOT NULL
+);
+
+-- Officers who signed in here while online, so they can sign in offline too
+CREATE TABLE IF NOT EXISTS officer_logins (
+    email TEXT PRIMARY KEY,
+    password_hash TEXT NOT NULL,
+    officer TEXT NOT NULL,  -- The officer object the central backend returned
+    updated_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS number_blocks (
+    prefix TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    digits INTEGER NOT NULL,
+    next_value INTEGER NOT NULL,
+    end_value INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def get_station_db():
+    """Open the station database in autocommit mode; use BEGIN IMMEDIATE for writes"""
+    conn = sqlite3.connect(STATION_CONFIG['database'], timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+def init_station_db():
+    conn = get_station_db()
+    conn.executescript(STATION_SCHEMA)
+    conn.close()
+
+def get_sync_state(conn, key):
+    row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+    return row['value'] if row else None
+
+def set_sync_state(conn, key, value):
+    conn.execute("""
+        INSERT INTO sync_state (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+    """, (key, value))
+
+def allocate_station_number(conn):
+    """Take the next number from a block reserved while online; returns (number, provisional)
+
+    Runs inside the caller's write transaction. When every block is used up
+    the station hands out a provisional number, which the central backend
+    replaces with a real one when the submission is synced.
+    """
+    year = datetime.now().year
+    block = conn.execute("""
+        SELECT rowid, prefix, digits, next_value FROM number_blocks
+        WHERE year = ? AND next_value < end_value
+        ORDER BY next_value
+        LIMIT 1
+    """, (year,)).fetchone()
+    if not block:
+        return provisional_number(), True
+    conn.execute("UPDATE number_blocks SET next_value = next_value + 1 WHERE rowid = ?", (block['rowid'],))
+    return f"{block['prefix']}{year}{block['next_value']:0{block['digits']}d}", False
+
+def provisional_number():
+    """Placeholder application number; the central backend assigns the real one on sync"""
+    return f"TMP-{STATION_CONFIG['station_id']}-{uuid.uuid4().hex[:10].upper()}"
+
+def journal_op(conn, op_type, payload, application_number=None):
+    op_uuid = str(uuid.uuid4())
+    conn.execute("""
+        INSERT INTO journal (op_uuid, op_type, application_number, payload, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, (op_uuid, op_type, application_number, json.dumps(payload), datetime.now().isoformat()))
+    return op_uuid
+
+# Journal entries that create an application row
+SUBMISSION_OPS = ('submit_application', 'submit_lost_id')
+
+# Status changes made or pulled at this station, for the officer screens' event stream
+STATION_EVENTS = central.StatusBroker(**central.STATUS_EVENTS_CONFIG)
+
+def station_change(application_id, application_number, officer_id, constituency, old_status, new_status):
+    return {
+        'application_id': application_id,
+        'application_number': application_number,
+        'officer_id': officer_id,
+        'constituency': constituency,
+        'old_status': old_status,
+        'new_status': new_status
+    }
+
+def stage_documents(uploads, files):
+    """Stage (document_type, file) pairs and describe them for the journal"""
+    documents = []
+    for doc_type, file in files:
+        sha256, size, mime_type, extension = uploads.add(file, doc_type)
+        documents.append({
+            'document_type': doc_type,
+            'sha256': sha256,
+            'storage_path': central.blob_storage_path(sha256, extension),
+            'mime_type': mime_type
+        })
+    return documents
+
+# Request headers passed through to the central backend
+PROXY_HEADERS = ('Authorization', 'Content-Type', 'Accept', 'If-None-Match')
+
+def proxy_to_central():
+    """Forward the current request to the central backend; raises requests.RequestException when it is unreachable"""
+    return requests.request(
+        request.method,
+        STATION_CONFIG['central_url'].rstrip('/') + request.path,
+        params=request.args,
+        data=request.get_data(),
+        headers={name: request.headers[name] for name in PROXY_HEADERS if name in request.headers},
+        timeout=STATION_CONFIG['timeout']
+    )
+
+def relay(upstream):
+    response = Response(upstream.content, status=upstream.status_code,
+                        content_type=upstream.headers.get('Content-Type'))
+    if upstream.headers.get('ETag'):
+        response.headers['ETag'] = upstream.headers['ETag']
+    return response
+
+def offline_response():
+    return jsonify({'error': 'The central backend is unreachable; try again when the station is back online',
+                    'offline': True}), 503
+
+station_app = Flask(__name__)
+station_app.config['MAX_CONTENT_LENGTH'] = central.UPLOAD_CONFIG['max_request_bytes']
+CORS(station_app)
+
+@station_app.route('/api/applications', methods=['POST'])
+def station_submit_application():
+    uploads = central.StagedUploads()
+    try:
+        if request.content_type and 'application/json' in request.content_type:
+            data = request.get_json() or {}
+        else:
+            data = request.form.to_dict()
+        files = request.files
+
+        missing_fields = [field for field in central.NEW_APPLICATION_REQUIRED_FIELDS if not data.get(field)]
+        if missing_fields:
+            return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
+
+        officer_id = central.request_officer_id(data.get('officerId'))
+        if not officer_id:
+            return jsonify({'error': 'Officer ID missing'}), 400
+
+        conn = get_station_db()
+        try:
+            # Until the first pull there is no officer list; the central backend checks again on sync
+            known_officers = conn.execute("SELECT COUNT(*) FROM officers").fetchone()[0]
+            officer = conn.execute("SELECT status FROM officers WHERE id = ?", (officer_id,)).fetchone()
+            if known_officers and (not officer or officer['status'] != 'approved'):
+                return jsonify({'error': 'Invalid or unapproved officer'}), 400
+
+            documents = stage_documents(uploads, [
+                (central.NEW_APPLICATION_DOC_TYPES.get(file_key, file_key), file)
+                for file_key, file in files.items() if file and file.filename
+            ])
+
+            created_at = datetime.now()
+            conn.execute("BEGIN IMMEDIATE")
+            application_number, provisional = allocate_station_number(conn)
+            op_uuid = journal_op(conn, 'submit_application', {
+                'application_number': application_number,
+                'provisional': provisional,
+                'officer_id': officer_id,
+                'data': data,
+                'documents': documents,
+                'created_at': created_at.isoformat()
+            }, application_number)
+            conn.execute("""
+                INSERT INTO applications (application_number, op_uuid, officer_id, application_type,
+                                          full_names, constituency, status, created_at, updated_at, pending_sync)
+                VALUES (?, ?, ?, 'new', ?, ?, 'submitted', ?, ?, 1)
+            """, (application_number, op_uuid, officer_id, data['fullNames'],
+                  data['constituency'].strip(), created_at.isoformat(), created_at.isoformat()))
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        uploads.commit()
+        STATION_EVENTS.publish([station_change(None, application_number, officer_id,
+                                               data['constituency'].strip(), None, 'submitted')])
+
+        return jsonify({
+            'message': 'Application saved at the station and queued for sync',
+            'applicationNumber': application_number,
+            'provisional': provisional,
+            'pendingSync': True
+        }), 201
+
+    except central.UploadRejected as e:
+        uploads.discard()
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        uploads.discard()
+        return jsonify({'error': str(e)}), 500
+
+@station_app.route('/api/applications/lost-id', methods=['POST'])
+def station_submit_lost_id():
+    uploads = central.StagedUploads()
+    try:
+        data = request.form.to_dict()
+        missing_fields = [field for field in central.LOST_ID_REQUIRED_FIELDS if not data.get(field)]
+        if missing_fields:
+            return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
+
+        officer_id = central.request_officer_id()
+        constituency = (data.get('constituency') or '').strip() or None
+        documents = stage_documents(uploads, [
+            (doc_type, request.files[doc_type]) for doc_type in central.LOST_ID_DOC_TYPES
+            if doc_type in request.files and request.files[doc_type].filename
+        ])
+
+        conn = get_station_db()
+        try:
+            # Replacement numbers are not reserved in blocks; central assigns one on sync
+            application_number = provisional_number()
+            created_at = datetime.now()
+            conn.execute("BEGIN IMMEDIATE")
+            op_uuid = journal_op(conn, 'submit_lost_id', {
+                'application_number': application_number,
+                'provisional': True,
+                'officer_id': officer_id,
+                'data': data,
+                'documents': documents,
+                'created_at': created_at.isoformat()
+            }, application_number)
+            conn.execute("""
+                INSERT INTO applications (application_number, op_uuid, officer_id, application_type,
+                                          full_names, constituency, status, created_at, updated_at, pending_sync)
+                VALUES (?, ?, ?, 'renewal', ?, ?, 'submitted', ?, ?, 1)
+            """, (application_number, op_uuid, officer_id, data['full_names'], constituency,
+                  created_at.isoformat(), created_at.isoformat()))
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        uploads.commit()
+        STATION_EVENTS.publish([station_change(None, application_number, officer_id,
+                                               constituency, None, 'submitted')])
+
+        # Payment needs the central application id, so hand the entry over now if the link is up
+        STATION_SYNC.push_now()
+        conn = get_station_db()
+        row = conn.execute("SELECT id, application_number FROM applications WHERE op_uuid = ?",
+                           (op_uuid,)).fetchone()
+        conn.close()
+
+        if not row['id']:
+            # Payments are recorded centrally against the application id, so they wait for the link
+            return jsonify({
+                'message': 'Lost ID application saved at the station and queued for sync. '
+                           'Payment can be taken once the station is back online',
+                'applicationNumber': row['application_number'],
+                'applicationId': None,
+                'pendingSync': True,
+                'paymentRequiresLink': True
+            }), 201
+
+        return jsonify({
+            'message': 'Lost ID application submitted successfully',
+            'applicationNumber': row['application_number'],
+            'applicationId': row['id'],
+            'pendingSync': False
+        }), 201
+
+    except central.UploadRejected as e:
+        uploads.discard()
+        return jsonify({'error': str(e)}), e.status_code
+    except Exception as e:
+        uploads.discard()
+        return jsonify({'error': str(e)}), 500
+
+@station_app.route('/api/officer/applications', methods=['GET'])
+def station_officer_applications():
+    try:
+        # The station only holds its own constituency, plus anything submitted here
+        conn = get_station_db()
+        rows = conn.execute("""
+            SELECT id, application_number, full_names, status, created_at, updated_at,
+                   generated_id_number, pending_sync, sync_error
+            FROM applications
+            ORDER BY created_at DESC
+        """).fetchall()
+        conn.close()
+        return jsonify([dict(row) for row in rows]), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def station_card_event(application_id, op_type, new_status, allowed, error_message):
+    conn = get_station_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("""
+            SELECT application_number, officer_id, constituency, status, generated_id_number
+            FROM applications WHERE id = ?
+        """, (application_id,)).fetchone()
+        if not row or not allowed(row):
+            conn.execute("ROLLBACK")
+            return jsonify({'error': error_message}), 404
+
+        journal_op(conn, op_type, {'application_id': application_id}, row['application_number'])
+        # Shown locally straight away; the next pull brings the central state back
+        conn.execute("UPDATE applications SET status = ?, updated_at = ? WHERE id = ?",
+                     (new_status, datetime.now().isoformat(), application_id))
+        conn.execute("COMMIT")
+        STATION_EVENTS.publish([station_change(application_id, row['application_number'], row['officer_id'],
+                                               row['constituency'], row['status'], new_status)])
+        return None
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+@station_app.route('/api/officer/applications/<int:application_id>/card-arrived', methods=['PUT'])
+def station_card_arrived(application_id):
+    try:
+        error = station_card_event(
+            application_id, 'card_arrived', 'ready_for_collection',
+            lambda row: row['status'] == 'dispatched',
+            'Application not found or not in dispatched status'
+        )
+        return error or (jsonify({'message': 'Card arrival confirmed', 'pendingSync': True}), 200)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@station_app.route('/api/officer/applications/<int:application_id>/card-collected', methods=['PUT'])
+def station_card_collected(application_id):
+    try:
+        error = station_card_event(
+            application_id, 'card_collected', 'collected',
+            lambda row: central.card_collectable(dict(row)),
+            'Application not found or card not arrived yet'
+        )
+        return error or (jsonify({'message': 'Card collection confirmed', 'pendingSync': True}), 200)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@station_app.route('/api/constituencies', methods=['GET'])
+def station_constituencies():
+    try:
+        conn = get_station_db()
+        body = get_sync_state(conn, 'constituencies')
+        conn.close()
+        if body is None:
+            # Nothing cached before the first sync; ask the central backend directly
+            try:
+                return relay(proxy_to_central())
+            except requests.RequestException:
+                return offline_response()
+        response = Response(body, mimetype='application/json')
+        response.cache_control.no_cache = True
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@station_app.route('/api/officer/login', methods=['POST'])
+def station_officer_login():
+    try:
+        data = request.get_json() or {}
+        email = data.get('email')
+        password = data.get('password')
+        if not email or not password:
+            return jsonify({'error': 'Email and password are required'}), 400
+
+        try:
+            upstream = proxy_to_central()
+        except requests.RequestException:
+            upstream = None
+
+        conn = get_station_db()
+        try:
+            if upstream is not None:
+                # Remember successful sign-ins for offline use; forget ones central now refuses
+                if upstream.status_code == 200:
+                    conn.execute("""
+                        INSERT INTO officer_logins (email, password_hash, officer, updated_at) VALUES (?, ?, ?, ?)
+                        ON CONFLICT(email) DO UPDATE SET password_hash = excluded.password_hash,
+                            officer = excluded.officer, updated_at = excluded.updated_at
+                    """, (email, generate_password_hash(password), json.dumps(upstream.json()['officer']),
+                          datetime.now().isoformat()))
+                elif upstream.status_code in (401, 403):
+                    conn.execute("DELETE FROM officer_logins WHERE email = ?", (email,))
+                return relay(upstream)
+
+            login = conn.execute("SELECT password_hash, officer FROM officer_logins WHERE email = ?",
+                                 (email,)).fetchone()
+            if not login or not check_password_hash(login['password_hash'], password):
+                return jsonify({'error': 'Invalid credentials. Offline, only officers who have signed in '
+                                         'at this station before can sign in.'}), 401
+            officer = json.loads(login['officer'])
+            status = conn.execute("SELECT status FROM officers WHERE id = ?", (officer['id'],)).fetchone()
+        finally:
+            conn.close()
+
+        if status and status['status'] != 'approved':
+            return jsonify({'error': 'Account not approved by admin'}), 403
+
+        token = jwt.encode({
+            'officer_id': officer['id'],
+            'email': officer['email'],
+            'role': 'officer',
+            'exp': datetime.utcnow() + timedelta(hours=24)
+        }, central.app.config['SECRET_KEY'], algorithm='HS256')
+        return jsonify({'token': token, 'officer': officer, 'offline': True}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@station_app.route('/api/applications/search-by-id/<id_number>', methods=['GET'])
+def station_search_by_id(id_number):
+    try:
+        try:
+            return relay(proxy_to_central())
+        except requests.RequestException:
+            pass
+
+        # Offline the station only knows the summary of applications it has pulled
+        conn = get_station_db()
+        row = conn.execute("""
+            SELECT id, application_number, full_names, generated_id_number, status, constituency
+            FROM applications
+            WHERE generated_id_number = ? AND status IN ('approved', 'dispatched', 'ready_for_collection', 'collected')
+        """, (id_number,)).fetchone()
+        conn.close()
+        if not row:
+            return jsonify({'error': 'ID not found or not issued yet', 'offline': True}), 404
+        return jsonify({'application': {**dict(row), 'date_of_birth': None}, 'offline': True}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def station_event_filter():
+    application_number = request.args.get('application_number')
+    if application_number:
+        return lambda event: event['application_number'] == application_number
+    constituency = (request.args.get('constituency') or '').strip()
+    if constituency:
+        return lambda event: event['constituency'] == constituency
+    if request.args.get('officer_id', type=int):
+        # The station only holds its own constituency and what was submitted here
+        return lambda event: True
+    return None
+
+@station_app.route('/api/events/stream', methods=['GET'])
+def station_status_events():
+    try:
+        matches = station_event_filter()
+        if not matches:
+            return jsonify({'error': 'Provide application_number, constituency or officer_id'}), 400
+        return central.status_event_stream(STATION_EVENTS, matches)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+class StationSync:
+    """Pushes the journal to the central backend and pulls the station's slice back"""
+
+    def __init__(self, config):
+        self.config = config
+        self.session = requests.Session()
+        self.session.headers.update({
+            'X-Station-Id': config['station_id'],
+            'X-Station-Token': config['token']
+        })
+        self.online = False
+        self.last_success = None
+        self.last_error = None
+        self._lock = threading.Lock()  # One pass at a time, background or on demand
+        self.stats = {'passes': 0, 'failures': 0, 'applied': 0, 'duplicates': 0, 'rejected': 0, 'pulled': 0}
+
+    def _url(self, path):
+        return self.config['central_url'].rstrip('/') + path
+
+    def _check(self, response):
+        if response.status_code != 200:
+            raise requests.RequestException(f"{response.status_code}: {response.text[:200]}")
+        return response.json()
+
+    def top_up_numbers(self, conn):
+        year = datetime.now().year
+        remaining = conn.execute("""
+            SELECT COALESCE(SUM(end_value - next_value), 0) FROM number_blocks WHERE year = ?
+        """, (year,)).fetchone()[0]
+        if remaining >= self.config['number_low_water']:
+            return
+        block = self._check(self.session.post(
+            self._url('/api/stations/sync/reserve'),
+            json={'count': self.config['number_block_size']},
+            timeout=self.config['timeout']
+        ))
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM number_blocks WHERE year < ? OR next_value >= end_value", (year,))
+        conn.execute("""
+            INSERT INTO number_blocks (prefix, year, digits, next_value, end_value) VALUES (?, ?, ?, ?, ?)
+        """, (block['prefix'], block['year'], block['digits'], block['start'], block['end']))
+        conn.execute("COMMIT")
+        print(f"Reserved application numbers {block['start']}-{block['end'] - 1} for {block['year']}")
+
+    def _next_batch(self, conn):
+        """Oldest pending entries, cut so their documents fit in one request"""
+        ops = conn.execute("""
+            SELECT seq, op_uuid, op_type, payload FROM journal
+            WHERE status = 'pending'
+            ORDER BY seq
+            LIMIT ?
+        """, (self.config['push_batch_size'],)).fetchall()
+        batch = []
+        files = {}
+        total_bytes = 0
+        for op in ops:
+            payload = json.loads(op['payload'])
+            op_files = {}
+            for document in payload.get('documents', []):
+                if document['sha256'] not in files:
+                    path = os.path.join(central.UPLOAD_CONFIG['directory'], document['storage_path'])
+                    op_files[document['sha256']] = (path, document['mime_type'])
+            op_bytes = sum(os.path.getsize(path) for path, _ in op_files.values() if os.path.exists(path))
+            if batch and total_bytes + op_bytes > self.config['push_batch_bytes']:
+                break
+            total_bytes += op_bytes
+            files.update(op_files)
+            batch.append({'seq': op['seq'], 'uuid': op['op_uuid'], 'type': op['op_type'], 'payload': payload})
+        return batch, files
+
+    def _record_result(self, conn, op, result):
+        outcome = result['status']
+        if outcome == 'duplicate':
+            self.stats['duplicates'] += 1
+            outcome = result.get('outcome', 'applied')
+            result = {'status': outcome, 'result': result.get('result'),
+                      'error': (result.get('result') or {}).get('error')}
+
+        conn.execute("BEGIN IMMEDIATE")
+        if outcome == 'applied':
+            self.stats['applied'] += 1
+            conn.execute("UPDATE journal SET status = 'synced', result = ?, synced_at = ? WHERE seq = ?",
+                         (json.dumps(result.get('result')), datetime.now().isoformat(), op['seq']))
+            if op['type'] in SUBMISSION_OPS:
+                # The central id, and the real number if this one was provisional
+                previous = conn.execute("SELECT application_number FROM applications WHERE op_uuid = ?",
+                                        (op['uuid'],)).fetchone()
+                conn.execute("""
+                    UPDATE applications SET id = ?, application_number = ?, pending_sync = 0
+                    WHERE op_uuid = ?
+                """, (result['result']['applicationId'], result['result']['applicationNumber'], op['uuid']))
+                # Pending entries for the application follow the new number, so pulls still leave it alone
+                if previous and previous['application_number'] != result['result']['applicationNumber']:
+                    conn.execute("""
+                        UPDATE journal SET application_number = ?
+                        WHERE status = 'pending' AND application_number = ?
+                    """, (result['result']['applicationNumber'], previous['application_number']))
+        else:
+            self.stats['rejected'] += 1
+            print(f"Central backend rejected {op['type']} {op['uuid']}: {result.get('error')}")
+            conn.execute("UPDATE journal SET status = 'rejected', result = ?, synced_at = ? WHERE seq = ?",
+                         (json.dumps({'error': result.get('error')}), datetime.now().isoformat(), op['seq']))
+            if op['type'] in SUBMISSION_OPS:
+                conn.execute("""
+                    UPDATE applications SET pending_sync = 0, status = 'sync_rejected', sync_error = ?
+                    WHERE op_uuid = ?
+                """, (result.get('error'), op['uuid']))
+        conn.execute("COMMIT")
+
+    def push(self, conn):
+        while True:
+            batch, files = self._next_batch(conn)
+            if not batch:
+                return
+
+            handles = [(sha256, open(path, 'rb'), mime_type) for sha256, (path, mime_type) in files.items()
+                       if os.path.exists(path)]
+            try:
+                response = self.session.post(
+                    self._url('/api/stations/sync/push'),
+                    data={'ops': json.dumps([{k: op[k] for k in ('uuid', 'type', 'payload')} for op in batch])},
+                    files=[(sha256, (sha256, handle, mime_type)) for sha256, handle, mime_type in handles],
+                    timeout=self.config['timeout']
+                )
+            finally:
+                for _, handle, _ in handles:
+                    handle.close()
+            results = {result['uuid']: result for result in self._check(response)['results']}
+
+            for op in batch:
+                result = results.get(op['uuid'])
+                if not result or result['status'] == 'retry':
+                    # Central could not apply it right now; keep order and try again next pass
+                    conn.execute("UPDATE journal SET attempts = attempts + 1 WHERE seq = ?", (op['seq'],))
+                    if result:
+                        self.last_error = result.get('error')
+                    return
+                self._record_result(conn, op, result)
+
+    def pull(self, conn):
+        constituency = self.config['constituency']
+        if not constituency:
+            return
+        since = get_sync_state(conn, 'pull_since')
+        params = {'constituency': constituency}
+        if since:
+            params['since'] = (datetime.fromisoformat(since) - timedelta(seconds=self.config['pull_overlap'])).isoformat()
+        newest = since
+
+        while True:
+            page = self._check(self.session.get(
+                self._url('/api/stations/sync/pull'), params=params, timeout=self.config['timeout']
+            ))
+            conn.execute("BEGIN IMMEDIATE")
+            for officer in page['officers']:
+                conn.execute("""
+                    INSERT INTO officers (id, status) VALUES (?, ?)
+                    ON CONFLICT(id) DO UPDATE SET status = excluded.status
+                """, (officer['id'], officer['status']))
+            changes = []
+            for row in page['applications']:
+                before = conn.execute("SELECT status FROM applications WHERE application_number = ?",
+                                      (row['application_number'],)).fetchone()
+                # Rows with journal entries still waiting to be pushed keep their local state
+                conn.execute("""
+                    INSERT INTO applications (application_number, id, officer_id, application_type, full_names,
+                                              constituency, status, generated_id_number, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(application_number) DO UPDATE SET
+                        id = excluded.id, status = excluded.status,
+                        generated_id_number = excluded.generated_id_number, updated_at = excluded.updated_at,
+                        pending_sync = 0, sync_error = NULL
+                    WHERE applications.application_number NOT IN (
+                        SELECT application_number FROM journal
+                        WHERE status = 'pending' AND application_number IS NOT NULL
+                    )
+                """, (row['application_number'], row['id'], row['officer_id'], row['application_type'],
+                      row['full_names'], row['constituency'], row['status'], row['generated_id_number'],
+                      row['created_at'], row['updated_at']))
+                after = conn.execute("SELECT status FROM applications WHERE application_number = ?",
+                                     (row['application_number'],)).fetchone()
+                if not before or before['status'] != after['status']:
+                    changes.append(station_change(row['id'], row['application_number'], row['officer_id'],
+                                                  row['constituency'], before and before['status'], after['status']))
+                if not newest or row['updated_at'] > newest:
+                    newest = row['updated_at']
+            conn.execute("COMMIT")
+            STATION_EVENTS.publish(changes)
+            self.stats['pulled'] += len(page['applications'])
+
+            if not page['next_cursor']:
+                break
+            params['cursor'] = page['next_cursor']
+
+        if newest:
+            conn.execute("BEGIN IMMEDIATE")
+            set_sync_state(conn, 'pull_since', newest)
+            conn.execute("COMMIT")
+
+    def refresh_constituencies(self, conn):
+        """Keep a copy of the constituency list for the application forms"""
+        headers = {}
+        etag = get_sync_state(conn, 'constituencies_etag')
+        if etag:
+            headers['If-None-Match'] = etag
+        response = self.session.get(self._url('/api/constituencies'), headers=headers,
+                                    timeout=self.config['timeout'])
+        if response.status_code == 304:
+            return
+        self._check(response)
+        conn.execute("BEGIN IMMEDIATE")
+        set_sync_state(conn, 'constituencies', response.text)
+        set_sync_state(conn, 'constituencies_etag', response.headers.get('ETag'))
+        conn.execute("COMMIT")
+
+    def _run_pass(self, steps):
+        """Run sync steps in order; returns True if the link was up"""
+        conn = get_station_db()
+        try:
+            for step in steps:
+                step(conn)
+            self.online = True
+            self.last_success = datetime.now().isoformat()
+            return True
+        except (requests.RequestException, ValueError) as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self.online = False
+            self.last_error = str(e)
+            self.stats['failures'] += 1
+            print(f"Station sync failed, will retry: {str(e)}")
+            return False
+        finally:
+            conn.close()
+
+    def sync_once(self):
+        """One pass: top up numbers, push the journal, pull the slice; returns True if the link was up"""
+        with self._lock:
+            self.stats['passes'] += 1
+            return self._run_pass([self.top_up_numbers, self.push, self.pull, self.refresh_constituencies])
+
+    def push_now(self):
+        """Push the journal without waiting for the next pass; a pass already running pushes it anyway"""
+        if not self._lock.acquire(timeout=self.config['timeout'][0]):
+            return False
+        try:
+            return self._run_pass([self.push])
+        finally:
+            self._lock.release()
+
+    def run_forever(self):
+        while True:
+            try:
+                self.sync_once()
+            except Exception as e:
+                print(f"Unexpected station sync error: {str(e)}")
+            time.sleep(self.config['sync_interval'])
+
+    def start(self):
+        thread = threading.Thread(target=self.run_forever, name='station-sync', daemon=True)
+        thread.start()
+        return thread
+
+STATION_SYNC = StationSync(STATION_CONFIG)
+
+def station_status():
+    conn = get_station_db()
+    journal = {row['status']: row['count'] for row in conn.execute(
+        "SELECT status, COUNT(*) AS count FROM journal GROUP BY status"
+    )}
+    numbers_left = conn.execute("""
+        SELECT COALESCE(SUM(end_value - next_value), 0) FROM number_blocks WHERE year = ?
+    """, (datetime.now().year,)).fetchone()[0]
+    pull_since = get_sync_state(conn, 'pull_since')
+    conn.close()
+    return {
+        'station_id': STATION_CONFIG['station_id'],
+        'online': STATION_SYNC.online,
+        'last_success': STATION_SYNC.last_success,
+        'last_error': STATION_SYNC.last_error,
+        'journal': journal,
+        'reserved_numbers_left': numbers_left,
+        'pulled_until': pull_since,
+        'stats': dict(STATION_SYNC.stats)
+    }
+
+@station_app.route('/api/station/status', methods=['GET'])
+def get_station_status():
+    try:
+        return jsonify(station_status()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@station_app.route('/api/station/sync', methods=['POST'])
+def trigger_station_sync():
+    try:
+        online = STATION_SYNC.sync_once()
+        return jsonify({'online': online, **station_status()}), 200 if online else 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Everything the station does not handle itself goes straight to the central backend
+@station_app.route('/api/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
+def proxy_central_route(path):
+    try:
+        return relay(proxy_to_central())
+    except requests.RequestException:
+        return offline_response()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+if __name__ == "__main__":
+    init_station_db()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'serve'
+    if command == 'sync':
+        sys.exit(0 if STATION_SYNC.sync_once() else 1)
+    elif command == 'status':
+        print(json.dumps(station_status(), indent=2))
+    elif command == 'serve':
+        STATION_SYNC.start()
+        station_app.run(debug=False, port=STATION_CONFIG['port'], threaded=True)
+    else:
+        print("Usage: python station.py [serve|sync|status]")
+        sys.exit(1)
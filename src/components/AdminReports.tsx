@@ -134,10 +134,28 @@ const AdminReports = () => {
         format: exportFormat
       });
 
-      const response = await fetch(`http://localhost:5000/api/admin/reports/export?${params}`, {
+      let response = await fetch(`http://localhost:5000/api/admin/reports/export?${params}`, {
         method: 'GET',
       });
 
+      // PDF reports are rendered in the background: poll the job, then download it
+      if (response.status === 202) {
+        toast({
+          title: "Generating Report",
+          description: "Your PDF report is being prepared. The download will start when it is ready.",
+        });
+        let { job } = await response.json();
+        while (job.status === 'running') {
+          await new Promise(resolve => setTimeout(resolve, 2000));
+          const statusResponse = await fetch(`http://localhost:5000${job.status_url}`);
+          job = (await statusResponse.json()).job;
+        }
+        if (job.status !== 'completed') {
+          throw new Error(job.error || 'Report generation failed');
+        }
+        response = await fetch(`http://localhost:5000${job.download_url}`);
+      }
+
       if (response.ok) {
         const blob = await response.blob();
         const url = window.URL.createObjectURL(blob);
@@ -92,6 +92,7 @@ const ApplicationDetails = ({ applicationId, open, onClose, onUpdate }: Applicat
         method: 'PUT',
         headers: {
           'Content-Type': 'application/json',
+          'Authorization': `Bearer ${localStorage.getItem('adminToken') ?? ''}`,
         },
       });
 
@@ -126,6 +127,7 @@ const ApplicationDetails = ({ applicationId, open, onClose, onUpdate }: Applicat
         method: 'PUT',
         headers: {
           'Content-Type': 'application/json',
+          'Authorization': `Bearer ${localStorage.getItem('adminToken') ?? ''}`,
         },
       });
 
@@ -318,7 +320,16 @@ const ApplicationDetails = ({ applicationId, open, onClose, onUpdate }: Applicat
                 {application.documents.map((doc, index) => (
                   <div key={index} className="flex items-center justify-between p-3 border rounded-lg">
                     <div className="flex items-center gap-3">
-                      <Image className="h-5 w-5 text-muted-foreground" />
+                      {/\.(jpe?g|png|webp)$/i.test(doc.file_path) ? (
+                        <img
+                          src={`http://localhost:5000/uploads/${doc.file_path.replace(/^uploads\//, '')}?size=small`}
+                          alt={doc.document_type.replace('_', ' ')}
+                          loading="lazy"
+                          className="h-12 w-12 rounded object-cover border"
+                        />
+                      ) : (
+                        <Image className="h-5 w-5 text-muted-foreground" />
+                      )}
                       <div>
                         <p className="font-medium capitalize">{doc.document_type.replace('_', ' ')}</p>
                         <p className="text-sm text-muted-foreground">{doc.file_path.split('/').pop()}</p>
@@ -327,7 +338,7 @@ const ApplicationDetails = ({ applicationId, open, onClose, onUpdate }: Applicat
                     <Button 
                       variant="outline" 
                       size="sm"
-                      onClick={() => window.open(`http://localhost:5000/${doc.file_path}`, '_blank')}
+                      onClick={() => window.open(`http://localhost:5000/uploads/${doc.file_path.replace(/^uploads\//, '')}`, '_blank')}
                     >
                       View
                     </Button>
@@ -101,6 +101,7 @@ const IdCardPreview = ({ applicationId, open, onClose, onPrint }: IdCardPreviewP
         method: 'PUT',
         headers: {
           'Content-Type': 'application/json',
+          'Authorization': `Bearer ${localStorage.getItem('adminToken') ?? ''}`,
         },
       });
 
@@ -157,7 +158,7 @@ const IdCardPreview = ({ applicationId, open, onClose, onPrint }: IdCardPreviewP
       }
       
       // Now construct the proper URL with single uploads path
-      return `http://localhost:5000/uploads/${filePath}`;
+      return `http://localhost:5000/uploads/${filePath}?size=small`;
     }
     return null;
   };
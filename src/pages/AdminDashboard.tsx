@@ -60,6 +60,7 @@ const AdminDashboard = () => {
   const [approvedOfficers, setApprovedOfficers] = useState<ApprovedOfficer[]>([]);
   const [constituencies, setConstituencies] = useState<Constituency[]>([]);
   const [applicationHistory, setApplicationHistory] = useState<Application[]>([]);
+  const [historyCursor, setHistoryCursor] = useState<string | null>(null);
   const [newConstituency, setNewConstituency] = useState('');
   const [loading, setLoading] = useState(true);
   const [selectedApplicationId, setSelectedApplicationId] = useState<number | null>(null);
@@ -229,6 +230,7 @@ const AdminDashboard = () => {
         method: 'PUT',
         headers: {
           'Content-Type': 'application/json',
+          'Authorization': `Bearer ${localStorage.getItem('adminToken') ?? ''}`,
         },
       });
 
@@ -412,13 +414,15 @@ const AdminDashboard = () => {
     }
   };
 
-  const fetchApplicationHistory = async () => {
+  const fetchApplicationHistory = async (cursor?: string) => {
     try {
-      const response = await fetch('http://localhost:5000/api/admin/applications/history');
+      const params = new URLSearchParams(cursor ? { limit: '50', cursor } : { limit: '50' });
+      const response = await fetch(`http://localhost:5000/api/admin/applications/history?${params}`);
       const data = await response.json();
       
       if (response.ok) {
-        setApplicationHistory(data.applications);
+        setApplicationHistory(prev => cursor ? [...prev, ...data.applications] : data.applications);
+        setHistoryCursor(data.next_cursor);
       } else {
         toast({
           title: "Error",
@@ -1181,6 +1185,13 @@ const AdminDashboard = () => {
                     </Table>
                   </div>
                 )}
+                {historyCursor && (
+                  <div className="flex justify-center pt-4">
+                    <Button variant="outline" onClick={() => fetchApplicationHistory(historyCursor)}>
+                      Load more
+                    </Button>
+                  </div>
+                )}
               </CardContent>
             </Card>
           </TabsContent>
@@ -30,7 +30,7 @@ const LostIdPayment = () => {
     console.log('LostIdPayment - Received state:', state);
     console.log('LostIdPayment - fullName from state:', state?.fullName);
     
-    if (!state?.applicationNumber) {
+    if (!state?.applicationNumber || !state?.applicationId) {
       toast({
         title: "Error",
         description: "Missing application data. Please restart the process.",
@@ -43,7 +43,7 @@ const LostIdPayment = () => {
   const renewalFee = 1000; // KES 1000 renewal fee
 
   const handlePayment = async () => {
-    if (!state) return;
+    if (!state?.applicationId) return;
 
     // Validate M-Pesa phone number if M-Pesa is selected
     if (paymentMethod === 'mpesa' && !phoneNumber) {
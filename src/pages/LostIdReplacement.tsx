@@ -181,6 +181,16 @@ const LostIdReplacement = () => {
       if (response.ok) {
         const data = await response.json();
         
+        // Saved at an offline station: the central application (and its payment) comes after sync
+        if (data.pendingSync) {
+          toast({
+            title: "Saved Offline",
+            description: data.message
+          });
+          navigate('/officer/dashboard');
+          return;
+        }
+        
         toast({
           title: "Success",
           description: "Lost ID application submitted successfully"
@@ -384,7 +394,7 @@ const LostIdReplacement = () => {
                     <Input
                       id="obPhoto"
                       type="file"
-                      accept="image/*"
+                      accept="image/jpeg,image/png,image/webp"
                       onChange={(e) => handleFileChange(e.target.files?.[0] || null, setObPhoto)}
                     />
                     {obPhoto && (
@@ -402,7 +412,7 @@ const LostIdReplacement = () => {
                     <Input
                       id="passportPhoto"
                       type="file"
-                      accept="image/*"
+                      accept="image/jpeg,image/png,image/webp"
                       onChange={(e) => handleFileChange(e.target.files?.[0] || null, setPassportPhoto)}
                     />
                     {passportPhoto && (
@@ -420,7 +430,7 @@ const LostIdReplacement = () => {
                     <Input
                       id="birthCertificate"
                       type="file"
-                      accept="image/*,application/pdf"
+                      accept="image/jpeg,image/png,image/webp,application/pdf"
                       onChange={(e) => handleFileChange(e.target.files?.[0] || null, setBirthCertificate)}
                     />
                     {birthCertificate && (
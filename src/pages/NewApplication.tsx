@@ -538,7 +538,7 @@ const NewApplication = () => {
                   <div className="border-2 border-dashed border-border rounded-lg p-4 text-center">
                     <input
                       type="file"
-                      accept="image/*"
+                      accept="image/jpeg,image/png,image/webp"
                       onChange={(e) => handleFileUpload('passport', e)}
                       className="hidden"
                       id="passport-upload"
@@ -557,7 +557,7 @@ const NewApplication = () => {
                   <div className="border-2 border-dashed border-border rounded-lg p-4 text-center">
                     <input
                       type="file"
-                      accept="image/*,application/pdf"
+                      accept="image/jpeg,image/png,image/webp,application/pdf"
                       onChange={(e) => handleFileUpload('birth', e)}
                       className="hidden"
                       id="birth-upload"
@@ -576,7 +576,7 @@ const NewApplication = () => {
                   <div className="border-2 border-dashed border-border rounded-lg p-4 text-center">
                     <input
                       type="file"
-                      accept="image/*,application/pdf"
+                      accept="image/jpeg,image/png,image/webp,application/pdf"
                       onChange={(e) => handleFileUpload('parents', e)}
                       className="hidden"
                       id="parents-upload"
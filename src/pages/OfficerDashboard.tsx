@@ -55,6 +55,24 @@ const OfficerDashboard = () => {
     }
   }, [officerData]);
 
+  // Reload when applications in this officer's constituency change status
+  useEffect(() => {
+    if (!officerData) return;
+    const source = new EventSource(`http://localhost:5000/api/events/stream?officer_id=${officerData.id}`);
+    let timer: ReturnType<typeof setTimeout> | undefined;
+    // Bulk actions publish many events at once; reload once they settle
+    const scheduleRefresh = () => {
+      clearTimeout(timer);
+      timer = setTimeout(fetchApplications, 1000);
+    };
+    source.addEventListener("status", scheduleRefresh);
+    source.addEventListener("reset", scheduleRefresh);
+    return () => {
+      clearTimeout(timer);
+      source.close();
+    };
+  }, [officerData]);
+
   // Update filtered applications when applications change
   useEffect(() => {
     if (searchQuery) {
@@ -130,6 +148,7 @@ const OfficerDashboard = () => {
         method: 'PUT',
         headers: {
           'Content-Type': 'application/json',
+          'Authorization': `Bearer ${localStorage.getItem('officerToken') ?? ''}`,
         },
         body: JSON.stringify({
           status: 'card_arrived'
@@ -161,6 +180,7 @@ const OfficerDashboard = () => {
         method: 'PUT',
         headers: {
           'Content-Type': 'application/json',
+          'Authorization': `Bearer ${localStorage.getItem('officerToken') ?? ''}`,
         }
       });
       
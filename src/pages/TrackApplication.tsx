@@ -1,4 +1,4 @@
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
@@ -13,6 +13,22 @@ const TrackApplication = () => {
   const [applicationStatus, setApplicationStatus] = useState<any>(null);
   const { toast } = useToast();
 
+  // Follow the tracked application so status changes show up without searching again
+  const trackedNumber = applicationStatus?.applicationNumber;
+  useEffect(() => {
+    if (!trackedNumber) return;
+    const source = new EventSource(`http://localhost:5000/api/events/stream?application_number=${encodeURIComponent(trackedNumber)}`);
+    source.addEventListener("status", (event) => {
+      const change = JSON.parse((event as MessageEvent).data);
+      setApplicationStatus((current: any) =>
+        current && current.applicationNumber === change.application_number
+          ? { ...current, status: change.status }
+          : current
+      );
+    });
+    return () => source.close();
+  }, [trackedNumber]);
+
   const handleSearch = async () => {
     if (!waitingCardNumber.trim()) {
       toast({